@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AuthenticationConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "authentication"
+
+    def ready(self):
+        # Connects the blacklist filter invalidation receiver and registers the OTP cache check
+        from . import blacklist, otp  # noqa: F401
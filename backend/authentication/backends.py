@@ -0,0 +1,128 @@
+"""
+JWT authentication classes that skip re-verifying recently seen access tokens.
+
+Verifying an access token means checking its HMAC signature and validating its claims on every
+request. The classes below keep a bounded, process-local LRU of tokens that passed verification,
+keyed by their JTI and holding the exact raw token and its expiry. A request carrying a token
+identical to a cached one reuses the earlier verification until the token expires; anything else
+goes through the full simplejwt verification.
+"""
+
+from base64 import urlsafe_b64decode
+from collections import OrderedDict
+import hmac
+import json
+import threading
+import time
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import (
+    JWTAuthentication,
+    JWTTokenUserAuthentication,
+)
+from rest_framework_simplejwt.settings import api_settings
+
+# Number of verified tokens kept per process
+TOKEN_CACHE_SIZE = getattr(settings, "JWT_VERIFIED_TOKEN_CACHE_SIZE", 4096)
+
+
+class VerifiedTokenCache:
+    """
+    A thread-safe, bounded LRU of verified access tokens.
+
+    Attributes:
+        maxsize (int): The number of tokens kept; the least recently used one is dropped first.
+        entries (OrderedDict): jti -> (raw token, expiry timestamp, validated token).
+
+    Methods:
+        get(jti, raw_token): Returns the cached validated token, or None.
+        put(jti, raw_token, expires_at, token): Caches a token that passed verification.
+        clear(): Drops every cached token.
+    """
+
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, jti, raw_token):
+        with self.lock:
+            entry = self.entries.get(jti)
+            if entry is None:
+                return None
+            cached_raw, expires_at, token = entry
+            if expires_at <= time.time():
+                del self.entries[jti]
+                return None
+            self.entries.move_to_end(jti)
+        # Same JTI is not enough: the whole token, signature included, must be the verified one
+        if not hmac.compare_digest(cached_raw, raw_token):
+            return None
+        return token
+
+    def put(self, jti, raw_token, expires_at, token):
+        with self.lock:
+            self.entries[jti] = (raw_token, expires_at, token)
+            self.entries.move_to_end(jti)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+verified_tokens = VerifiedTokenCache()
+
+
+def unverified_claims(raw_token):
+    """
+    Returns the (unverified) payload of a JWT, or None if it cannot be decoded.
+
+    Only used to find the token in the cache; the claims are never trusted on their own.
+    """
+    try:
+        payload = raw_token.split(b".")[1]
+        return json.loads(urlsafe_b64decode(payload + b"=" * (-len(payload) % 4)))
+    except (IndexError, ValueError, TypeError):
+        return None
+
+
+class CachedTokenMixin:
+    """
+    Serves `get_validated_token` from the verified token cache when possible.
+    """
+
+    token_cache = verified_tokens
+
+    def get_validated_token(self, raw_token):
+        claims = unverified_claims(raw_token)
+        jti = claims.get(api_settings.JTI_CLAIM) if isinstance(claims, dict) else None
+        if jti is not None:
+            token = self.token_cache.get(jti, raw_token)
+            if token is not None:
+                return token
+
+        token = super().get_validated_token(raw_token)
+
+        jti, expires_at = token.get(api_settings.JTI_CLAIM), token.get("exp")
+        if jti is not None and expires_at is not None:
+            self.token_cache.put(jti, raw_token, expires_at, token)
+        return token
+
+
+class CachedJWTAuthentication(CachedTokenMixin, JWTAuthentication):
+    """
+    JWT authentication that loads the user from the database, with cached token verification.
+
+    Used where views need the full User instance (profile and password changes).
+    """
+
+
+class CachedJWTTokenUserAuthentication(CachedTokenMixin, JWTTokenUserAuthentication):
+    """
+    JWT authentication that builds a TokenUser from the claims, with cached token verification.
+
+    A request with a recently verified token is authenticated without verification work and
+    without any database query.
+    """
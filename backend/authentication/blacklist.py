@@ -0,0 +1,235 @@
+"""
+Fast refresh token blacklist checks and cleanup of expired tokens.
+
+simplejwt checks every refresh token against `BlacklistedToken` with a query. Almost all
+refreshed tokens are not blacklisted, so each process keeps a Bloom filter of the blacklisted
+JTIs and only queries the database when the filter reports a possible hit; a miss is definite.
+
+The filter is loaded once and then extended incrementally with the rows added since the last
+load. Rows are read from a little below the last loaded id, so rows whose transaction committed
+out of id order are not missed; re-adding a JTI is harmless. Blacklisting bumps a version stamp
+in the cache once its transaction commits, which tells the other processes to load the new rows;
+purging expired tokens bumps a generation stamp, which makes them rebuild the filter from scratch.
+
+The stamps are read from the cache on every check, one cache round trip instead of a query. A
+token blacklisted by any process is therefore rejected everywhere from the first check after the
+blacklisting transaction's commit hook has bumped the version; the only window left is between
+that commit and its hook. This requires the cache to be shared by all processes, which the
+`authentication.E001` system check enforces. Should the stamps be lost from the cache anyway,
+the filter still loads new rows at least every `REFRESH_SECONDS`.
+"""
+
+from hashlib import blake2b
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+VERSION_KEY = "jwt-blacklist-version"
+GENERATION_KEY = "jwt-blacklist-generation"
+
+# How long a filter may go without loading new rows, should the cached stamps be lost
+REFRESH_SECONDS = 5
+
+# Target false positive rate, and the smallest number of JTIs a filter is sized for
+FALSE_POSITIVE_RATE = getattr(settings, "JWT_BLACKLIST_FALSE_POSITIVE_RATE", 0.001)
+MIN_CAPACITY = 1024
+
+# Ids re-read below the last loaded one on every incremental load
+OVERLAP_IDS = 1000
+
+PURGE_CHUNK_SIZE = 1000
+
+
+class BloomFilter:
+    """
+    A fixed-size Bloom filter of strings.
+
+    Attributes:
+        capacity (int): The number of items the filter is sized for at `FALSE_POSITIVE_RATE`.
+        count (int): The number of distinct items added (approximate: an item whose bits were
+            all set already is not counted).
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.count = 0
+        self.size = max(
+            8, int(-capacity * math.log(FALSE_POSITIVE_RATE) / (math.log(2) ** 2))
+        )
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, item):
+        digest = blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        changed = False
+        for position in self.positions(item):
+            byte, bit = position >> 3, 1 << (position & 7)
+            if not self.bits[byte] & bit:
+                self.bits[byte] |= bit
+                changed = True
+        self.count += changed
+
+    def __contains__(self, item):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self.positions(item)
+        )
+
+
+class BlacklistFilter:
+    """
+    A process-local Bloom filter of blacklisted JTIs, kept in sync with `BlacklistedToken`.
+
+    Methods:
+        might_contain(jti): Returns False if the JTI is certainly not blacklisted.
+        add(jti): Adds a JTI blacklisted by this process.
+        reset(): Drops the filter, so the next check rebuilds it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.filter = None
+        self.last_id = 0
+        self.version = None
+        self.generation = None
+        self.refreshed_at = 0.0
+
+    def might_contain(self, jti):
+        return jti in self.refresh()
+
+    def add(self, jti):
+        with self.lock:
+            if self.filter is not None:
+                self.filter.add(jti)
+
+    def reset(self):
+        with self.lock:
+            self.filter = None
+
+    def refresh(self):
+        stamps = cache.get_many([VERSION_KEY, GENERATION_KEY])
+        version, generation = stamps.get(VERSION_KEY), stamps.get(GENERATION_KEY)
+        now = time.monotonic()
+        current = self.filter
+        if (
+            current is not None
+            and (version, generation) == (self.version, self.generation)
+            and now - self.refreshed_at < REFRESH_SECONDS
+        ):
+            return current
+
+        with self.lock:
+            if (
+                self.filter is None
+                or generation != self.generation
+                or self.filter.count > self.filter.capacity
+            ):
+                self.rebuild()
+            elif version != self.version or now - self.refreshed_at >= REFRESH_SECONDS:
+                self.load_new()
+            self.version, self.generation = version, generation
+            self.refreshed_at = now
+            return self.filter
+
+    def rebuild(self):
+        # Sized with headroom, so incremental loads fit until the next purge
+        count = BlacklistedToken.objects.count()
+        self.filter = BloomFilter(max(MIN_CAPACITY, count * 2))
+        self.last_id = 0
+        self.load_new()
+
+    def load_new(self):
+        rows = (
+            BlacklistedToken.objects.filter(id__gt=self.last_id - OVERLAP_IDS)
+            .order_by("id")
+            .values_list("id", "token__jti")
+        )
+        for pk, jti in rows.iterator(chunk_size=5000):
+            self.filter.add(jti)
+            self.last_id = max(self.last_id, pk)
+
+
+blacklist_filter = BlacklistFilter()
+
+
+def bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def token_blacklisted(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: bump(VERSION_KEY))
+
+
+class RefreshToken(tokens.RefreshToken):
+    """
+    Refresh token checking the blacklist through the in-memory filter.
+    """
+
+    def check_blacklist(self):
+        # A filter miss is definite; only possible hits are confirmed with a query
+        if blacklist_filter.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+    def blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        # Tokens issued through the API are outstanding already, which avoids the user lookup
+        outstanding = OutstandingToken.objects.filter(jti=jti).first()
+        if outstanding is None:
+            result = super().blacklist()
+        else:
+            result = BlacklistedToken.objects.get_or_create(token=outstanding)
+        blacklist_filter.add(jti)
+        return result
+
+
+def purge_expired_tokens(chunk_size=PURGE_CHUNK_SIZE):
+    """
+    Deletes expired outstanding tokens, and their blacklist entries, in chunks.
+
+    Each chunk is deleted in its own short transaction, so the purge never holds locks on a
+    large part of the tables. Expired tokens are rejected on their expiry alone, so dropping
+    them does not let any token through.
+
+    Returns:
+        int: The number of outstanding tokens deleted.
+    """
+    now = timezone.now()
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                OutstandingToken.objects.filter(expires_at__lt=now)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            OutstandingToken.objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
+
+    if deleted:
+        # Deleted JTIs cannot be removed from a Bloom filter; every process rebuilds it
+        bump(GENERATION_KEY)
+        blacklist_filter.reset()
+    return deleted
@@ -0,0 +1,100 @@
+from functools import lru_cache
+import logging
+import threading
+
+from django.conf import settings
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from django.template.loader import get_template
+from django.utils.html import strip_tags
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+@lru_cache(maxsize=None)
+def load_template(template_name):
+    """
+    Returns the compiled email template, loaded and parsed once per process.
+    """
+    return get_template(template_name)
+
+
+@lru_cache(maxsize=None)
+def render_static(template_name):
+    """
+    Returns the HTML and plain text of a template rendered without context, rendered once per process.
+    """
+    html = load_template(template_name).render({})
+    return html, strip_tags(html)
+
+
+def render(template_name, context=None):
+    """
+    Returns the HTML and plain text bodies of an email template.
+    """
+    if not context:
+        return render_static(template_name)
+    html = load_template(template_name).render(context)
+    return html, strip_tags(html)
+
+
+def get_connection():
+    """
+    Returns the email connection of the current worker thread, opening it if needed.
+
+    The connection stays open between messages, so consecutive mails sent by a worker share one
+    SMTP handshake and login. It is dropped by `close_connection` after a delivery error.
+    """
+    connection = getattr(_local, "connection", None)
+    if connection is None:
+        connection = _local.connection = mail.get_connection(fail_silently=False)
+    connection.open()
+    return connection
+
+
+def close_connection():
+    connection = getattr(_local, "connection", None)
+    _local.connection = None
+    if connection is not None:
+        try:
+            connection.close()
+        except Exception:
+            logger.debug("Error closing the email connection", exc_info=True)
+
+
+def build_message(subject, template_name, recipients, context=None, from_email=None):
+    html, text = render(template_name, context)
+    message = EmailMultiAlternatives(
+        subject, text, from_email or settings.DEFAULT_FROM_EMAIL, recipients
+    )
+    message.attach_alternative(html, "text/html")
+    return message
+
+
+def send_messages(messages):
+    """
+    Sends a batch of messages over the shared connection.
+
+    On any delivery error the connection is closed, so the next attempt (e.g. a task retry)
+    starts from a fresh one, and the error is re-raised.
+
+    Returns:
+        int: The number of messages sent.
+    """
+    connection = get_connection()
+    try:
+        return connection.send_messages(messages) or 0
+    except Exception:
+        close_connection()
+        raise
+
+
+def send(subject, template_name, recipients, context=None, from_email=None):
+    """
+    Renders and sends one email over the shared connection.
+    """
+    return send_messages(
+        [build_message(subject, template_name, recipients, context, from_email)]
+    )
@@ -0,0 +1,113 @@
+from base64 import b64encode
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from rest_framework.authentication import BasicAuthentication, SessionAuthentication
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import (
+    JWTAuthentication,
+    JWTTokenUserAuthentication,
+)
+from rest_framework_simplejwt.tokens import AccessToken
+
+from authentication.backends import (
+    CachedJWTAuthentication,
+    CachedJWTTokenUserAuthentication,
+    verified_tokens,
+)
+
+LEGACY_STACK = [SessionAuthentication, BasicAuthentication, JWTAuthentication]
+
+
+class BenchmarkView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response({"user": request.user.pk})
+
+
+class Command(BaseCommand):
+    """
+    Management command comparing the request throughput of the API authentication stacks.
+
+    Every scenario dispatches `--requests` requests, one after another as a single worker would,
+    to a minimal authenticated DRF view, so the difference between scenarios is the cost of
+    authentication. The user the requests run as is created in a transaction that is rolled back.
+    """
+
+    help = "Benchmark requests per second per worker for each API authentication stack."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument(
+            "--basic-requests",
+            type=int,
+            default=20,
+            help="Requests for the Basic scenario, which hashes the password on every request.",
+        )
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1 or options["basic_requests"] < 1:
+            raise CommandError("--requests and --basic-requests must be positive.")
+
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username="benchmark-auth", password="benchmark-auth-password"
+            )
+            token = str(AccessToken.for_user(user))
+            basic = b64encode(b"benchmark-auth:benchmark-auth-password").decode()
+
+            self.run_scenario(
+                "before: Basic credentials",
+                LEGACY_STACK,
+                f"Basic {basic}",
+                options["basic_requests"],
+            )
+            scenarios = [
+                ("before: JWT, DB user", LEGACY_STACK, f"Bearer {token}"),
+                ("before: JWT, token user", [JWTTokenUserAuthentication], f"Bearer {token}"),
+                ("after: cached JWT, DB user", [CachedJWTAuthentication], f"Bearer {token}"),
+                (
+                    "after: cached JWT, token user",
+                    [CachedJWTTokenUserAuthentication],
+                    f"Bearer {token}",
+                ),
+            ]
+            for label, classes, header in scenarios:
+                self.run_scenario(label, classes, header, options["requests"])
+
+            transaction.set_rollback(True)
+
+    def run_scenario(self, label, classes, header, count):
+        view = BenchmarkView.as_view(authentication_classes=classes)
+        factory = RequestFactory()
+        verified_tokens.clear()
+
+        # Warm up, and check the scenario actually authenticates
+        response = view(factory.get("/benchmark/", HTTP_AUTHORIZATION=header))
+        if response.status_code != 200:
+            raise CommandError(f"{label}: request failed with {response.status_code}.")
+
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_queries):
+            started = time.perf_counter()
+            for _ in range(count):
+                view(factory.get("/benchmark/", HTTP_AUTHORIZATION=header))
+            elapsed = max(time.perf_counter() - started, 1e-6)
+
+        self.stdout.write(
+            f"{label:<32} {count / elapsed:>9.0f} req/s  "
+            f"{elapsed / count * 1e6:>8.1f} us/req  "
+            f"{queries / count:.1f} queries/req"
+        )
@@ -0,0 +1,124 @@
+"""
+Cache-backed store for password reset one-time passwords.
+
+Each email has at most one live OTP, kept in the cache framework with a TTL so it expires on
+its own. Only a keyed hash of the OTP is stored, verification uses a constant-time comparison,
+and every verification attempt counts against a per-email cap; once the cap is reached the OTP
+is discarded and a new one must be requested. Issuing is throttled per email as well, since a new
+OTP starts a new attempt count.
+
+The cache must be shared by every process serving the API (see `check_shared_cache`): with a
+per-process cache such as locmem, an OTP issued by one worker is unknown to the others.
+"""
+
+from hashlib import sha256
+import hmac
+import secrets
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.utils.crypto import salted_hmac
+
+OTP_DIGITS = getattr(settings, "PASSWORD_RESET_OTP_DIGITS", 6)
+OTP_TTL_SECONDS = getattr(settings, "PASSWORD_RESET_OTP_TTL", 600)
+OTP_MAX_ATTEMPTS = getattr(settings, "PASSWORD_RESET_OTP_MAX_ATTEMPTS", 5)
+# At most OTP_MAX_ISSUES OTPs per email within OTP_ISSUE_WINDOW seconds
+OTP_MAX_ISSUES = getattr(settings, "PASSWORD_RESET_OTP_MAX_ISSUES", 3)
+OTP_ISSUE_WINDOW = getattr(settings, "PASSWORD_RESET_OTP_ISSUE_WINDOW", 3600)
+
+# Cache backends keeping their data in the process, which other processes cannot see
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+KEY_SALT = "authentication.otp"
+
+
+def _key(email, kind):
+    digest = sha256(email.strip().lower().encode()).hexdigest()
+    return f"password-reset-otp:{kind}:{digest}"
+
+
+def _hash(email, otp):
+    return salted_hmac(KEY_SALT, f"{email.strip().lower()}:{otp}").hexdigest()
+
+
+class IssueThrottled(Exception):
+    """
+    Raised when too many OTPs were issued for an email within the issue window.
+    """
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Fails the system checks run at startup when OTPs would be kept in a per-process cache.
+    """
+    backend = settings.CACHES.get("default", {}).get("BACKEND")
+    if backend in PROCESS_LOCAL_CACHES:
+        return [
+            checks.Error(
+                f"The default cache ({backend}) is not shared between processes, so password "
+                "reset OTPs issued by one process cannot be verified by another.",
+                hint="Set CACHE_URL to a shared cache such as redis://, memcache:// or filecache://.",
+                id="authentication.E001",
+            )
+        ]
+    return []
+
+
+def issue(email):
+    """
+    Generates a new OTP for the email, replacing any previous one, and returns it.
+
+    Raises:
+        IssueThrottled: If `OTP_MAX_ISSUES` OTPs were already issued for the email within the window.
+    """
+    issues_key = _key(email, "issues")
+    cache.add(issues_key, 0, timeout=OTP_ISSUE_WINDOW)
+    try:
+        issues = cache.incr(issues_key)
+    except ValueError:
+        # Expired between add() and incr(): a new window starts
+        cache.set(issues_key, 1, timeout=OTP_ISSUE_WINDOW)
+        issues = 1
+    if issues > OTP_MAX_ISSUES:
+        raise IssueThrottled()
+
+    otp = f"{secrets.randbelow(10 ** OTP_DIGITS):0{OTP_DIGITS}d}"
+    cache.set_many(
+        {_key(email, "hash"): _hash(email, otp), _key(email, "attempts"): 0},
+        timeout=OTP_TTL_SECONDS,
+    )
+    return otp
+
+
+def verify(email, otp):
+    """
+    Checks an OTP for the email, counting the attempt.
+
+    Returns:
+        bool: True if the OTP matches a live OTP that has attempts left.
+    """
+    try:
+        attempts = cache.incr(_key(email, "attempts"))
+    except ValueError:
+        # No live OTP for this email (never issued, expired or discarded)
+        return False
+
+    expected = cache.get(_key(email, "hash"))
+    if expected is None:
+        return False
+    if attempts > OTP_MAX_ATTEMPTS:
+        discard(email)
+        return False
+    return hmac.compare_digest(expected, _hash(email, str(otp)))
+
+
+def discard(email):
+    """
+    Removes the OTP of the email, e.g. once it has been used.
+    """
+    cache.delete_many([_key(email, "hash"), _key(email, "attempts")])
@@ -1,4 +1,7 @@
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
 
 from rest_framework import serializers
 from django.contrib.auth.models import User
@@ -6,7 +9,9 @@ from rest_framework.validators import UniqueValidator
 from django.contrib.auth.password_validation import validate_password
 
 from django.core.validators import EmailValidator
-from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from . import otp as otp_store
+from .blacklist import RefreshToken
 from .tasks import password_reset_successfull, send_password_reset_otp
 
 from django.utils.http import urlsafe_base64_decode
@@ -29,6 +34,8 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     :return: A token containing the user's username.
     """
 
+    token_class = RefreshToken
+
     @classmethod
     def get_token(cls, user):
         """
@@ -61,6 +68,14 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         return data
 
 
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh serializer whose refresh tokens check the blacklist through the in-memory filter.
+    """
+
+    token_class = RefreshToken
+
+
 class GetUserDataSerializer(serializers.ModelSerializer):
     """
     Serializer class for retrieving user data with specified fields.
@@ -186,7 +201,7 @@ class RegisterSerializer(serializers.ModelSerializer):
         user.set_password(validated_data["password"])
         user.save()
 
-        logger.info(f"User {user.username} created successfully.")
+        logger.info("User %s created successfully.", user.username)
         return user
 
 
@@ -266,7 +281,7 @@ class ChangePasswordSerializer(serializers.Serializer):
         user = self.context["request"].user
         user.set_password(self.validated_data["new_password"])
         user.save()
-        logger.info(f"User {user.username} changed their password successfully.")
+        logger.info("User %s changed their password successfully.", user.username)
         return user
 
 
@@ -419,14 +434,15 @@ class PasswordResetSerializer(serializers.Serializer):
 
         This method queries the User model to check if a user exists with the provided email value. If no user is found, a validation error is raised indicating that the user with the email does not exist. Otherwise, the email value is considered valid and returned.
         """
-        try:
-            user = User.objects.get(email=value)
-        except ObjectDoesNotExist:
+        if not User.objects.filter(email=value).exists():
             raise serializers.ValidationError("User with this email does not exist.")
         return value
 
-    def send_otp_email(self, user, otp):
-        send_password_reset_otp(user.email, otp)
+    def send_otp_email(self, email, otp):
+        """
+        Queues the OTP email; delivery runs on a Celery worker with retries.
+        """
+        send_password_reset_otp.delay(email, otp)
 
 
 class PasswordResetConfirmSerializer(serializers.Serializer):
@@ -441,15 +457,7 @@ Attributes:
 
 Methods:
     validate(self, attrs): Validates the input data and checks OTP, email, and password match.
-    save(self): Saves the new password for the user and clears the session data after successful reset.
-""" """
-Saves the new password for the user and clears the session data after successful reset.
-
-Parameters:
-    None
-
-Returns:
-    None
+    save(self): Saves the new password for the user and discards the OTP after successful reset.
 """
 
     email = serializers.EmailField()
@@ -458,32 +466,23 @@ Returns:
     new_password2 = serializers.CharField()
 
     def validate(self, attrs):
-        request = self.context.get("request")
-
         email = attrs.get("email")
         otp = attrs.get("otp")
 
-        # Check if the OTP matches the one in the session
-        session_otp = request.session.get("reset_otp")
-        session_email = request.session.get("reset_email")
-
-        if session_otp != otp or session_email != email:
-            raise ValidationError("Invalid OTP or email")
-
         if attrs["new_password1"] != attrs["new_password2"]:
             raise ValidationError("The two password fields did not match")
 
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
-            raise ValidationError("User does not exist")
+        # Checked against the cache-backed OTP store; every check counts as an attempt
+        if not otp_store.verify(email, otp):
+            raise ValidationError("Invalid OTP or email")
 
-        attrs["user"] = user
         return attrs
 
     def save(self):
         """
-        Saves the new password for the user and clears the session data after successful reset.
+        Saves the new password for the user and discards the OTP after successful reset.
+
+        This is the only step of the reset flow that reads or writes the database.
 
         Parameters:
             None
@@ -491,12 +490,13 @@ Returns:
         Returns:
             None
         """
-        user = self.validated_data["user"]
-        new_password = self.validated_data["new_password1"]
-        user.set_password(new_password)
-        user.save()
-        # Clear the session data after successful password reset
-        request = self.context.get("request")
-        request.session.pop("reset_otp", None)
-        request.session.pop("reset_email", None)
-        password_reset_successfull(user.email)
+        email = self.validated_data["email"]
+        try:
+            user = User.objects.get(email=email)
+        except User.DoesNotExist:
+            raise serializers.ValidationError("User does not exist")
+
+        user.set_password(self.validated_data["new_password1"])
+        user.save(update_fields=["password"])
+        otp_store.discard(email)
+        transaction.on_commit(lambda: password_reset_successfull.delay(user.email))
@@ -1,45 +1,74 @@
-from celery import shared_task
-from django.contrib.auth.tokens import PasswordResetTokenGenerator
-from django.contrib.auth.models import User
-from django.utils.http import urlsafe_base64_encode
-from django.utils.encoding import force_bytes
-from django.template.loader import render_to_string
-from django.core.mail import send_mail
-from django.utils.html import strip_tags
+from smtplib import SMTPException
+import logging
 
+from celery import Task, shared_task
 
+from . import blacklist, mailer
+
+logger = logging.getLogger(__name__)
+
+# Delivery errors worth retrying: SMTP errors and network failures (timeouts, refused connections)
+RETRY_ON = (SMTPException, OSError)
+
+
+class DeliveryTask(Task):
+    """
+    Base of the mail tasks: retries delivery errors with exponential backoff on a worker.
+
+    Without a broker the tasks run eagerly in the calling process (`CELERY_TASK_ALWAYS_EAGER`),
+    where every retry and its backoff would run inline and hold the request. The first delivery
+    error is then logged and ends the task instead; `delay()` still returns to the caller.
+    """
+
+    def retry(self, *args, exc=None, **kwargs):
+        if exc is not None and self.app.conf.task_always_eager:
+            logger.warning("Delivery of %s failed, not retried without a broker: %r", self.name, exc)
+            raise exc
+        return super().retry(*args, exc=exc, **kwargs)
+
+
+@shared_task(
+    base=DeliveryTask,
+    autoretry_for=RETRY_ON,
+    retry_backoff=True,
+    retry_backoff_max=300,
+    retry_jitter=True,
+    max_retries=5,
+)
 def send_password_reset_otp(email, otp):
-    user = User.objects.get(email=email)
-    subject = "OTP for Password Reset"
-
-    html_message = render_to_string("email/password-reset-mail.html", {"otp": otp})
-    from_email = "noreply@example.com"
-    plain_message = strip_tags(html_message)
-    user_email = user.email
-    recipient_list = [user_email]
-    send_mail(
-        subject, plain_message, from_email, recipient_list, html_message=html_message
+    """
+    Sends the password reset OTP to the given address, retrying with exponential backoff on delivery errors.
+    """
+    mailer.send(
+        "OTP for Password Reset",
+        "email/password-reset-mail.html",
+        [email],
+        context={"otp": otp},
     )
-
-    print("Password reset OTP successfully sent")
+    logger.info("Password reset OTP sent")
 
 
+@shared_task(
+    base=DeliveryTask,
+    autoretry_for=RETRY_ON,
+    retry_backoff=True,
+    retry_backoff_max=300,
+    retry_jitter=True,
+    max_retries=5,
+)
 def password_reset_successfull(email):
-    user = User.objects.get(email=email)
-    subject = "Password Reset Successful"
-
-    html_message = render_to_string("email/password-reset-success.html", {})
-    from_email = "noreply@example.com"
-    plain_message = strip_tags(html_message)
-    user_email = user.email
-    recipient_list = [user_email]
-    send_mail(
-        subject,
-        plain_message,
-        from_email,
-        recipient_list,
-        html_message=html_message,
-        fail_silently=True,
-    )
+    """
+    Sends the password reset confirmation to the given address, retrying with exponential backoff on delivery errors.
+    """
+    mailer.send("Password Reset Successful", "email/password-reset-success.html", [email])
+    logger.info("Password reset confirmation sent")
+
 
-    print("Password reset OTP successfully sent")
+@shared_task
+def purge_expired_tokens():
+    """
+    Periodic task deleting expired outstanding tokens and their blacklist entries in chunks.
+    """
+    deleted = blacklist.purge_expired_tokens()
+    logger.info("Purged %s expired tokens", deleted)
+    return deleted
@@ -1,3 +1,241 @@
+from datetime import timedelta
+from smtplib import SMTPServerDisconnected
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTTokenUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import blacklist, mailer
+from .backends import CachedJWTTokenUserAuthentication, verified_tokens
+from . import otp as otp_store
+from .tasks import password_reset_successfull, send_password_reset_otp
+
+
+class AuthMailTaskTests(TestCase):
+    """
+    Runs the auth mail tasks eagerly against Django's locmem email backend.
+    """
+
+    def setUp(self):
+        mailer.close_connection()
+
+    def test_password_reset_request_sends_the_otp(self):
+        User.objects.create_user(username="reader", email="reader@example.com")
+
+        response = self.client.post("/auth/password-reset/", {"email": "reader@example.com"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["reader@example.com"])
+        self.assertEqual(mail.outbox[0].alternatives[0][1], "text/html")
+
+    def test_messages_reuse_one_connection(self):
+        send_password_reset_otp.delay("a@example.com", "123456")
+        password_reset_successfull.delay("b@example.com")
+
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIs(mail.outbox[0].connection, mail.outbox[1].connection)
+
+    def test_delivery_errors_are_retried_on_a_worker(self):
+        with self.settings(CELERY_TASK_ALWAYS_EAGER=False), mock.patch.object(
+            mailer, "send_messages", side_effect=[SMTPServerDisconnected("gone"), 1]
+        ) as send_messages:
+            password_reset_successfull.apply(args=["a@example.com"])
+
+        self.assertEqual(send_messages.call_count, 2)
+
+    def test_delivery_errors_are_not_retried_inline_without_a_broker(self):
+        with mock.patch.object(
+            mailer, "send_messages", side_effect=[SMTPServerDisconnected("gone"), 1]
+        ) as send_messages:
+            result = password_reset_successfull.delay("a@example.com")
+
+        self.assertEqual(send_messages.call_count, 1)
+        self.assertTrue(result.failed())
+
+
+class PasswordResetOtpTests(TestCase):
+    """
+    Covers the cache-backed OTP store and the reset flow built on it.
+    """
+
+    def setUp(self):
+        cache.clear()
+        mailer.close_connection()
+        self.user = User.objects.create_user(
+            username="reader", email="reader@example.com", password="old-password"
+        )
+
+    def confirm(self, otp, password="new-password-123"):
+        return self.client.post(
+            "/auth/password-reset-confirm/",
+            {
+                "email": "reader@example.com",
+                "otp": otp,
+                "new_password1": password,
+                "new_password2": password,
+            },
+        )
+
+    def test_reset_flow_only_touches_the_database_to_set_the_password(self):
+        with self.assertNumQueries(1):
+            self.client.post("/auth/password-reset/", {"email": "reader@example.com"})
+        # Replaces the mailed OTP with a known one
+        otp = otp_store.issue("reader@example.com")
+        wrong = "000000" if otp != "000000" else "111111"
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.confirm(wrong).status_code, 400)
+        with self.assertNumQueries(2):
+            response = self.confirm(otp)
+
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("new-password-123"))
+        # The OTP is single use
+        self.assertFalse(otp_store.verify("reader@example.com", otp))
+
+    def test_attempts_are_capped(self):
+        otp = otp_store.issue("reader@example.com")
+        wrong = "000000" if otp != "000000" else "111111"
+        for _ in range(otp_store.OTP_MAX_ATTEMPTS - 1):
+            self.assertFalse(otp_store.verify("reader@example.com", wrong))
+
+        self.assertTrue(otp_store.verify("reader@example.com", otp))
+        self.assertFalse(otp_store.verify("reader@example.com", otp))
+
+    def test_unknown_or_expired_otp_is_rejected(self):
+        self.assertFalse(otp_store.verify("reader@example.com", "123456"))
+        otp = otp_store.issue("reader@example.com")
+        otp_store.discard("reader@example.com")
+        self.assertFalse(otp_store.verify("reader@example.com", otp))
+
+    def test_issuing_is_throttled_per_email(self):
+        for _ in range(otp_store.OTP_MAX_ISSUES):
+            response = self.client.post("/auth/password-reset/", {"email": "reader@example.com"})
+            self.assertEqual(response.status_code, 200)
+
+        response = self.client.post("/auth/password-reset/", {"email": "reader@example.com"})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(len(mail.outbox), otp_store.OTP_MAX_ISSUES)
+        with self.assertRaises(otp_store.IssueThrottled):
+            otp_store.issue("Reader@Example.com")
+
+    def test_process_local_caches_fail_the_system_checks(self):
+        locmem = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        with self.settings(CACHES=locmem):
+            self.assertEqual(
+                [error.id for error in otp_store.check_shared_cache(None)], ["authentication.E001"]
+            )
+        self.assertEqual(otp_store.check_shared_cache(None), [])
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """
+    Covers the verified token cache of the JWT authentication classes.
+    """
+
+    def setUp(self):
+        verified_tokens.clear()
+        self.user = User.objects.create_user(username="reader")
+        self.token = str(AccessToken.for_user(self.user))
+        self.auth = CachedJWTTokenUserAuthentication()
+
+    def authenticate(self, token):
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        return self.auth.authenticate(request)
+
+    def test_verified_tokens_are_reused_without_queries(self):
+        with mock.patch.object(
+            JWTTokenUserAuthentication,
+            "get_validated_token",
+            wraps=JWTTokenUserAuthentication.get_validated_token.__get__(self.auth),
+        ) as verify, self.assertNumQueries(0):
+            first, _ = self.authenticate(self.token)
+            second, _ = self.authenticate(self.token)
+
+        self.assertEqual(verify.call_count, 1)
+        self.assertEqual(first.pk, str(self.user.pk))
+        self.assertEqual(second.pk, str(self.user.pk))
+
+    def test_tampered_token_with_a_cached_jti_is_verified(self):
+        self.authenticate(self.token)
+        header, payload, signature = self.token.split(".")
+        tampered = ".".join([header, payload, signature[::-1]])
+
+        with self.assertRaises(InvalidToken):
+            self.authenticate(tampered)
+
+
+class RefreshTokenBlacklistTests(TestCase):
+    """
+    Covers the in-memory blacklist filter used on token refresh and the expired token purge.
+    """
+
+    def setUp(self):
+        cache.clear()
+        blacklist.blacklist_filter.reset()
+        self.user = User.objects.create_user(username="reader", password="password-123")
+
+    def refresh(self, token):
+        return self.client.post("/auth/signin/refresh/", {"refresh": str(token)})
+
+    def test_refresh_skips_the_blacklist_query_and_rejects_rotated_tokens(self):
+        token = blacklist.RefreshToken.for_user(self.user)
+        blacklist.blacklist_filter.might_contain("warm-up")
+
+        with mock.patch.object(
+            blacklist.tokens.RefreshToken, "check_blacklist"
+        ) as check_blacklist:
+            response = self.refresh(token)
+
+        self.assertEqual(response.status_code, 200)
+        check_blacklist.assert_not_called()
+        # The rotated token was blacklisted and the filter now sends it to the database
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_tokens_blacklisted_elsewhere_are_rejected_once_committed(self):
+        token = blacklist.RefreshToken.for_user(self.user)
+        blacklist.blacklist_filter.might_contain("warm-up")
+
+        # Another process blacklists the token: this process' filter only learns of it through
+        # the version stamp bumped when the blacklisting transaction commits
+        with mock.patch.object(blacklist.blacklist_filter, "add"):
+            with self.captureOnCommitCallbacks() as callbacks:
+                token.blacklist()
+            self.assertFalse(blacklist.blacklist_filter.might_contain(token["jti"]))
+            for callback in callbacks:
+                callback()
+
+        self.assertTrue(blacklist.blacklist_filter.might_contain(token["jti"]))
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_unchanged_stamps_skip_the_database(self):
+        token = blacklist.RefreshToken.for_user(self.user)
+        blacklist.blacklist_filter.might_contain("warm-up")
+
+        with self.assertNumQueries(0):
+            self.assertFalse(blacklist.blacklist_filter.might_contain(token["jti"]))
+
+    def test_purge_deletes_expired_tokens_in_chunks(self):
+        expired = [blacklist.RefreshToken.for_user(self.user) for _ in range(5)]
+        live = blacklist.RefreshToken.for_user(self.user)
+        for token in expired[:2]:
+            token.blacklist()
+        OutstandingToken.objects.exclude(jti=live["jti"]).update(
+            expires_at=timezone.now() - timedelta(days=1)
+        )
 
-# Create your tests here.
+        self.assertEqual(blacklist.purge_expired_tokens(chunk_size=2), 5)
+        self.assertEqual(
+            list(OutstandingToken.objects.values_list("jti", flat=True)), [live["jti"]]
+        )
+        self.assertFalse(BlacklistedToken.objects.exists())
@@ -1,7 +1,4 @@
-import random
 from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.core.exceptions import ObjectDoesNotExist
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.contrib.auth.models import User
@@ -10,10 +7,11 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
 from django.conf import settings
 import logging
-from django.contrib.sessions.models import Session
 
 logger = logging.getLogger(__name__)
 
+from . import otp as otp_store
+from .blacklist import RefreshToken
 from .serializers import (
     CustomTokenObtainPairSerializer,
     GetUserDataSerializer,
@@ -115,25 +113,24 @@ class ChangePasswordView(generics.UpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self, queryset=None):
-        user = self.request.user
-        logger.debug(f"Authenticated user: {user}")
-        return user
+        return self.request.user
 
     def update(self, request, *args, **kwargs):
+        # Request bodies and headers carry passwords and tokens and are never logged
         user = self.get_object()
-        logger.debug(f"Received request data: {request.data}")
-        logger.debug(f"Request headers: {request.headers}")
-        logger.debug(f"User: {user}")
+        logger.debug("Password change requested", extra={"user_id": user.pk})
         serializer = self.get_serializer(
             data=request.data, context={"request": request}
         )
         if serializer.is_valid():
-            logger.debug("Serializer valid, updating password")
             serializer.save()
             return Response(
                 {"detail": "Password updated successfully"}, status=status.HTTP_200_OK
             )
-        logger.debug(f"Serializer errors: {serializer.errors}")
+        logger.debug(
+            "Password change rejected",
+            extra={"user_id": user.pk, "fields": sorted(serializer.errors)},
+        )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -161,7 +158,10 @@ class UpdateProfileView(generics.UpdateAPIView):
     serializer_class = UpdateUserSerializer
 
     def update(self, request, *args, **kwargs):
-        logger.debug(f"Received request data: {request.data}")
+        logger.debug(
+            "Profile update requested",
+            extra={"user_id": request.user.pk, "fields": sorted(request.data)},
+        )
         return super().update(request, *args, **kwargs)
 
 
@@ -233,37 +233,20 @@ class PasswordResetView(generics.GenericAPIView):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             user_email = serializer.validated_data["email"]
-            try:
-                user = User.objects.get(email=user_email)
-                otp = generate_otp()
-                serializer.send_otp_email(user, otp)
-
-                # Save the OTP to the user's session for verification later
-                request.session["reset_otp"] = otp
-                request.session["reset_email"] = user_email
-                request.session.save()
-                print(
-                    "OTP and email saved in session:",
-                    request.session["reset_otp"],
-                    request.session["reset_email"],
-                )
-
-                # Debug logs to verify session saving
-                session_key = request.session.session_key
-                session = Session.objects.get(session_key=session_key)
-                print("Session saved:", session.session_data)
 
-                return Response("OTP sent to your email.", status=status.HTTP_200_OK)
-            except ObjectDoesNotExist:
+            # The OTP lives in the cache with a TTL; nothing is written to the database
+            try:
+                otp = otp_store.issue(user_email)
+            except otp_store.IssueThrottled:
                 return Response(
-                    "User with this email does not exist.",
-                    status=status.HTTP_404_NOT_FOUND,
+                    "Too many OTPs requested for this email. Try again later.",
+                    status=status.HTTP_429_TOO_MANY_REQUESTS,
                 )
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
+            serializer.send_otp_email(user_email, otp)
+            logger.info("Password reset OTP issued")
 
-def generate_otp():
-    return str(random.randint(100000, 999999))
+            return Response("OTP sent to your email.", status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class PasswordResetConfirmView(APIView):
@@ -297,9 +280,6 @@ class PasswordResetConfirmView(APIView):
         Returns:
             Response: The HTTP response indicating the status of the password reset confirmation process.
         """
-        session_otp = request.session.get("reset_otp")
-        session_email = request.session.get("reset_email")
-
         serializer = PasswordResetConfirmSerializer(
             data=request.data, context={"request": request}
         )
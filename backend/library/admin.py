@@ -3,8 +3,8 @@ from django.contrib import admin
 # Book and Category Model
 from .models import Book, Category
 
-# Member Model
-from members.models import Members
+# Member and Plan Policy Model
+from members.models import Members, PlanPolicy
 
 # Library Management Model
 from library_management.models import LibraryManagement
@@ -107,3 +107,26 @@ class LibraryManagementAdmin(admin.ModelAdmin):
 
 
 admin.site.register(LibraryManagement, LibraryManagementAdmin)
+
+
+# Register Plan Policy Model.
+class PlanPolicyAdmin(admin.ModelAdmin):
+    """
+    Admin class for managing PlanPolicy model in the Django admin panel.
+
+    Saving or deleting a policy invalidates the in-memory plan policy registry of every process.
+
+    Attributes:
+        list_display (tuple): A tuple of fields to display in the list view of PlanPolicy model.
+    """
+
+    list_display = (
+        "plan",
+        "max_books",
+        "daily_late_fee",
+        "loan_period_days",
+        "updated_at",
+    )
+
+
+admin.site.register(PlanPolicy, PlanPolicyAdmin)
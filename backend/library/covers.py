@@ -0,0 +1,180 @@
+"""
+Resized WebP and JPEG variants of book covers.
+
+Uploads are stored as they come; list pages should not have to download them. After a cover
+is saved, `library.tasks.process_book_cover` renders every size in `VARIANTS` in every format
+in `FORMATS` off the request path, stores them next to the original and records their paths in
+`Book.image_variants`, which `BookSerializer` exposes as a `variants` map of URLs.
+
+`render_variants` only takes and returns bytes, so it can run in a Celery worker or in a
+process pool (see the `backfill_covers` command) without touching the database.
+"""
+
+from hashlib import sha256
+from io import BytesIO
+import os
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from lms_project.caching import invalidate_on_commit
+from .models import Book, book_image_storage as storage
+
+# Fixed (width, height) of each variant; covers are center-cropped to the 2:3 box
+VARIANTS = {
+    "thumbnail": (160, 240),
+    "medium": (480, 720),
+}
+
+# File extension -> (Pillow format, save options)
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+BACKGROUND = (255, 255, 255)
+
+
+class CoverError(Exception):
+    """
+    Raised when an uploaded cover cannot be decoded as an image.
+    """
+
+
+def variant_path(source_name, variant, extension, content):
+    """
+    Returns the storage path of a variant, e.g. `book_images/ab/<hash>/thumbnail/<hash>.webp`.
+
+    Covers are content-addressed, so identical uploads share their variants. Variants are named
+    after their own content too: a re-render with other sizes or encoder settings gets new
+    paths instead of changing files that are served as immutable.
+    """
+    content_hash = sha256(content).hexdigest()
+    return f"{os.path.splitext(source_name)[0]}/{variant}/{content_hash}.{extension}"
+
+
+def render_variants(data):
+    """
+    Renders every variant of a cover in every format.
+
+    Parameters:
+        data (bytes): The original image file.
+
+    Returns:
+        dict: (variant, extension) -> encoded image bytes.
+
+    Raises:
+        CoverError: If the data is not an image Pillow can decode.
+    """
+    try:
+        image = Image.open(BytesIO(data))
+        # Lets the JPEG decoder downscale while decoding, for the largest variant
+        largest = max(VARIANTS.values())
+        image.draft("RGB", (largest[0] * 2, largest[1] * 2))
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        raise CoverError(str(error)) from error
+
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        flattened = Image.new("RGB", image.size, BACKGROUND)
+        flattened.paste(image, mask=image.getchannel("A"))
+        image = flattened
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    rendered = {}
+    for variant, size in VARIANTS.items():
+        resized = ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+        for extension, (image_format, options) in FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, image_format, **options)
+            rendered[variant, extension] = buffer.getvalue()
+    return rendered
+
+
+def store_variants(book_id, source_name, rendered):
+    """
+    Saves rendered variants and records their paths on the book.
+
+    The book is only updated if its cover is still `source_name`, so a slow render never
+    overwrites the variants of a newer upload; the variants of a cover replaced meanwhile are
+    discarded again.
+
+    Returns:
+        bool: True if the book was updated.
+    """
+    variants = {}
+    for (variant, extension), content in rendered.items():
+        path = variant_path(source_name, variant, extension, content)
+        variants.setdefault(variant, {})[extension] = storage.save(
+            path, ContentFile(content)
+        )
+
+    updated = Book.objects.filter(pk=book_id, image=source_name).update(
+        image_variants=variants, updated_at=timezone.now()
+    )
+    if updated:
+        invalidate_on_commit("books")
+    else:
+        discard_variants(source_name)
+    return bool(updated)
+
+
+def discard_variants(source_name):
+    """
+    Deletes the variant directory of a cover once no book uses it anymore.
+
+    Identical uploads share their variants, so the directory is kept while any book still has
+    `source_name` as its cover. The original file is left in place.
+
+    Returns:
+        bool: True if the variants were deleted.
+    """
+    if not source_name or Book.objects.filter(image=source_name).exists():
+        return False
+    delete_directory(os.path.splitext(source_name)[0])
+    return True
+
+
+def delete_directory(directory):
+    if not storage.exists(directory):
+        return
+    directories, files = storage.listdir(directory)
+    for name in directories:
+        delete_directory(f"{directory}/{name}")
+    for name in files:
+        storage.delete(f"{directory}/{name}")
+    storage.delete(directory)
+
+
+def process_cover(book_id):
+    """
+    Renders and stores the variants of a book's current cover.
+
+    Returns:
+        bool: True if variants were stored; False if the book or its cover is gone.
+    """
+    source_name = (
+        Book.objects.filter(pk=book_id).values_list("image", flat=True).first()
+    )
+    if not source_name or not storage.exists(source_name):
+        return False
+    with storage.open(source_name, "rb") as stream:
+        data = stream.read()
+    return store_variants(book_id, source_name, render_variants(data))
+
+
+def variant_urls(variants, request=None):
+    """
+    Returns the `variants` map of a book as URLs, absolute when a request is given.
+    """
+    urls = {}
+    for variant, paths in (variants or {}).items():
+        urls[variant] = {}
+        for extension, path in paths.items():
+            url = storage.url(path)
+            urls[variant][extension] = request.build_absolute_uri(url) if request else url
+    return urls
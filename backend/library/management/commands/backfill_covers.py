@@ -0,0 +1,108 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+
+from library import covers
+from library.models import Book
+
+
+def render(job):
+    """
+    Renders one cover in a pool process; errors are returned, not raised, to keep the pool going.
+    """
+    book_id, source_name, data = job
+    try:
+        return book_id, source_name, covers.render_variants(data), None
+    except covers.CoverError as error:
+        return book_id, source_name, None, str(error)
+
+
+class Command(BaseCommand):
+    """
+    Management command rendering the cover variants of existing books in parallel.
+
+    The covers are read from storage in the main process, decoded, resized and encoded in a
+    pool of `--workers` processes, and the variants are stored and recorded by the main process,
+    so the pool processes never use the database. The pool processes are spawned, not forked,
+    so they never inherit the main process's database connection. Books that already have variants are skipped
+    unless `--all` is given.
+    """
+
+    help = "Render the thumbnail and medium variants of existing book covers."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of processes rendering covers (default: one per core).",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Re-render covers that already have variants.",
+        )
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1:
+            raise CommandError("--workers must be positive.")
+
+        books = Book.objects.exclude(image="").exclude(image__isnull=True)
+        if not options["all"]:
+            books = books.filter(image_variants={})
+        books = books.order_by("pk").values_list("pk", "image")
+
+        processed = failed = 0
+        started = time.perf_counter()
+        # Spawned processes start from a fresh interpreter and set Django up before their first job
+        with ProcessPoolExecutor(
+            max_workers=options["workers"],
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=django.setup,
+        ) as executor:
+            # Bounds the number of originals held in memory at once
+            window = options["workers"] * 4
+            batch = []
+            for book_id, source_name in books.iterator(chunk_size=500):
+                batch.append((book_id, source_name))
+                if len(batch) == window:
+                    done, errors = self.process(executor, batch)
+                    processed, failed = processed + done, failed + errors
+                    batch = []
+            if batch:
+                done, errors = self.process(executor, batch)
+                processed, failed = processed + done, failed + errors
+        elapsed = max(time.perf_counter() - started, 1e-6)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Processed {processed} covers in {elapsed:.2f}s "
+                f"({processed / elapsed:.1f} covers/s on {options['workers']} workers), "
+                f"{failed} failed."
+            )
+        )
+
+    def process(self, executor, batch):
+        jobs = []
+        failed = 0
+        for book_id, source_name in batch:
+            try:
+                with covers.storage.open(source_name, "rb") as stream:
+                    jobs.append((book_id, source_name, stream.read()))
+            except OSError as error:
+                self.stderr.write(f"Book {book_id}: cannot read {source_name}: {error}")
+                failed += 1
+
+        processed = 0
+        for book_id, source_name, rendered, error in executor.map(render, jobs):
+            if error is not None:
+                self.stderr.write(f"Book {book_id}: {error}")
+                failed += 1
+                continue
+            covers.store_variants(book_id, source_name, rendered)
+            processed += 1
+        return processed, failed
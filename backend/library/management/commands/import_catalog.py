@@ -0,0 +1,228 @@
+from contextlib import nullcontext
+from itertools import islice
+import csv
+import json
+import os
+import sys
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from library.models import Book, Category
+from library_management import counters
+from lms_project.caching import bump_generation
+
+TRUE_VALUES = {"1", "true", "yes", "y"}
+FALSE_VALUES = {"", "0", "false", "no", "n"}
+
+
+class RowError(Exception):
+    """
+    Raised when a catalog row cannot be imported. The message is written to the reject file.
+    """
+
+
+def read_rows(stream, file_format):
+    """
+    Yields (line number, row dict) pairs from a CSV or JSONL stream, one line at a time.
+    """
+    if file_format == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            row = {"_raw": line.rstrip("\n"), "_error": f"Invalid JSON: {error}"}
+        if not isinstance(row, dict):
+            row = {"_raw": line.rstrip("\n"), "_error": "Expected a JSON object."}
+        yield line_number, row
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def clean_text(row, field, max_length):
+    value = str(row.get(field) or "").strip()
+    if not value:
+        raise RowError(f"'{field}' is required.")
+    if len(value) > max_length:
+        raise RowError(f"'{field}' is longer than {max_length} characters.")
+    return value
+
+
+def clean_row(row):
+    """
+    Validates a catalog row and returns its cleaned values.
+
+    Raises:
+        RowError: If a value is missing or invalid.
+    """
+    if "_error" in row:
+        raise RowError(row["_error"])
+
+    try:
+        quantity = int(str(row.get("quantity", "")).strip())
+    except ValueError:
+        raise RowError("'quantity' must be an integer.")
+    if quantity < 0:
+        raise RowError("Quantity cannot be negative.")
+
+    best_selling = str(row.get("is_best_selling", "")).strip().lower()
+    if best_selling not in TRUE_VALUES | FALSE_VALUES:
+        raise RowError("'is_best_selling' must be a boolean.")
+
+    return {
+        "name": clean_text(row, "name", Book._meta.get_field("name").max_length),
+        "author": clean_text(row, "author", Book._meta.get_field("author").max_length),
+        "category": clean_text(row, "category", Category._meta.get_field("name").max_length),
+        "quantity": quantity,
+        "is_best_selling": best_selling in TRUE_VALUES,
+    }
+
+
+class Command(BaseCommand):
+    """
+    Management command importing a book catalog from a CSV or JSONL file of any size.
+
+    Rows are streamed and inserted in chunks: each chunk resolves its category names through an
+    in-memory map (creating the missing categories with one `bulk_create`), inserts its books with
+    another `bulk_create` and refreshes their search vectors with a single UPDATE, all in one
+    transaction together with the dashboard counter.
+
+    Each row needs `name`, `author`, `category` and `quantity`; `is_best_selling` is optional.
+    Invalid rows are skipped and written to the reject file with their line number and error.
+    """
+
+    help = "Import books and categories from a CSV or JSONL file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Catalog file, or '-' to read from stdin.")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "jsonl"],
+            help="File format. Defaults to the file extension.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--created-by",
+            required=True,
+            help="Username recorded as the creator of the imported rows.",
+        )
+        parser.add_argument(
+            "--rejects",
+            default="catalog_rejects.jsonl",
+            help="File receiving the rows that could not be imported.",
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options["created_by"]).first()
+        if user is None:
+            raise CommandError(f"User '{options['created_by']}' does not exist.")
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive.")
+
+        path = options["path"]
+        file_format = options["format"] or os.path.splitext(path)[1].lstrip(".").lower()
+        if file_format not in ("csv", "jsonl"):
+            raise CommandError("Cannot tell the file format, pass --format.")
+
+        self.user = user
+        # Category names are not unique; iterating newest first lets the oldest one win
+        self.categories = dict(
+            Category.objects.order_by("-id").values_list("name", "id").iterator()
+        )
+        self.created_categories = 0
+
+        imported = rejected = 0
+        started = time.perf_counter()
+        try:
+            stream = (
+                nullcontext(sys.stdin)
+                if path == "-"
+                else open(path, newline="", encoding="utf-8")
+            )
+        except OSError as error:
+            raise CommandError(str(error))
+        try:
+            with stream as lines, open(options["rejects"], "w", encoding="utf-8") as rejects:
+                for chunk in chunked(read_rows(lines, file_format), options["chunk_size"]):
+                    books = []
+                    for line_number, row in chunk:
+                        try:
+                            books.append(clean_row(row))
+                        except RowError as error:
+                            rejected += 1
+                            rejects.write(
+                                json.dumps({"line": line_number, "error": str(error), "row": row})
+                                + "\n"
+                            )
+
+                    imported += self.import_chunk(books)
+                    if options["verbosity"] > 1:
+                        elapsed = max(time.perf_counter() - started, 1e-6)
+                        self.stdout.write(
+                            f"{imported} imported, {rejected} rejected "
+                            f"({imported / elapsed:.0f} rows/s)"
+                        )
+        finally:
+            if imported:
+                bump_generation("books", "categories")
+
+        elapsed = max(time.perf_counter() - started, 1e-6)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {imported} books and created {self.created_categories} categories "
+                f"in {elapsed:.2f}s ({(imported + rejected) / elapsed:.0f} rows/s)."
+            )
+        )
+        if rejected:
+            self.stdout.write(
+                self.style.WARNING(f"Rejected {rejected} rows, see {options['rejects']}.")
+            )
+
+    def import_chunk(self, rows):
+        """
+        Inserts one chunk of cleaned rows in a single transaction.
+
+        Returns:
+            int: The number of books inserted.
+        """
+        if not rows:
+            return 0
+
+        with transaction.atomic():
+            missing = {row["category"] for row in rows} - self.categories.keys()
+            if missing:
+                created = Category.objects.bulk_create(
+                    [Category(name=name, created_by=self.user) for name in sorted(missing)]
+                )
+                self.categories.update((category.name, category.pk) for category in created)
+                self.created_categories += len(created)
+
+            books = Book.objects.bulk_create(
+                [
+                    Book(
+                        name=row["name"],
+                        author=row["author"],
+                        quantity=row["quantity"],
+                        is_best_selling=row["is_best_selling"],
+                        category_id=self.categories[row["category"]],
+                        created_by=self.user,
+                    )
+                    for row in rows
+                ]
+            )
+            Book.objects.filter(pk__in=[book.pk for book in books]).update_search_vector()
+            counters.adjust(total_books=len(books))
+        return len(books)
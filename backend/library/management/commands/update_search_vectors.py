@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from library.models import Book
+
+
+class Command(BaseCommand):
+    """
+    Management command to (re)build the full-text search vector of books.
+
+    Useful after the search vector column is first added or after rows were written
+    without going through `Book.save` (e.g. raw SQL or `bulk_create`).
+    """
+
+    help = "Rebuild the full-text search vector of books."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--missing-only",
+            action="store_true",
+            help="Only update books whose search vector has never been computed.",
+        )
+
+    def handle(self, *args, **options):
+        books = Book.objects.all()
+        if options["missing_only"]:
+            books = books.filter(search_vector__isnull=True)
+        updated = books.update_search_vector()
+        self.stdout.write(self.style.SUCCESS(f"Updated search vector of {updated} books."))
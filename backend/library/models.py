@@ -1,11 +1,22 @@
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import OuterRef, Subquery
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.exceptions import ValidationError
-import os
+
+from lms_project.media import ContentAddressedStorage, content_addressed_name
+
+# Text search configuration used for the book search vector
+SEARCH_CONFIG = "english"
+
+
+# Covers are stored once per distinct content, under the hash of their bytes
+book_image_storage = ContentAddressedStorage()
 
 
 def book_image_path(instance, filename):
-    return os.path.join("book_images", filename)
+    return content_addressed_name("book_images", instance.image, filename)
 
 
 class Category(models.Model):
@@ -15,6 +26,7 @@ class Category(models.Model):
     Attributes:
         name (CharField): The name of the category.
         created_at (DateTimeField): The date and time when the category was created.
+        updated_at (DateTimeField): The date and time when the category was last updated.
         created_by (ForeignKey): The user who created the category.
 
     Methods:
@@ -23,13 +35,54 @@ class Category(models.Model):
 
     name = models.CharField(max_length=100, verbose_name="Category Name")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(
         User, on_delete=models.CASCADE, verbose_name="Created By"
     )
 
+    class Meta:
+        indexes = [
+            GinIndex(
+                fields=["name"], name="category_name_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+            models.Index(fields=["created_at", "id"], name="category_created_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """
+        Saves the category and refreshes the search vector of its books, which embeds the category name.
+        """
+        adding = self._state.adding
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            if not adding:
+                self.books.update_search_vector()
+
+
+class BookQuerySet(models.QuerySet):
+    """
+    QuerySet for the Book model.
+
+    Methods:
+        update_search_vector: Recomputes the weighted search vector (name, author, category name) in a single UPDATE (PostgreSQL only).
+    """
+
+    def update_search_vector(self):
+        # The vector is only searched on PostgreSQL, and cannot be computed elsewhere
+        if connections[self.db].vendor != "postgresql":
+            return 0
+        category_name = Subquery(
+            Category.objects.filter(pk=OuterRef("category_id")).values("name")[:1]
+        )
+        return self.update(
+            search_vector=SearchVector("name", weight="A", config=SEARCH_CONFIG)
+            + SearchVector("author", weight="B", config=SEARCH_CONFIG)
+            + SearchVector(category_name, weight="C", config=SEARCH_CONFIG)
+        )
+
 
 class Book(models.Model):
     """
@@ -42,14 +95,21 @@ class Book(models.Model):
         author (CharField): The author of the book.
         quantity (PositiveIntegerField): The quantity of the book available.
         image (ImageField): The image of the book.
+        image_variants (JSONField): Storage paths of the resized cover variants, by size and format.
         is_best_selling (BooleanField): Indicates if the book is a best seller.
         created_at (DateTimeField): The date and time when the book was created.
+        updated_at (DateTimeField): The date and time when the book was last updated.
+        search_vector (SearchVectorField): Weighted full-text document of name, author and category name.
 
     Methods:
         __str__: Returns the name of the book as a string.
         clean: Validates the book instance, ensuring quantity is not negative.
+        save: Saves the book, refreshes its search vector and queues the cover variants.
     """
 
+    # Fields whose change requires the search vector to be recomputed
+    SEARCH_FIELDS = {"name", "author", "category", "category_id"}
+
     BEST_SELLING_CHOICES = [
         (True, "Yes"),
         (False, "No"),
@@ -68,16 +128,80 @@ class Book(models.Model):
     author = models.CharField(max_length=100, verbose_name="Author")
     quantity = models.PositiveIntegerField(verbose_name="Quantity")
     image = models.ImageField(
-        upload_to=book_image_path, blank=True, null=True, verbose_name="Image"
+        upload_to=book_image_path,
+        storage=book_image_storage,
+        blank=True,
+        null=True,
+        verbose_name="Image",
     )
+    # Filled in by library.tasks.process_book_cover after the cover is saved
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_best_selling = models.BooleanField(
         default=False, choices=BEST_SELLING_CHOICES, verbose_name="Best Selling"
     )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At")
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = BookQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"], name="book_search_vector_idx"),
+            GinIndex(
+                fields=["name"], name="book_name_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+            GinIndex(
+                fields=["author"], name="book_author_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+            models.Index(fields=["created_at", "id"], name="book_created_idx"),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembers the stored cover, so save() can tell when a new one was uploaded
+        if "image" in field_names:
+            instance._loaded_image = instance.__dict__["image"]
+        return instance
+
     def clean(self):
         if self.quantity < 0:
             raise ValidationError("Quantity cannot be negative.")
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the book and refreshes its search vector in the same transaction.
+
+        The vector is left untouched when `update_fields` does not include any searchable field.
+        When the cover changed, its old variants are dropped and new ones are rendered in the
+        background once the transaction commits; the files of the old ones are deleted then too,
+        unless another book shares that cover.
+        """
+        update_fields = kwargs.get("update_fields")
+        # A new upload is not committed to storage yet; a reassigned path differs from the stored one
+        previous_image = getattr(self, "_loaded_image", None) or ""
+        image_changed = (update_fields is None or "image" in update_fields) and (
+            (self.image and not self.image._committed) or (self.image.name or "") != previous_image
+        )
+        if image_changed:
+            self.image_variants = {}
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "image_variants"}
+
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            if update_fields is None or self.SEARCH_FIELDS.intersection(update_fields):
+                Book.objects.filter(pk=self.pk).update_search_vector()
+
+        self._loaded_image = self.image.name
+        if image_changed:
+            from .tasks import discard_cover_variants, process_book_cover
+
+            if self.image:
+                transaction.on_commit(lambda pk=self.pk: process_book_cover.delay(pk))
+            if previous_image:
+                transaction.on_commit(lambda: discard_cover_variants.delay(previous_image))
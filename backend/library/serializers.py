@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from .covers import variant_urls
 from .models import Book, Category
 from django.contrib.auth.models import User
 
@@ -24,16 +25,25 @@ class CategorySerializer(serializers.ModelSerializer):
 class BookSerializer(serializers.ModelSerializer):
     """
     Serializer for Book model using Django REST framework.
+
+    `variants` maps each cover size to the URLs of its formats, e.g.
+    `{"thumbnail": {"webp": ..., "jpeg": ...}, "medium": {...}}`; it is empty until the
+    background processing of a new cover has finished.
     """
 
+    variants = serializers.SerializerMethodField()
+
     class Meta:
         """
         Inner class to define metadata options for the BookSerializer.
 
         Attributes:
             model: The model class that the serializer should use.
-            fields: The fields that should be included in the serialized output.
+            exclude: The fields that should be left out of the serialized output.
         """
 
         model = Book
-        fields = "__all__"
+        exclude = ["search_vector", "image_variants"]
+
+    def get_variants(self, book):
+        return variant_urls(book.image_variants, self.context.get("request"))
@@ -0,0 +1,48 @@
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from lms_project.caching import invalidate_on_commit
+from .models import Book, Category
+from .tasks import discard_cover_variants
+
+
+def install_search_extensions(sender, using, **kwargs):
+    """
+    Installs the PostgreSQL extensions required by the search indexes before migrations run.
+
+    The trigram GIN indexes use the `gin_trgm_ops` operator class from `pg_trgm`, which must
+    exist before `migrate` creates them.
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def book_changed(sender, **kwargs):
+    """
+    Invalidates the cached book lists after any book write, including the admin and shell.
+    """
+    invalidate_on_commit("books")
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, **kwargs):
+    """
+    Deletes the cover variants of a deleted book once no other book shares its cover.
+    """
+    if instance.image:
+        transaction.on_commit(lambda: discard_cover_variants.delay(instance.image.name))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, **kwargs):
+    """
+    Invalidates the cached category lists, and the book lists embedding category names.
+    """
+    invalidate_on_commit("categories", "books")
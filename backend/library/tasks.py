@@ -0,0 +1,29 @@
+import logging
+
+from celery import shared_task
+
+from . import covers
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(autoretry_for=(OSError,), retry_backoff=True, max_retries=3)
+def process_book_cover(book_id):
+    """
+    Renders the thumbnail and medium variants of a book's cover, retrying on storage errors.
+
+    Covers that cannot be decoded are logged and left without variants.
+    """
+    try:
+        return covers.process_cover(book_id)
+    except covers.CoverError as error:
+        logger.warning("Cover of book %s could not be processed: %s", book_id, error)
+        return False
+
+
+@shared_task(autoretry_for=(OSError,), retry_backoff=True, max_retries=3)
+def discard_cover_variants(source_name):
+    """
+    Deletes the variants of a replaced or deleted cover that no other book uses.
+    """
+    return covers.discard_variants(source_name)
@@ -1,3 +1,471 @@
+from io import BytesIO, StringIO
+import json
+import os
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from library_management import counters
+from lms_project.caching import get_generation, invalidate_on_commit
+from lms_project.search import FullTextSearchFilter
+from . import covers
+from .models import Book, Category
+from .serializers import BookSerializer
+from .views import BookViewSet, CategoryViewSet
+
+
+def cover_file(name="cover.png", size=(900, 1200), mode="RGBA"):
+    buffer = BytesIO()
+    Image.new(mode, size, (200, 30, 30, 255)).save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class BookCoverVariantTests(TestCase):
+    """
+    Covers the background rendering of resized cover variants.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="librarian")
+        cls.category = Category.objects.create(name="Fiction", created_by=cls.user)
+
+    def setUp(self):
+        self.media = self.enterContext(TemporaryDirectory())
+        self.enterContext(self.settings(MEDIA_ROOT=self.media))
+
+    def create_book(self, **kwargs):
+        return Book.objects.create(
+            name="Book", author="Author", quantity=1, category=self.category,
+            created_by=self.user, **kwargs
+        )
+
+    def test_upload_renders_every_variant_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            book = self.create_book(image=cover_file())
+
+        book.refresh_from_db()
+        self.assertEqual(set(book.image_variants), set(covers.VARIANTS))
+        for variant, (width, height) in covers.VARIANTS.items():
+            self.assertEqual(set(book.image_variants[variant]), set(covers.FORMATS))
+            with Image.open(f"{self.media}/{book.image_variants[variant]['webp']}") as image:
+                self.assertEqual(image.size, (width, height))
+                self.assertEqual(image.format, "WEBP")
+
+        variants = BookSerializer(book).data["variants"]
+        self.assertRegex(variants["thumbnail"]["jpeg"], r"/thumbnail/[0-9a-f]{64}\.jpeg$")
+
+    def test_new_cover_replaces_variants_and_other_edits_keep_them(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            book = self.create_book(image=cover_file())
+        book.refresh_from_db()
+
+        variants = book.image_variants
+
+        with self.captureOnCommitCallbacks(execute=True):
+            book.name = "Renamed"
+            book.save()
+        book.refresh_from_db()
+        self.assertEqual(book.image_variants, variants)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            book.image = cover_file("second.png", size=(300, 400))
+            book.save()
+        book.refresh_from_db()
+        old_paths = {path for paths in variants.values() for path in paths.values()}
+        new_paths = {path for paths in book.image_variants.values() for path in paths.values()}
+        self.assertEqual(set(book.image_variants), set(covers.VARIANTS))
+        self.assertFalse(old_paths & new_paths)
+        self.assertTrue(all(covers.storage.exists(path) for path in new_paths))
+        self.assertFalse(any(covers.storage.exists(path) for path in old_paths))
+
+    def test_replaced_covers_lose_their_variants_unless_shared(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            book = self.create_book(image=cover_file())
+            twin = self.create_book(image=cover_file())
+        book.refresh_from_db()
+        directory = os.path.dirname(f"{self.media}/{book.image_variants['thumbnail']['webp']}")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            book.image = cover_file("second.png", size=(300, 400))
+            book.save()
+        # The twin still shows the first cover
+        self.assertTrue(os.path.isdir(directory))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            twin.delete()
+        self.assertFalse(os.path.exists(directory))
+        book.refresh_from_db()
+        self.assertEqual(set(book.image_variants), set(covers.VARIANTS))
+
+    def test_late_renders_of_replaced_covers_are_discarded(self):
+        with self.captureOnCommitCallbacks():
+            book = self.create_book(image=cover_file())
+        source_name = book.image.name
+        rendered = covers.render_variants(book.image.read())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            book.image = cover_file("second.png", size=(300, 400))
+            book.save()
+
+        self.assertFalse(covers.store_variants(book.pk, source_name, rendered))
+        self.assertFalse(os.path.exists(f"{self.media}/{os.path.splitext(source_name)[0]}"))
+
+    def test_backfill_renders_missing_variants_in_spawned_processes(self):
+        with self.captureOnCommitCallbacks():
+            book = self.create_book(image=cover_file())
+
+        stdout = StringIO()
+        call_command("backfill_covers", "--workers", "2", stdout=stdout)
+
+        self.assertIn("Processed 1 covers", stdout.getvalue())
+        book.refresh_from_db()
+        self.assertEqual(set(book.image_variants), set(covers.VARIANTS))
+
+    def test_undecodable_cover_is_rejected(self):
+        with self.assertRaises(covers.CoverError):
+            covers.render_variants(b"not an image")
+
+
+class ContentAddressedCoverTests(TestCase):
+    """
+    Covers the content-hash naming of covers and the caching headers of served media.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="librarian")
+        cls.category = Category.objects.create(name="Fiction", created_by=cls.user)
+
+    def setUp(self):
+        self.media = self.enterContext(TemporaryDirectory())
+        self.enterContext(self.settings(MEDIA_ROOT=self.media))
+
+    def create_book(self, image):
+        with self.captureOnCommitCallbacks():
+            return Book.objects.create(
+                name="Book", author="Author", quantity=1, category=self.category,
+                created_by=self.user, image=image,
+            )
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.create_book(cover_file("cover.png"))
+        second = self.create_book(cover_file("Other-Name.PNG"))
+        third = self.create_book(cover_file("cover.png", size=(300, 400)))
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, third.image.name)
+        self.assertRegex(first.image.name, r"^book_images/[0-9a-f]{2}/[0-9a-f]{64}\.png$")
+        stored = [name for _, _, files in os.walk(self.media) for name in files]
+        self.assertEqual(len(stored), 2)
+
+    def test_content_addressed_media_is_immutable(self):
+        book = self.create_book(cover_file())
+
+        response = self.client.get(f"/media/{book.image.name}")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("immutable", response["Cache-Control"])
+
+        with self.settings(MEDIA_SERVE_MODE="accel"):
+            response = self.client.get(f"/media/{book.image.name}")
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{book.image.name}")
+        self.assertEqual(response.content, b"")
+
+        # Variants are named after their own content; files merely under a hash are not
+        covers.process_cover(book.pk)
+        book.refresh_from_db()
+        response = self.client.get(f"/media/{book.image_variants['thumbnail']['webp']}")
+        self.assertIn("immutable", response["Cache-Control"])
+        legacy = f"{os.path.splitext(book.image.name)[0]}/thumbnail.webp"
+        with open(f"{self.media}/{legacy}", "wb") as file:
+            file.write(b"legacy")
+        self.assertNotIn("immutable", self.client.get(f"/media/{legacy}")["Cache-Control"])
+
+        # Paths escaping MEDIA_ROOT are rejected as suspicious
+        self.assertEqual(self.client.get("/media/../settings.py").status_code, 400)
+
+
+def lookup_names(node):
+    if hasattr(node, "children"):
+        return set().union(*(lookup_names(child) for child in node.children))
+    # A SearchQuery matched against a vector field is an "exact" lookup
+    return {node.lookup_name}
+
+
+class FullTextSearchFilterTests(APITestCase):
+    """
+    Covers the search filter of the book and category lists.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="librarian")
+        cls.category = Category.objects.create(name="Science Fiction", created_by=cls.user)
+        for name, author in (("Dune", "Frank Herbert"), ("Emma", "Jane Austen")):
+            Book.objects.create(
+                name=name, author=author, quantity=1, category=cls.category, created_by=cls.user
+            )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def search(self, view, queryset, text):
+        request = Request(APIRequestFactory().get("/", {"search": text}))
+        return FullTextSearchFilter().filter_queryset(request, queryset, view)
+
+    def test_other_databases_fall_back_to_substring_search(self):
+        if connection.vendor == "postgresql":
+            self.skipTest("PostgreSQL uses full-text and trigram search")
+        response = self.client.get("/api/books/", {"search": "herbert"})
+        self.assertEqual([book["name"] for book in response.json()["results"]], ["Dune"])
+
+    def test_only_views_with_a_stored_vector_use_full_text_search(self):
+        # Only the query is built here, so pretending to be PostgreSQL is enough
+        with mock.patch("lms_project.search.connection", SimpleNamespace(vendor="postgresql")):
+            categories = self.search(CategoryViewSet(), Category.objects.all(), "fiction")
+            books = self.search(BookViewSet(), Book.objects.all(), "dune")
+
+        self.assertEqual(lookup_names(categories.query.where), {"trigram_word_similar"})
+        self.assertEqual(lookup_names(books.query.where), {"exact", "trigram_word_similar"})
+        self.assertNotIn("search_rank", categories.query.annotations)
+        self.assertIn("search_rank", books.query.annotations)
+
+    @skipUnless(connection.vendor == "postgresql", "Requires PostgreSQL")
+    def test_typos_still_match(self):
+        Book.objects.update_search_vector()
+        response = self.client.get("/api/books/", {"search": "dnue herbet"})
+        self.assertEqual(response.json()["results"][0]["name"], "Dune")
+
+        response = self.client.get("/api/categories/", {"search": "fiktion"})
+        self.assertEqual(response.json()["results"][0]["name"], "Science Fiction")
+
+
+class PaginationTests(APITestCase):
+    """
+    Covers the page number and cursor modes of the shared list pagination.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="librarian")
+        category = Category.objects.create(name="Fiction", created_by=cls.user)
+        cls.books = [
+            Book.objects.create(
+                name=f"Book {index}", author="Author", quantity=1, category=category,
+                created_by=cls.user,
+            )
+            for index in range(5)
+        ]
+        # Ties on created_at must be broken by id
+        Book.objects.filter(pk__in=[book.pk for book in cls.books[1:4]]).update(
+            created_at=cls.books[1].created_at
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def names(self, response):
+        return [book["name"] for book in response.json()["results"]]
+
+    def test_page_numbers_keep_the_insertion_order(self):
+        response = self.client.get("/api/books/", {"page_size": 3})
+        self.assertEqual(self.names(response), ["Book 0", "Book 1", "Book 2"])
+        self.assertEqual(response.json()["count"], 5)
+
+    def test_cursor_pages_walk_every_row_once(self):
+        seen = []
+        url, params = "/api/books/", {"paginate": "cursor", "page_size": 2}
+        while url:
+            response = self.client.get(url, params)
+            seen.extend(self.names(response))
+            url, params = response.json()["next"], None
+        self.assertEqual(seen, [f"Book {index}" for index in (4, 3, 2, 1, 0)])
+
+        first = self.client.get("/api/books/", {"paginate": "cursor", "page_size": 2})
+        second = self.client.get(first.json()["next"])
+        previous = self.client.get(second.json()["previous"])
+        self.assertEqual(self.names(previous), ["Book 4", "Book 3"])
+
+    def test_cursor_pages_use_a_row_comparison(self):
+        response = self.client.get("/api/books/", {"paginate": "cursor", "page_size": 2})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(response.json()["next"])
+        self.assertRegex(
+            queries[-1]["sql"], r'\("library_book"\."created_at", "library_book"\."id"\) < \('
+        )
+
+    def test_cursor_mode_rejects_search(self):
+        response = self.client.get("/api/books/", {"paginate": "cursor", "search": "book"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("paginate", response.json())
+
+
+class ResponseCacheTests(APITestCase):
+    """
+    Covers the generations of the list response cache and the validators derived from them.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="librarian")
+        cls.category = Category.objects.create(name="Fiction", created_by=cls.user)
+        cls.book = Book.objects.create(
+            name="Book", author="Author", quantity=1, category=cls.category, created_by=cls.user
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def generations(self):
+        return get_generation("books"), get_generation("categories")
+
+    def test_model_writes_bump_the_generations_on_commit(self):
+        books, categories = self.generations()
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.filter(pk=self.book.pk).first().save()
+        self.assertEqual(self.generations(), (books + 1, categories))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        self.assertEqual(self.generations(), (books + 2, categories + 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.delete()
+        self.assertEqual(self.generations(), (books + 3, categories + 1))
+
+    def test_invalidation_waits_for_the_commit(self):
+        generation = get_generation("books")
+        with self.captureOnCommitCallbacks() as callbacks:
+            invalidate_on_commit("books")
+            self.assertEqual(get_generation("books"), generation)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(get_generation("books"), generation + 1)
+
+    def test_cached_pages_are_keyed_by_representation(self):
+        first = self.client.get("/api/books/", {"page_size": 1})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/api/books/", {"page_size": 1}).json(), first.json())
+
+        other = self.client.get("/api/books/", {"page_size": 2})
+        self.assertNotEqual(other["ETag"], first["ETag"])
+        browsable = self.client.get("/api/books/", {"page_size": 1}, HTTP_ACCEPT="text/html")
+        self.assertNotEqual(browsable["ETag"], first["ETag"])
+
+    def test_writes_outside_the_api_change_the_list_etag(self):
+        etag = self.client.get("/api/categories/")["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name="Poetry", created_by=self.user)
+
+        response = self.client.get("/api/categories/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class CatalogImportTests(TestCase):
+    """
+    Covers the streaming catalog import of the `import_catalog` command.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="librarian")
+        cls.category = Category.objects.create(name="Fiction", created_by=cls.user)
+
+    def setUp(self):
+        self.directory = self.enterContext(TemporaryDirectory())
+        self.rejects = f"{self.directory}/rejects.jsonl"
+
+    def import_catalog(self, name, content, *args):
+        path = f"{self.directory}/{name}"
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+        call_command(
+            "import_catalog", path, "--created-by", "librarian", "--rejects", self.rejects,
+            "--chunk-size", "1", *args, stdout=StringIO(),
+        )
+        with open(self.rejects, encoding="utf-8") as file:
+            return [json.loads(line) for line in file]
+
+    def test_csv_rows_are_imported_and_bad_rows_rejected(self):
+        books = counters.read().total_books
+        generation = get_generation("books")
+
+        rejects = self.import_catalog(
+            "catalog.csv",
+            "name,author,category,quantity,is_best_selling\n"
+            "Dune,Herbert,Fiction,3,yes\n"
+            "Broken,Author,Fiction,many,\n"
+            ",Nameless,Fiction,1,\n"
+            "Cosmos,Sagan,Science,2,no\n"
+            "Contact,Sagan,Science,1,\n",
+        )
+
+        self.assertEqual(
+            [(reject["line"], reject["error"]) for reject in rejects],
+            [(3, "'quantity' must be an integer."), (4, "'name' is required.")],
+        )
+        self.assertEqual(rejects[1]["row"]["author"], "Nameless")
+
+        dune = Book.objects.get(name="Dune")
+        self.assertEqual(
+            (dune.category, dune.quantity, dune.is_best_selling), (self.category, 3, True)
+        )
+        # The category first seen in a later chunk is created once and reused by the next chunk
+        science = Category.objects.get(name="Science")
+        self.assertEqual(
+            set(Book.objects.filter(category=science).values_list("name", flat=True)),
+            {"Cosmos", "Contact"},
+        )
+        self.assertEqual(science.created_by, self.user)
+
+        counter = counters.read()
+        self.assertEqual(counter.total_books, books + 3)
+        self.assertEqual(counter.total_books, Book.objects.count())
+        self.assertGreater(get_generation("books"), generation)
+        if connection.vendor == "postgresql":
+            self.assertFalse(Book.objects.filter(search_vector__isnull=True).exists())
+
+    def test_jsonl_lines_that_are_not_objects_are_rejected(self):
+        rejects = self.import_catalog(
+            "catalog.jsonl",
+            '{"name": "Dune", "author": "Herbert", "category": "Fiction", "quantity": 1}\n'
+            "\n"
+            "{not json\n"
+            "[1, 2]\n"
+            '{"name": "Cosmos", "author": "Sagan", "category": "Science", "quantity": "2",'
+            ' "is_best_selling": true}\n',
+        )
+
+        self.assertEqual([reject["line"] for reject in rejects], [3, 4])
+        self.assertTrue(rejects[0]["error"].startswith("Invalid JSON"))
+        self.assertEqual(rejects[0]["row"]["_raw"], "{not json")
+        self.assertEqual(rejects[1]["error"], "Expected a JSON object.")
+        self.assertEqual(
+            dict(Book.objects.values_list("name", "category__name")),
+            {"Dune": "Fiction", "Cosmos": "Science"},
+        )
+        self.assertTrue(Book.objects.get(name="Cosmos").is_best_selling)
 
-# Create your tests here.
+    def test_unknown_formats_are_refused(self):
+        with self.assertRaisesMessage(CommandError, "pass --format"):
+            self.import_catalog("catalog.txt", "")
+        self.import_catalog(
+            "catalog.txt",
+            "name,author,category,quantity\nDune,Herbert,Fiction,1\n",
+            "--format",
+            "csv",
+        )
+        self.assertTrue(Book.objects.filter(name="Dune").exists())
@@ -7,29 +7,20 @@ from rest_framework import status
 from .models import Book, Category
 from .serializers import BookSerializer, CategorySerializer
 
+# Caching and Conditional Requests
+from lms_project.caching import CachedListMixin
+from lms_project.conditional import ConditionalGetMixin
+
 # Filter and Pagination
-from rest_framework import filters
-from rest_framework.pagination import PageNumberPagination
+from lms_project.search import FullTextSearchFilter
+from lms_project.pagination import Paginate
 
 # Authentication
-from rest_framework_simplejwt.authentication import JWTTokenUserAuthentication
+from authentication.backends import CachedJWTTokenUserAuthentication
 from rest_framework.permissions import IsAuthenticated
 
 
-class Paginate(PageNumberPagination):
-    """
-    Custom pagination class for controlling the number of items per page in the API response.
-
-    Attributes:
-        page_size (int): The default number of items per page.
-        page_size_query_param (str): The query parameter to specify the number of items per page in the API request.
-    """
-
-    page_size = 10
-    page_size_query_param = "page_size"
-
-
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(ConditionalGetMixin, CachedListMixin, viewsets.ModelViewSet):
     """
     A viewset for handling CRUD operations related to the 'Book' model in the API.
 
@@ -38,22 +29,30 @@ class BookViewSet(viewsets.ModelViewSet):
         serializer_class: The serializer class used for serializing 'Book' model instances.
         filter_backends: A list of filter backend classes used for filtering the queryset.
         search_fields: A list of fields on which search functionality is enabled.
+        search_vector_field: The maintained full-text search vector of the book.
+        trigram_search_fields: A list of fields matched with fuzzy (trigram) search.
         pagination_class: The pagination class used for paginating the API response.
+        cache_namespace: The namespace of the cached list responses.
         authentication_classes: A list of authentication classes used for authenticating requests.
         permission_classes: A list of permission classes used for authorizing requests.
 
     Methods:
+        list: Lists books, served from the response cache when possible, or 304 when unchanged.
+        retrieve: Retrieves a book, or 304 when unchanged.
         create: Creates a new 'Book' instance.
         update: Updates an existing 'Book' instance.
         destroy: Deletes an existing 'Book' instance.
     """
 
-    queryset = Book.objects.all()
+    queryset = Book.objects.defer("search_vector")
     serializer_class = BookSerializer
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [FullTextSearchFilter]
     search_fields = ["name", "author", "category__name"]
+    search_vector_field = "search_vector"
+    trigram_search_fields = ["name", "author"]
     pagination_class = Paginate
-    authentication_classes = [JWTTokenUserAuthentication]
+    cache_namespace = "books"
+    authentication_classes = [CachedJWTTokenUserAuthentication]
     permission_classes = [IsAuthenticated]
 
     def create(self, request, *args, **kwargs):
@@ -152,7 +151,7 @@ class BookViewSet(viewsets.ModelViewSet):
         )
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, CachedListMixin, viewsets.ModelViewSet):
     """
     A viewset for handling CRUD operations related to the 'Category' model in the API.
 
@@ -162,10 +161,13 @@ class CategoryViewSet(viewsets.ModelViewSet):
         filter_backends: A list of filter backend classes used for filtering the queryset.
         search_fields: A list of fields on which search functionality is enabled.
         pagination_class: The pagination class used for paginating the API response.
+        cache_namespace: The namespace of the cached list responses.
         authentication_classes: A list of authentication classes used for authenticating requests.
         permission_classes: A list of permission classes used for authorizing requests.
 
     Methods:
+        list: Lists categories, served from the response cache when possible, or 304 when unchanged.
+        retrieve: Retrieves a category, or 304 when unchanged.
         create: Creates a new 'Category' instance.
         update: Updates an existing 'Category' instance.
         destroy: Deletes an existing 'Category' instance.
@@ -173,10 +175,11 @@ class CategoryViewSet(viewsets.ModelViewSet):
 
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [FullTextSearchFilter]
     search_fields = ["name"]
     pagination_class = Paginate
-    authentication_classes = [JWTTokenUserAuthentication]
+    cache_namespace = "categories"
+    authentication_classes = [CachedJWTTokenUserAuthentication]
     permission_classes = [IsAuthenticated]
 
     def create(self, request, *args, **kwargs):
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LibraryManagementConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "library_management"
+
+    def ready(self):
+        from . import signals  # noqa: F401
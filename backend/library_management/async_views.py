@@ -0,0 +1,88 @@
+"""
+Async variants of the dashboard endpoints, for clients polling them under ASGI.
+
+The views return the same payloads as the `LibraryManagementViewSet` actions of the same name.
+They wait for the database on the event loop instead of holding a worker thread per request,
+and the independent queries of a payload run concurrently on the database threads of
+`lms_project.concurrency`. Requests are authenticated with the same access tokens as the API.
+"""
+
+from functools import wraps
+
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework import exceptions, status
+
+from authentication.backends import CachedJWTTokenUserAuthentication
+from lms_project.concurrency import run_queries
+from . import counters, dashboard
+
+authentication = CachedJWTTokenUserAuthentication()
+
+
+def jwt_required(view):
+    """
+    Authenticates an async view with the API's JWT access tokens and answers 401 without one.
+
+    The token user is built from the token claims, so authentication does not touch the database.
+    """
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            result = authentication.authenticate(request)
+            if result is None:
+                raise exceptions.NotAuthenticated()
+        except exceptions.APIException as error:
+            return JsonResponse(
+                {"detail": error.detail},
+                status=status.HTTP_401_UNAUTHORIZED,
+                headers={"WWW-Authenticate": authentication.authenticate_header(request)},
+            )
+        request.user, request.auth = result
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+@require_GET
+@jwt_required
+async def initial_counts(request):
+    """
+    Get counts of issued, returned books, total books, and members.
+    """
+    (counter,) = await run_queries(counters.read)
+    return JsonResponse(dashboard.initial_counts(counter), status=status.HTTP_200_OK)
+
+
+@require_GET
+@jwt_required
+async def book_counts(request):
+    """
+    Get counts of issued, returned, total, and not returned books.
+    """
+    (counter,) = await run_queries(counters.read)
+    return JsonResponse(dashboard.book_counts(counter), status=status.HTTP_200_OK)
+
+
+@require_GET
+@jwt_required
+async def member_counts(request):
+    """
+    Get counts of total, normal, premium, and student members.
+    """
+    (counter,) = await run_queries(counters.read)
+    return JsonResponse(dashboard.member_counts(counter), status=status.HTTP_200_OK)
+
+
+@require_GET
+@jwt_required
+async def insight(request):
+    """
+    Get insights on most borrowed books in the current week, month, and overall.
+
+    The three periods are queried concurrently.
+    """
+    queries = dashboard.insight_queries()
+    results = await run_queries(*queries.values())
+    return JsonResponse(dict(zip(queries, results)), status=status.HTTP_200_OK)
@@ -0,0 +1,112 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from library.models import Book
+from members.models import Members
+from .models import DashboardCounter, LibraryManagement
+
+# Primary key of the single dashboard counter row
+COUNTER_ID = 1
+
+# Counter field holding the number of members on each plan
+PLAN_COUNTER_FIELDS = {
+    "Student": "student_members",
+    "Normal": "normal_members",
+    "Premium": "premium_members",
+}
+
+
+def plan_deltas(plan, delta):
+    """
+    Returns the counter deltas for adding (or removing, with a negative delta) a member on the given plan.
+    """
+    deltas = Counter(total_members=delta)
+    field = PLAN_COUNTER_FIELDS.get(plan)
+    if field:
+        deltas[field] += delta
+    return deltas
+
+
+def loan_deltas(is_returned, delta):
+    """
+    Returns the counter deltas for adding (or removing) an issue record in the given returned state.
+    """
+    return Counter({"returned_loans" if is_returned else "open_loans": delta})
+
+
+def adjust(deltas=None, **kwargs):
+    """
+    Applies the given deltas to the counter row with a single `UPDATE ... SET field = field + delta`.
+
+    Must be called inside the transaction of the write that caused the change. If the counter
+    row does not exist yet it is created from the actual table counts instead.
+    """
+    deltas = Counter(deltas or {})
+    deltas.update(kwargs)
+    changes = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if not changes:
+        return
+    if not DashboardCounter.objects.filter(pk=COUNTER_ID).update(**changes):
+        reconcile()
+
+
+def compute():
+    """
+    Computes the counter values from the source tables.
+
+    Returns:
+        dict: The counter field values.
+    """
+    loans = LibraryManagement.objects.aggregate(
+        open_loans=Count("id", filter=Q(is_returned=False)),
+        returned_loans=Count("id", filter=Q(is_returned=True)),
+    )
+    members = Members.objects.aggregate(
+        total_members=Count("id"),
+        **{
+            field: Count("id", filter=Q(plan=plan))
+            for plan, field in PLAN_COUNTER_FIELDS.items()
+        },
+    )
+    return {**loans, **members, "total_books": Book.objects.count()}
+
+
+def reconcile():
+    """
+    Recomputes the counters from the source tables and stores them.
+
+    The counter row is locked before counting, so concurrent writers wait and apply
+    their deltas on top of the recomputed values.
+
+    Returns:
+        tuple: The counter row and a dict of the fields that had drifted, mapped to (stored, actual).
+    """
+    with transaction.atomic():
+        stored = (
+            DashboardCounter.objects.select_for_update()
+            .filter(pk=COUNTER_ID)
+            .values()
+            .first()
+        )
+        actual = compute()
+        drift = {
+            field: (stored[field] if stored else None, value)
+            for field, value in actual.items()
+            if not stored or stored[field] != value
+        }
+        counter, _ = DashboardCounter.objects.update_or_create(
+            pk=COUNTER_ID, defaults=actual
+        )
+    return counter, drift
+
+
+def read():
+    """
+    Returns the counter row, creating it from the source tables on first use.
+    """
+    counter = DashboardCounter.objects.filter(pk=COUNTER_ID).first()
+    if counter is None:
+        counter, _ = reconcile()
+    return counter
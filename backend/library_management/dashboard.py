@@ -0,0 +1,62 @@
+"""
+Payloads of the dashboard endpoints, shared by the viewset actions and their async variants.
+"""
+
+from calendar import monthrange
+from datetime import timedelta
+from functools import partial
+
+from django.utils import timezone
+
+from . import rollups
+
+
+def initial_counts(counter):
+    return {
+        "issued_books_count": counter.open_loans,
+        "returned_books_count": counter.returned_loans,
+        "total_books_count": counter.total_books,
+        "total_members_count": counter.total_members,
+    }
+
+
+def book_counts(counter):
+    return {
+        "issued_books_count": counter.total_loans,
+        "returned_books_count": counter.returned_loans,
+        "total_books_count": counter.total_books,
+        "not_returned_books_count": counter.open_loans,
+    }
+
+
+def member_counts(counter):
+    return {
+        "total_member_count": counter.total_members,
+        "normal_member_count": counter.normal_members,
+        "premium_member_count": counter.premium_members,
+        "student_member_count": counter.student_members,
+    }
+
+
+def insight_queries():
+    """
+    Returns the independent queries of the insight payload.
+
+    Returns:
+        dict: Payload key -> callable returning the most borrowed books of that period.
+    """
+    today = timezone.localdate()
+
+    # Monday to Sunday of the current week
+    start_of_week = today - timedelta(days=today.weekday())
+    end_of_week = start_of_week + timedelta(days=6)
+
+    # First to last day of the current month
+    start_of_month = today.replace(day=1)
+    end_of_month = today.replace(day=monthrange(today.year, today.month)[1])
+
+    return {
+        "topBooksWeek": partial(rollups.top_books, 5, start_of_week, end_of_week),
+        "topBooksMonth": partial(rollups.top_books, 5, start_of_month, end_of_month),
+        "topBooksAllTime": partial(rollups.top_books, 3),
+    }
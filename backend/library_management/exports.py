@@ -0,0 +1,95 @@
+import csv
+import json
+
+from .models import LibraryManagement
+
+# Column name and the field it is read from, in output order
+LEDGER_COLUMNS = [
+    ("id", "id"),
+    ("member_id", "user_id"),
+    ("member", "user__name"),
+    ("plan", "user__plan"),
+    ("book_id", "book_id"),
+    ("book", "book__name"),
+    ("issued_date", "issued_date"),
+    ("return_date", "return_date"),
+    ("is_returned", "is_returned"),
+    ("late_fee", "late_fee"),
+    ("late_fee_paid", "late_fee_paid"),
+]
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+}
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """
+    A file-like object whose `write` returns the value, so `csv.writer` can format one row at a time.
+    """
+
+    def write(self, value):
+        return value
+
+
+def ledger_rows(
+    issued_from=None,
+    issued_to=None,
+    is_returned=None,
+    plan=None,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+):
+    """
+    Yields the issue records matching the filters as tuples of the `LEDGER_COLUMNS` values.
+
+    The rows come from a single joined `values_list` query read through `iterator()`, which uses
+    a server-side cursor on PostgreSQL, so only `chunk_size` rows are held in memory at a time.
+
+    Parameters:
+        issued_from (date): Only include records issued on or after this date.
+        issued_to (date): Only include records issued on or before this date.
+        is_returned (bool): Only include returned (True) or open (False) records.
+        plan (str): Only include records of members on this plan.
+        chunk_size (int): The number of rows fetched from the database at a time.
+    """
+    queryset = LibraryManagement.objects.all()
+    if issued_from is not None:
+        queryset = queryset.filter(issued_date__gte=issued_from)
+    if issued_to is not None:
+        queryset = queryset.filter(issued_date__lte=issued_to)
+    if is_returned is not None:
+        queryset = queryset.filter(is_returned=is_returned)
+    if plan:
+        queryset = queryset.filter(user__plan=plan)
+
+    fields = [field for _, field in LEDGER_COLUMNS]
+    return (
+        queryset.order_by("issued_date", "id")
+        .values_list(*fields)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def iter_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow([column for column, _ in LEDGER_COLUMNS])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_jsonl(rows):
+    columns = [column for column, _ in LEDGER_COLUMNS]
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), default=str) + "\n"
+
+
+def iter_export(export_format, rows):
+    """
+    Returns an iterator of text lines rendering the rows in the given format ('csv' or 'jsonl').
+    """
+    if export_format == "jsonl":
+        return iter_jsonl(rows)
+    return iter_csv(rows)
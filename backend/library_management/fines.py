@@ -0,0 +1,196 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from members.models import Members
+from .models import FineTransaction
+
+ZERO = Decimal("0.00")
+
+
+class SettlementError(Exception):
+    """
+    Raised when a payment or waiver cannot be applied to a member's balance. The message is safe to return to the client.
+    """
+
+
+def signed_amount():
+    """
+    Returns an expression of a ledger entry's amount as applied to the balance.
+    """
+    return Case(
+        When(kind=FineTransaction.CHARGE, then=F("amount")),
+        default=-F("amount"),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+def balance_subquery():
+    """
+    Returns a subquery summing the signed ledger entries of the member of the outer query.
+    """
+    return Coalesce(
+        Subquery(
+            FineTransaction.objects.filter(member=OuterRef("pk"))
+            .order_by()
+            .values("member")
+            .annotate(balance=Sum(signed_amount()))
+            .values("balance")
+        ),
+        Value(ZERO),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+def record(entries):
+    """
+    Appends ledger entries and moves the member balances by the same amounts.
+
+    The entries are written with one `bulk_create` and every affected member with a single
+    `UPDATE ... SET unpaid_fine = unpaid_fine + CASE ...`, so the member rows are never read
+    or rewritten as a whole. Must be called inside the transaction of the change being recorded.
+
+    Parameters:
+        entries (list): Unsaved FineTransaction instances. Entries with a zero amount are skipped.
+
+    Returns:
+        list: The saved entries.
+    """
+    entries = [entry for entry in entries if entry.amount]
+    if not entries:
+        return []
+
+    FineTransaction.objects.bulk_create(entries)
+
+    deltas = defaultdict(Decimal)
+    for entry in entries:
+        deltas[entry.member_id] += Decimal(entry.signed_amount)
+    Members.objects.filter(pk__in=deltas).update(
+        unpaid_fine=F("unpaid_fine")
+        + Case(
+            *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ),
+        updated_at=timezone.now(),
+    )
+    return entries
+
+
+def settle(member_id, kind, amount, note=""):
+    """
+    Records a payment or waiver against a member's fine balance.
+
+    The member row is locked while the balance is checked, so concurrent settlements cannot take
+    the balance below zero.
+
+    Parameters:
+        member_id (int): The id of the member.
+        kind (str): `FineTransaction.PAYMENT` or `FineTransaction.WAIVER`.
+        amount (Decimal): The positive amount paid or waived.
+        note (str): A short description of the entry.
+
+    Returns:
+        tuple: The saved entry and the member's new balance.
+
+    Raises:
+        SettlementError: If the member does not exist, or the amount exceeds the balance.
+    """
+    if kind not in (FineTransaction.PAYMENT, FineTransaction.WAIVER):
+        raise ValueError(f"Fines are settled with a payment or a waiver, not '{kind}'.")
+
+    with transaction.atomic():
+        balance = (
+            Members.objects.select_for_update()
+            .filter(pk=member_id)
+            .values_list("unpaid_fine", flat=True)
+            .first()
+        )
+        if balance is None:
+            raise SettlementError("User does not exist.")
+        if amount > balance:
+            raise SettlementError(f"The amount exceeds the unpaid fine of {balance}.")
+
+        (entry,) = record(
+            [FineTransaction(member_id=member_id, kind=kind, amount=amount, note=note)]
+        )
+    return entry, balance - amount
+
+
+def loan_entries(loan, charged_before, paid_before, charged_now, paid_now):
+    """
+    Returns the ledger entries moving a loan from its previous fee state to its current one.
+
+    A loan owes its late fee once it is returned. An increase of the charged fee is a charge and a
+    decrease a waiver; marking the fee paid is a payment and unmarking it charges the fee again.
+
+    Parameters:
+        loan (LibraryManagement): The issue record.
+        charged_before (Decimal): The fee charged for the loan before the change.
+        paid_before (bool): Whether that fee was marked paid.
+        charged_now (Decimal): The fee charged for the loan after the change.
+        paid_now (bool): Whether the fee is marked paid after the change.
+
+    Returns:
+        list: Unsaved FineTransaction instances.
+    """
+    entries = []
+    charged_before, charged_now = Decimal(charged_before), Decimal(charged_now)
+
+    def entry(kind, amount, note):
+        entries.append(
+            FineTransaction(
+                member_id=loan.user_id, loan_id=loan.pk, kind=kind, amount=amount, note=note
+            )
+        )
+
+    if charged_now > charged_before:
+        entry(FineTransaction.CHARGE, charged_now - charged_before, "Late fee")
+    elif charged_now < charged_before:
+        entry(FineTransaction.WAIVER, charged_before - charged_now, "Late fee adjusted")
+
+    paid_amount_before = charged_before if paid_before else ZERO
+    paid_amount_now = charged_now if paid_now else ZERO
+    if paid_amount_now > paid_amount_before:
+        entry(FineTransaction.PAYMENT, paid_amount_now - paid_amount_before, "Late fee paid")
+    elif paid_amount_now < paid_amount_before:
+        entry(FineTransaction.CHARGE, paid_amount_before - paid_amount_now, "Payment reversed")
+
+    return entries
+
+
+def reconcile():
+    """
+    Rebuilds every member's cached balance from the ledger with a single UPDATE, touching only drifted rows.
+
+    Returns:
+        int: The number of members whose balance was corrected.
+    """
+    return (
+        Members.objects.alias(balance=balance_subquery())
+        .exclude(unpaid_fine=F("balance"))
+        .update(unpaid_fine=balance_subquery(), updated_at=timezone.now())
+    )
+
+
+def open_balances():
+    """
+    Records the current balance of every member without ledger entries as an opening charge.
+
+    Used once when the ledger is introduced, so that reconciling does not wipe existing fines.
+
+    Returns:
+        int: The number of opening entries recorded.
+    """
+    members = Members.objects.filter(unpaid_fine__gt=0, fine_transactions__isnull=True)
+    entries = [
+        FineTransaction(
+            member_id=pk, kind=FineTransaction.CHARGE, amount=amount, note="Opening balance"
+        )
+        for pk, amount in members.values_list("pk", "unpaid_fine").iterator()
+    ]
+    FineTransaction.objects.bulk_create(entries, batch_size=1000)
+    return len(entries)
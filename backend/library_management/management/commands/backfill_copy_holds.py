@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from library_management import services
+
+
+class Command(BaseCommand):
+    """
+    Management command reserving book copies for the open loans that do not hold one.
+
+    Run it once after the `holds_copy` flag is introduced, so returning or deleting an existing
+    open loan puts back only a copy that was taken. Loans issued through `services.issue_book`
+    while the flag did not exist yet already took their copy: pass the id of the first of them
+    as `--reserved-from` to mark them without taking another copy.
+    """
+
+    help = "Reserve book copies for open loans recorded without one."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reserved-from",
+            type=int,
+            help="Id of the first open loan whose copy was already taken when it was issued.",
+        )
+
+    def handle(self, *args, **options):
+        marked, copies, missing = services.backfill_copy_holds(options["reserved_from"])
+
+        self.stdout.write(f"Marked {marked} open loan(s), took {copies} copies from stock.")
+        if missing:
+            self.stdout.write(
+                self.style.WARNING(f"{missing} open loan(s) exceeded the available quantity.")
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS("Every open loan holds a copy."))
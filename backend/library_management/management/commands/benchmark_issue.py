@@ -0,0 +1,104 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from library.models import Book
+from library_management.models import LibraryManagement
+from library_management.services import IssueError, issue_book, open_loans_subquery
+from members.models import Members
+from members.policies import max_books_allowed
+
+
+class Command(BaseCommand):
+    """
+    Management command benchmarking concurrent book issues against the same member and book.
+
+    Fires `--requests` parallel issue operations from `--threads` threads, then reports throughput,
+    latency and whether the plan limit and the available quantity held under contention.
+    The issue records created by the run are deleted afterwards unless `--keep` is given.
+    """
+
+    help = "Benchmark parallel book issues against a single member and book."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--member", type=int, required=True, help="Member id.")
+        parser.add_argument("--book", type=int, required=True, help="Book id.")
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the issue records created by the benchmark.",
+        )
+
+    def handle(self, *args, **options):
+        member = (
+            Members.objects.annotate(open_loans=open_loans_subquery())
+            .filter(pk=options["member"])
+            .first()
+        )
+        book = Book.objects.filter(pk=options["book"]).first()
+        if member is None or book is None:
+            raise CommandError("Member or book does not exist.")
+
+        start_quantity = book.quantity
+        last_loan_id = (
+            LibraryManagement.objects.order_by("-id").values_list("id", flat=True).first()
+            or 0
+        )
+
+        def attempt(_):
+            started = time.perf_counter()
+            try:
+                issue_book(member.pk, book.pk)
+                outcome = "issued"
+            except IssueError as error:
+                outcome = str(error)
+            finally:
+                elapsed = time.perf_counter() - started
+            return outcome, elapsed
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["threads"]) as executor:
+            results = list(executor.map(attempt, range(options["requests"])))
+        wall = time.perf_counter() - started
+
+        outcomes = Counter(outcome for outcome, _ in results)
+        latencies = sorted(elapsed * 1000 for _, elapsed in results)
+
+        created = LibraryManagement.objects.filter(
+            id__gt=last_loan_id, user=member, book=book
+        )
+        issued = outcomes["issued"]
+        book.refresh_from_db(fields=["quantity"])
+        expected_issued = min(
+            max(max_books_allowed(member.plan) - member.open_loans, 0), start_quantity
+        )
+
+        self.stdout.write(f"Requests: {len(results)} on {options['threads']} threads")
+        self.stdout.write(f"Wall time: {wall:.3f}s ({len(results) / wall:.1f} req/s)")
+        self.stdout.write(
+            f"Latency ms: p50={statistics.median(latencies):.1f} "
+            f"p95={latencies[int(len(latencies) * 0.95) - 1]:.1f} max={latencies[-1]:.1f}"
+        )
+        for outcome, count in outcomes.most_common():
+            self.stdout.write(f"  {outcome}: {count}")
+
+        checks = {
+            "issued matches the plan limit and stock": issued == expected_issued,
+            "issue records match successful issues": created.count() == issued,
+            "quantity decreased by the issued copies": book.quantity
+            == start_quantity - issued,
+        }
+        for check, passed in checks.items():
+            style = self.style.SUCCESS if passed else self.style.ERROR
+            self.stdout.write(style(f"{'PASS' if passed else 'FAIL'}: {check}"))
+
+        if not options["keep"]:
+            for loan in created:
+                loan.delete()
+        connection.close()
@@ -0,0 +1,214 @@
+from datetime import timedelta
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from library.models import Book, Category
+from library_management.models import LibraryManagement
+from library_management.services import open_loans_subquery
+from members.models import Members
+
+# The indexes compared by the benchmark, by model
+BENCHMARKED_INDEXES = {
+    LibraryManagement: ["loan_open_user_idx", "loan_open_issued_idx"],
+}
+
+
+class Command(BaseCommand):
+    """
+    Management command comparing the plans and timings of the hot loan queries without and
+    with the indexes declared for them.
+
+    Seeds `--members`, `--books` and `--loans` rows spread over `--days` days, drops the
+    benchmarked indexes, runs every query `--repeat` times and prints its plan, then creates
+    the indexes again and repeats. Everything, seed data included, runs in one transaction
+    that is rolled back unless `--keep` is given. Plans come from EXPLAIN ANALYZE on
+    PostgreSQL and from EXPLAIN QUERY PLAN elsewhere.
+    """
+
+    help = "Seed a large dataset and compare query plans and timings before and after the loan indexes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--members", type=int, default=20000)
+        parser.add_argument("--books", type=int, default=5000)
+        parser.add_argument("--loans", type=int, default=500000)
+        parser.add_argument("--days", type=int, default=730)
+        parser.add_argument("--open-share", type=float, default=0.1)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded rows.")
+
+    def handle(self, *args, **options):
+        if min(options["members"], options["books"], options["days"], options["repeat"]) < 1:
+            raise CommandError("--members, --books, --days and --repeat must be positive.")
+
+        # The SQLite schema editor refuses to run in a transaction with foreign key checks on
+        checks_disabled = connection.vendor == "sqlite" and connection.disable_constraint_checking()
+        try:
+            self.benchmark(options)
+        finally:
+            if checks_disabled:
+                connection.enable_constraint_checking()
+
+    def benchmark(self, options):
+        with transaction.atomic():
+            started = time.perf_counter()
+            member_id = self.seed(options)
+            self.stdout.write(f"Seeded in {time.perf_counter() - started:.1f}s.")
+
+            queries = self.queries(member_id)
+            self.set_indexes(present=False)
+            before = self.run(queries, options["repeat"], "Without the indexes")
+            self.set_indexes(present=True)
+            after = self.run(queries, options["repeat"], "With the indexes")
+
+            self.stdout.write("\nMedian ms (without -> with):")
+            for name in queries:
+                self.stdout.write(
+                    f"  {name:<38} {before[name]:>9.2f} -> {after[name]:>9.2f}"
+                    f"  ({before[name] / max(after[name], 1e-6):.1f}x)"
+                )
+
+            if not options["keep"]:
+                transaction.set_rollback(True)
+
+    def seed(self, options):
+        rng = random.Random(42)
+        today = timezone.localdate()
+        user = User.objects.create(username=f"benchmark-{time.time_ns()}")
+        category = Category.objects.create(name=f"Benchmark {user.pk}", created_by=user)
+
+        plans = [plan for plan, _ in Members.PLAN_CHOICES]
+        members = Members.objects.bulk_create(
+            [
+                Members(
+                    name=f"Benchmark {user.pk}-{index}",
+                    email=f"benchmark-{user.pk}-{index}@example.com",
+                    phone_number=f"{user.pk % 1000:03d}{index:07d}"[-10:],
+                    plan=plans[index % len(plans)],
+                    address="Address",
+                    gender="Other",
+                    created_by=user,
+                )
+                for index in range(options["members"])
+            ],
+            batch_size=5000,
+        )
+        books = Book.objects.bulk_create(
+            [
+                Book(
+                    name=f"Benchmark book {index}",
+                    author="Author",
+                    quantity=100,
+                    category=category,
+                    created_by=user,
+                )
+                for index in range(options["books"])
+            ],
+            batch_size=5000,
+        )
+
+        # issued_date is set on insert, so every day's loans are inserted and then moved back
+        per_day = max(options["loans"] // options["days"], 1)
+        for offset in range(options["days"]):
+            loans = LibraryManagement.objects.bulk_create(
+                [
+                    LibraryManagement(
+                        user=rng.choice(members),
+                        book=rng.choice(books),
+                        is_returned=rng.random() >= options["open_share"],
+                    )
+                    for _ in range(per_day)
+                ],
+                batch_size=5000,
+            )
+            LibraryManagement.objects.filter(pk__in=[loan.pk for loan in loans]).update(
+                issued_date=today - timedelta(days=offset)
+            )
+        return members[0].pk
+
+    def queries(self, member_id):
+        today = timezone.localdate()
+        return {
+            # Plan limit check when issuing a book
+            "open loans of a member": lambda: Members.objects.annotate(
+                open_loans=open_loans_subquery()
+            )
+            .filter(pk=member_id)
+            .values_list("open_loans", flat=True)
+            .first(),
+            # Dashboard counter reconciliation
+            "open and returned loan counts": lambda: LibraryManagement.objects.aggregate(
+                open_loans=Count("id", filter=Q(is_returned=False)),
+                returned_loans=Count("id", filter=Q(is_returned=True)),
+            ),
+            "open loan count": lambda: LibraryManagement.objects.filter(
+                is_returned=False
+            ).count(),
+            # Overdue sweep candidates and open loans export
+            "open loans issued before a date": lambda: LibraryManagement.objects.filter(
+                is_returned=False, issued_date__lt=today - timedelta(days=30)
+            ).count(),
+            "open loans issued in a month": lambda: list(
+                LibraryManagement.objects.filter(
+                    is_returned=False,
+                    issued_date__range=[today - timedelta(days=90), today - timedelta(days=60)],
+                ).values_list("id", flat=True)
+            ),
+        }
+
+    def set_indexes(self, present):
+        with connection.cursor() as cursor:
+            for model, names in BENCHMARKED_INDEXES.items():
+                existing = connection.introspection.get_constraints(
+                    cursor, model._meta.db_table
+                )
+                declared = {index.name: index for index in model._meta.indexes}
+                with connection.schema_editor(atomic=False) as editor:
+                    for name in names:
+                        if present and name not in existing:
+                            editor.add_index(model, declared[name])
+                        elif not present and name in existing:
+                            editor.remove_index(model, declared[name])
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+
+    def run(self, queries, repeat, title):
+        self.stdout.write(f"\n=== {title} ===")
+        medians = {}
+        for name, query in queries.items():
+            statements = []
+
+            def capture(execute, sql, params, many, context):
+                statements.append((sql, params))
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(capture):
+                query()
+
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                query()
+                timings.append((time.perf_counter() - started) * 1000)
+            medians[name] = statistics.median(timings)
+
+            self.stdout.write(f"\n-- {name}: median {medians[name]:.2f} ms")
+            sql, params = statements[-1]
+            for line in self.explain(sql, params):
+                self.stdout.write(f"   {line}")
+        return medians
+
+    def explain(self, sql, params):
+        prefix = (
+            "EXPLAIN (ANALYZE, BUFFERS)"
+            if connection.vendor == "postgresql"
+            else "EXPLAIN QUERY PLAN"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"{prefix} {sql}", params)
+            return [" ".join(str(column) for column in row) for row in cursor.fetchall()]
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from library_management import rollups
+
+
+class Command(BaseCommand):
+    """
+    Management command to rebuild the daily borrow rollup and the all-time borrow totals from the issue records.
+
+    Run it once after the rollup table is created, or whenever the rollup is suspected to be out of date.
+    """
+
+    help = "Rebuild the daily borrow rollup and all-time totals used by the insight endpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of rollup rows inserted per batch.",
+        )
+
+    def handle(self, *args, **options):
+        written = rollups.rebuild(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} rollup rows."))
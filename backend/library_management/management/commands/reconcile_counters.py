@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from library_management import counters
+
+
+class Command(BaseCommand):
+    """
+    Management command to recompute the dashboard counters from the source tables.
+
+    Reports every counter that had drifted from the actual table counts and stores the correct values.
+    """
+
+    help = "Recompute the dashboard counters and fix any drift."
+
+    def handle(self, *args, **options):
+        _, drift = counters.reconcile()
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Dashboard counters are up to date."))
+            return
+
+        for field, (stored, actual) in drift.items():
+            self.stdout.write(f"{field}: {stored} -> {actual}")
+        self.stdout.write(
+            self.style.WARNING(f"Reconciled {len(drift)} drifted counter(s).")
+        )
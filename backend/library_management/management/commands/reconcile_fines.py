@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from library_management import fines
+
+
+class Command(BaseCommand):
+    """
+    Management command to rebuild the members' cached fine balances from the fine ledger.
+
+    Every drifted balance is corrected with a single UPDATE. When the ledger is first introduced,
+    run it once with `--open-balances` so existing fines are recorded as opening charges
+    instead of being reset.
+    """
+
+    help = "Rebuild member fine balances from the fine ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--open-balances",
+            action="store_true",
+            help="First record the balance of members without ledger entries as an opening charge.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options["open_balances"]:
+                opened = fines.open_balances()
+                self.stdout.write(f"Recorded {opened} opening balance(s).")
+            corrected = fines.reconcile()
+
+        if corrected:
+            self.stdout.write(self.style.WARNING(f"Corrected {corrected} member balance(s)."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Member fine balances are up to date."))
@@ -1,7 +1,10 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F, Q
 from django.utils import timezone
 from library.models import Book
 from members.models import Members
+from members import policies
 
 
 class LibraryManagement(models.Model):
@@ -16,11 +19,18 @@ class LibraryManagement(models.Model):
         late_fee (DecimalField): The late fee incurred if the book is returned after the due date.
         is_returned (BooleanField): Indicates if the book has been returned.
         late_fee_paid (BooleanField): Indicates if the late fee has been paid.
+        is_overdue (BooleanField): Set by the overdue sweep when an open loan is past the loan period.
+        projected_late_fee (DecimalField): The late fee an open loan would incur if returned today, as of the last sweep.
+        holds_copy (BooleanField): Whether a copy of the book is reserved for the loan, i.e. taken out of its available quantity.
+        updated_at (DateTimeField): The timestamp when the record was last updated.
 
     Methods:
         __str__: Returns a string representation of the LibraryManagement instance.
+        from_db: Remembers the book, returned and fee state loaded from the database so changes can be detected.
+        lock_loaded_state: Locks the row and reloads that state before a change is saved.
+        needs_copy: Tells whether saving the loan has to reserve a copy of its book.
+        clean: Checks that a copy of the book is available when the loan needs one.
         calculate_late_fee: Calculates the late fee based on the return date and user's plan.
-        transfer_late_fee_to_unpaid_fines: Transfers the late fee to the member's unpaid fines if not paid.
         update_member_late_return_count: Updates the member's late return count if the book is returned late.
         save: Custom save method to handle late fee calculation, updating member details, and saving the instance.
 
@@ -47,18 +57,81 @@ class LibraryManagement(models.Model):
     )
     is_returned = models.BooleanField(default=False, verbose_name="Is Returned")
     late_fee_paid = models.BooleanField(default=False, verbose_name="Late Fee Paid")
+    is_overdue = models.BooleanField(default=False, editable=False, verbose_name="Is Overdue")
+    projected_late_fee = models.DecimalField(
+        default=0.00,
+        max_digits=10,
+        decimal_places=2,
+        editable=False,
+        verbose_name="Projected Late Fee",
+    )
+    # Set and cleared together with the book quantity (see `library_management.signals`)
+    holds_copy = models.BooleanField(default=False, editable=False, verbose_name="Holds Copy")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At")
 
     def __str__(self):
         return f"{self.user} - {self.book.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_book_id = instance.__dict__.get("book_id")
+        instance._loaded_is_returned = instance.__dict__.get("is_returned")
+        instance._loaded_late_fee = instance.__dict__.get("late_fee")
+        instance._loaded_late_fee_paid = instance.__dict__.get("late_fee_paid")
+        return instance
+
+    def lock_loaded_state(self):
+        """
+        Locks the record's row for the rest of the transaction and reloads the loaded book, returned,
+        fee and copy state from it.
+
+        Changes (fine ledger entries, counters, copy reservations) are computed against that state,
+        so two concurrent saves of the same record cannot both apply a change from the same old state.
+        """
+        row = (
+            LibraryManagement.objects.select_for_update()
+            .filter(pk=self.pk)
+            .values("book_id", "is_returned", "late_fee", "late_fee_paid", "holds_copy")
+            .first()
+        )
+        if row is None:
+            return
+        self._loaded_book_id = row["book_id"]
+        self._loaded_is_returned = row["is_returned"]
+        self._loaded_late_fee = row["late_fee"]
+        self._loaded_late_fee_paid = row["late_fee_paid"]
+        self.holds_copy = row["holds_copy"]
+
+    def needs_copy(self):
+        """
+        Returns True if saving the loan has to reserve a copy of its book: it is open and does not
+        hold a copy of that book yet.
+        """
+        if self.is_returned:
+            return False
+        loaded_book_id = getattr(self, "_loaded_book_id", None)
+        return not self.holds_copy or loaded_book_id not in (None, self.book_id)
+
+    def clean(self):
+        """
+        Rejects an open loan of a book without an available copy, before the save would fail on it.
+
+        Raises:
+            ValidationError: If the loan needs a copy and none is available.
+        """
+        if self.book_id and self.needs_copy() and self.book.quantity < 1:
+            raise ValidationError({"book": "No copies of this book are available."})
+
     def calculate_late_fee(self):
         """Calculate the late fee for the book borrowing based on the return date and the user's plan.
 
         If the return date is provided, the method calculates the difference in days between the return date and the issued date.
-        If the difference is greater than 30 days, an extra fee is calculated based on the user's plan:
-            - For 'Student' plan: $10 per day
-            - For 'Normal' plan: $20 per day
-            - For 'Premium' plan: $10 per day
+        If the difference is greater than the plan's loan period, an extra fee is calculated from the plan's daily fee.
+        Both are read from the in-memory plan policy registry (see `members.policies`); the defaults are:
+            - For 'Student' plan: $10 per day after 30 days
+            - For 'Normal' plan: $20 per day after 30 days
+            - For 'Premium' plan: $10 per day after 30 days
             - For any other plan: no daily fee
         The total late fee is the product of the extra days and the daily fee determined by the user's plan.
         If the return date is not provided, the late fee is set to 0.
@@ -67,67 +140,44 @@ class LibraryManagement(models.Model):
             None
         """
         if self.return_date:
-            return_date_diff = self.return_date - self.issued_date
-            if return_date_diff.days > 30:
-                extra_days = return_date_diff.days - 30
-                # Determine late fee based on user's plan
-                if self.user.plan == "Student":
-                    daily_fee = 10
-                elif self.user.plan == "Normal":
-                    daily_fee = 20
-                elif self.user.plan == "Premium":
-                    daily_fee = 10
-                else:
-                    daily_fee = 0
-
-                self.late_fee = extra_days * daily_fee
-            else:
-                self.late_fee = 0
+            days_borrowed = (self.return_date - self.issued_date).days
+            self.late_fee = policies.late_fee(self.user.plan, days_borrowed)
         else:
             self.late_fee = 0
 
-    def transfer_late_fee_to_unpaid_fines(self):
-        """
-        Transfers the late fee amount to the member's unpaid fines if the late fee has not been paid.
-
-        If the late fee has been paid, the member's unpaid fine is set to 0.
-        If the late fee has not been paid, the late fee amount is added to the member's unpaid fines.
-
-        Returns:
-            None
-        """
-        if self.late_fee_paid:
-            self.user.unpaid_fine = 0
-        else:
-            self.user.unpaid_fine += self.late_fee
-
-        self.user.save()
-
     def update_member_late_return_count(self):
         """
         Updates the late return count for the member if the book is returned late.
 
         If the return date is provided, the method calculates the difference in days between the return date and the issued date.
-        If the difference is greater than 30 days, the late return count for the member is incremented by 1.
+        If the difference is greater than the loan period, the late return count for the member is incremented by 1
+        with an `F()` update, so the member row is not rewritten as a whole.
 
         Returns:
             None
         """
         if self.return_date:
-            return_date_diff = self.return_date - self.issued_date
-            if return_date_diff.days > 30:
-                self.user.late_return_count += 1
-                self.user.save()
+            days_borrowed = (self.return_date - self.issued_date).days
+            if policies.is_late(self.user.plan, days_borrowed):
+                Members.objects.filter(pk=self.user_id).update(
+                    late_return_count=F("late_return_count") + 1,
+                    updated_at=timezone.now(),
+                )
 
     def save(self, *args, **kwargs):
         """
         Saves the LibraryManagement instance with additional functionality for handling late fees, member details, and instance saving.
 
+        An existing record's row is locked first and its loaded state reloaded (see `lock_loaded_state`).
         If the book is marked as returned and the return date is not set, it sets the return date to the current date and calculates the late fee.
+        A returned book is no longer overdue, so the overdue flag and projected late fee are cleared.
         Calculates the late fee for the borrowing.
-        If the instance is new (not yet saved), updates the member's late return count.
-        Transfers the late fee to the member's unpaid fines.
+        If the book has just been returned (or is created as returned), updates the member's late return count.
         Calls the parent class save method to save the instance.
+        All of the above runs in a single transaction together with the dashboard counter updates, the
+        fine ledger entries recorded for changes of the late fee, and the reservation of a copy of the book
+        while the loan is open (see `library_management.signals`).
+        When `update_fields` includes the book or the returned flag, the copy reservation flag is saved with them.
 
         Parameters:
             *args: Additional positional arguments.
@@ -136,18 +186,257 @@ class LibraryManagement(models.Model):
         Returns:
             None
         """
-        if self.is_returned and not self.return_date:
-            self.return_date = timezone.now().date()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"book", "book_id", "is_returned"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "holds_copy"}
+
+        with transaction.atomic(savepoint=False):
+            if not self._state.adding:
+                self.lock_loaded_state()
+
+            if self.is_returned and not self.return_date:
+                self.return_date = timezone.now().date()
+                self.calculate_late_fee()
+
+            if self.is_returned:
+                self.is_overdue = False
+                self.projected_late_fee = 0
+
             self.calculate_late_fee()
 
-        self.calculate_late_fee()
+            if self.is_returned and not getattr(self, "_loaded_is_returned", False):
+                self.update_member_late_return_count()
 
-        if not self.pk:
-            self.update_member_late_return_count()
+            super().save(*args, **kwargs)
+
+    class Meta:
+        verbose_name_plural = "Library Management"
+        indexes = [
+            models.Index(fields=["issued_date", "id"], name="loan_issued_idx"),
+            # Open loans are a small share of all loans: the plan limit check counts a member's
+            # open loans, the overdue sweep and exports range over their issue dates
+            models.Index(
+                fields=["user"], condition=Q(is_returned=False), name="loan_open_user_idx"
+            ),
+            models.Index(
+                fields=["issued_date"],
+                condition=Q(is_returned=False),
+                name="loan_open_issued_idx",
+            ),
+            # The overdue sweep refreshes the members whose loans changed since the last run
+            models.Index(fields=["updated_at"], name="loan_updated_idx"),
+        ]
 
-        self.transfer_late_fee_to_unpaid_fines()
 
+class DashboardCounter(models.Model):
+    """
+    A single-row table of dashboard counters, kept up to date in the same transaction as the writes that change them.
+
+    Attributes:
+        open_loans (IntegerField): Number of issued books that are not returned yet.
+        returned_loans (IntegerField): Number of issued books that have been returned.
+        total_books (IntegerField): Number of books in the catalog.
+        total_members (IntegerField): Number of members.
+        student_members (IntegerField): Number of members on the 'Student' plan.
+        normal_members (IntegerField): Number of members on the 'Normal' plan.
+        premium_members (IntegerField): Number of members on the 'Premium' plan.
+        updated_at (DateTimeField): The timestamp of the last reconciliation.
+
+    Properties:
+        total_loans: Number of issue records, returned or not.
+    """
+
+    open_loans = models.IntegerField(default=0, verbose_name="Open Loans")
+    returned_loans = models.IntegerField(
+        default=0, verbose_name="Returned Loans"
+    )
+    total_books = models.IntegerField(default=0, verbose_name="Total Books")
+    total_members = models.IntegerField(default=0, verbose_name="Total Members")
+    student_members = models.IntegerField(
+        default=0, verbose_name="Student Members"
+    )
+    normal_members = models.IntegerField(
+        default=0, verbose_name="Normal Members"
+    )
+    premium_members = models.IntegerField(
+        default=0, verbose_name="Premium Members"
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At")
+
+    @property
+    def total_loans(self):
+        return self.open_loans + self.returned_loans
+
+    class Meta:
+        verbose_name_plural = "Dashboard Counters"
+
+
+class BookBorrowDaily(models.Model):
+    """
+    A daily rollup of how many times each book was borrowed, maintained incrementally as issue records are created.
+
+    Attributes:
+        book (ForeignKey): The borrowed book.
+        day (DateField): The day the book was borrowed on.
+        borrow_count (PositiveIntegerField): Number of times the book was borrowed on that day.
+
+    Meta:
+        constraints: One row per book and day.
+        indexes: Index on the day for date range lookups.
+    """
+
+    book = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        verbose_name="Book",
+        related_name="borrow_rollups",
+    )
+    day = models.DateField(verbose_name="Day")
+    borrow_count = models.PositiveIntegerField(default=0, verbose_name="Borrow Count")
+
+    def __str__(self):
+        return f"{self.book_id} - {self.day}: {self.borrow_count}"
+
+    class Meta:
+        verbose_name_plural = "Book Borrow Daily"
+        constraints = [
+            models.UniqueConstraint(fields=["book", "day"], name="unique_book_borrow_day")
+        ]
+        indexes = [models.Index(fields=["day", "book"], name="book_borrow_day_idx")]
+
+
+class BookBorrowTotal(models.Model):
+    """
+    The all-time number of times each book was borrowed, maintained together with the daily rollup.
+
+    Lets the all-time ranking read the top rows of an index instead of summing the whole daily
+    rollup, whose size keeps growing with history.
+
+    Attributes:
+        book (OneToOneField): The borrowed book.
+        borrow_count (PositiveIntegerField): Number of times the book was borrowed.
+
+    Meta:
+        indexes: Index on the count, most borrowed first, for the all-time ranking.
+    """
+
+    book = models.OneToOneField(
+        Book,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name="Book",
+        related_name="borrow_total",
+    )
+    borrow_count = models.PositiveIntegerField(default=0, verbose_name="Borrow Count")
+
+    def __str__(self):
+        return f"{self.book_id}: {self.borrow_count}"
+
+    class Meta:
+        verbose_name_plural = "Book Borrow Totals"
+        indexes = [
+            models.Index(fields=["-borrow_count", "book"], name="book_borrow_total_idx")
+        ]
+
+
+class OverdueSweep(models.Model):
+    """
+    A run of the overdue sweep, with the number of rows it changed.
+
+    The start of the latest run bounds the members whose aggregates the next run refreshes
+    (see `library_management.sweeps`).
+
+    Attributes:
+        started_at (DateTimeField): The timestamp the run started at.
+        full (BooleanField): Whether the run refreshed every member instead of the touched ones.
+        loans_updated (PositiveIntegerField): Number of open loans whose overdue state changed.
+        loans_cleared (PositiveIntegerField): Number of returned loans whose overdue state was cleared.
+        members_updated (PositiveIntegerField): Number of members whose aggregates changed.
+    """
+
+    started_at = models.DateTimeField(verbose_name="Started At")
+    full = models.BooleanField(default=False, verbose_name="Full")
+    loans_updated = models.PositiveIntegerField(default=0, verbose_name="Loans Updated")
+    loans_cleared = models.PositiveIntegerField(default=0, verbose_name="Loans Cleared")
+    members_updated = models.PositiveIntegerField(default=0, verbose_name="Members Updated")
+
+    def __str__(self):
+        return f"Overdue sweep at {self.started_at}"
+
+    class Meta:
+        verbose_name_plural = "Overdue Sweeps"
+        indexes = [models.Index(fields=["-started_at"], name="overdue_sweep_started_idx")]
+
+
+class FineTransaction(models.Model):
+    """
+    An append-only ledger entry changing a member's fine balance.
+
+    Charges increase the balance, payments and waivers decrease it. Amounts are always positive;
+    `Members.unpaid_fine` is the cached sum of the member's signed entries, maintained with an
+    `F()` increment whenever an entry is recorded (see `library_management.fines`).
+
+    Attributes:
+        member (ForeignKey): The member whose balance changes.
+        loan (ForeignKey): The issue record the entry relates to, if any (not enforced, the record may be deleted).
+        kind (CharField): 'charge', 'payment' or 'waiver'.
+        amount (DecimalField): The positive amount of the entry.
+        note (CharField): A short description of the entry.
+        created_at (DateTimeField): The timestamp when the entry was recorded.
+
+    Properties:
+        signed_amount: The amount as applied to the balance (negative for payments and waivers).
+
+    Methods:
+        save: Inserts the entry; existing entries cannot be changed.
+    """
+
+    CHARGE = "charge"
+    PAYMENT = "payment"
+    WAIVER = "waiver"
+    KIND_CHOICES = [
+        (CHARGE, "Charge"),
+        (PAYMENT, "Payment"),
+        (WAIVER, "Waiver"),
+    ]
+
+    member = models.ForeignKey(
+        Members,
+        on_delete=models.CASCADE,
+        verbose_name="Member",
+        related_name="fine_transactions",
+    )
+    # Entries are never rewritten, so they keep the id of a deleted issue record
+    loan = models.ForeignKey(
+        LibraryManagement,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        verbose_name="Issue Record",
+        related_name="fine_transactions",
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name="Kind")
+    amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Amount")
+    note = models.CharField(max_length=200, blank=True, verbose_name="Note")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+
+    def __str__(self):
+        return f"{self.member_id} {self.kind} {self.amount}"
+
+    @property
+    def signed_amount(self):
+        return self.amount if self.kind == self.CHARGE else -self.amount
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Fine transactions are append-only and cannot be changed.")
         super().save(*args, **kwargs)
 
     class Meta:
-        verbose_name_plural = "Library Management"
+        verbose_name_plural = "Fine Transactions"
+        indexes = [
+            models.Index(
+                fields=["member", "-created_at", "-id"], name="fine_member_created_idx"
+            ),
+        ]
@@ -0,0 +1,137 @@
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+
+from .models import BookBorrowDaily, BookBorrowTotal, LibraryManagement
+
+
+def upsert_counts(model, key_columns, counts):
+    """
+    Adds counts to the `borrow_count` of the rows keyed by `key_columns`, creating missing rows.
+
+    Parameters:
+        model (Model): The rollup model.
+        key_columns (tuple): The columns of the unique key.
+        counts (dict): Key tuple -> count to add.
+    """
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    columns = [qn(column) for column in (*key_columns, "borrow_count")]
+    rows = ", ".join([f"({', '.join(['%s'] * len(columns))})"] * len(counts))
+    params = [value for key, count in counts.items() for value in (*key, count)]
+    sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES {rows} "
+        f"ON CONFLICT ({', '.join(columns[:-1])}) "
+        f"DO UPDATE SET {qn('borrow_count')} = {table}.{qn('borrow_count')} + EXCLUDED.{qn('borrow_count')}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def record_borrows(borrows):
+    """
+    Adds the given borrows to the daily rollup and the all-time totals, with one upsert each.
+
+    Parameters:
+        borrows (iterable): (book_id, day) pairs, one per issued book.
+    """
+    counts = Counter(borrows)
+    if not counts:
+        return
+
+    totals = Counter()
+    for (book_id, _), count in counts.items():
+        totals[(book_id,)] += count
+    upsert_counts(BookBorrowDaily, ("book_id", "day"), counts)
+    upsert_counts(BookBorrowTotal, ("book_id",), totals)
+
+
+def remove_borrow(book_id, day):
+    """
+    Removes a single borrow from the daily rollup and the totals, e.g. when an issue record is deleted.
+    """
+    BookBorrowDaily.objects.filter(
+        book_id=book_id, day=day, borrow_count__gt=0
+    ).update(borrow_count=F("borrow_count") - 1)
+    BookBorrowTotal.objects.filter(book_id=book_id, borrow_count__gt=0).update(
+        borrow_count=F("borrow_count") - 1
+    )
+
+
+def move_borrow(from_book_id, to_book_id, day):
+    """
+    Moves a borrow from one book to another, when an issue record's book is changed.
+    """
+    remove_borrow(from_book_id, day)
+    record_borrows([(to_book_id, day)])
+
+
+def top_books(limit, start=None, end=None):
+    """
+    Returns the most borrowed books, optionally within an inclusive date range.
+
+    Date ranges sum the daily rollup rows of the range; the all-time ranking reads the top rows
+    of the totals index, so its cost does not grow with history.
+
+    Returns:
+        list: Dicts with 'book__name' and 'num_borrowed', most borrowed first.
+    """
+    if start is None:
+        return list(
+            BookBorrowTotal.objects.filter(borrow_count__gt=0)
+            .order_by("-borrow_count", "book")
+            .values("book__name", num_borrowed=F("borrow_count"))[:limit]
+        )
+    return list(
+        BookBorrowDaily.objects.filter(day__range=[start, end], borrow_count__gt=0)
+        .values("book__name")
+        .annotate(num_borrowed=Sum("borrow_count"))
+        .order_by("-num_borrowed")[:limit]
+    )
+
+
+def rebuild(batch_size=5000):
+    """
+    Rebuilds the whole daily rollup and the all-time totals from the issue records.
+
+    Returns:
+        int: Number of daily rollup rows written.
+    """
+    totals = (
+        LibraryManagement.objects.values("book_id", "issued_date")
+        .annotate(borrow_count=Count("id"))
+        .order_by()
+    )
+    written = 0
+    with transaction.atomic():
+        BookBorrowDaily.objects.all().delete()
+        batch = []
+        for row in totals.iterator(chunk_size=batch_size):
+            batch.append(
+                BookBorrowDaily(
+                    book_id=row["book_id"],
+                    day=row["issued_date"],
+                    borrow_count=row["borrow_count"],
+                )
+            )
+            if len(batch) >= batch_size:
+                BookBorrowDaily.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        BookBorrowDaily.objects.bulk_create(batch)
+        written += len(batch)
+
+        BookBorrowTotal.objects.all().delete()
+        BookBorrowTotal.objects.bulk_create(
+            [
+                BookBorrowTotal(book_id=row["book_id"], borrow_count=row["borrow_count"])
+                for row in LibraryManagement.objects.values("book_id")
+                .annotate(borrow_count=Count("id"))
+                .order_by()
+                .iterator(chunk_size=batch_size)
+            ],
+            batch_size=batch_size,
+        )
+    return written
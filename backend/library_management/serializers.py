@@ -1,6 +1,8 @@
 from rest_framework import serializers
-from .models import LibraryManagement
+from .models import FineTransaction, LibraryManagement
+from members.models import Members
 from library.serializers import CategorySerializer
+from decimal import Decimal
 import datetime
 
 
@@ -77,3 +79,89 @@ class LibraryManagementSerializer(serializers.ModelSerializer):
 
         model = LibraryManagement
         fields = "__all__"
+
+
+class FineSettlementSerializer(serializers.Serializer):
+    """
+    Serializer validating a payment or waiver of a member's fines.
+
+    Attributes:
+        kind (ChoiceField): 'payment' or 'waiver'.
+        amount (DecimalField): The positive amount paid or waived.
+        note (CharField): An optional description of the entry.
+    """
+
+    kind = serializers.ChoiceField(
+        choices=[FineTransaction.PAYMENT, FineTransaction.WAIVER]
+    )
+    amount = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=Decimal("0.01")
+    )
+    note = serializers.CharField(max_length=200, required=False, default="")
+
+
+class BulkIssueSerializer(serializers.Serializer):
+    """
+    Serializer validating a bulk issue request.
+
+    Attributes:
+        user (IntegerField): The id of the member borrowing the books.
+        books (ListField): The ids of the books to issue.
+    """
+
+    user = serializers.IntegerField()
+    books = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=100
+    )
+
+
+class BulkReturnSerializer(serializers.Serializer):
+    """
+    Serializer validating a bulk return request.
+
+    Attributes:
+        loans (ListField): The ids of the issue records to mark as returned.
+    """
+
+    loans = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=100
+    )
+
+
+class LedgerExportSerializer(serializers.Serializer):
+    """
+    Serializer validating the filters of a ledger export.
+
+    Attributes:
+        export_format (ChoiceField): The output format, 'csv' or 'jsonl'.
+        issued_from (DateField): Only export records issued on or after this date.
+        issued_to (DateField): Only export records issued on or before this date.
+        is_returned (BooleanField): Only export returned or open records.
+        plan (ChoiceField): Only export records of members on this plan.
+    """
+
+    export_format = serializers.ChoiceField(choices=["csv", "jsonl"], default="csv")
+    issued_from = serializers.DateField(required=False)
+    issued_to = serializers.DateField(required=False)
+    is_returned = serializers.BooleanField(required=False, allow_null=True, default=None)
+    plan = serializers.ChoiceField(choices=Members.PLAN_CHOICES, required=False)
+
+    def validate(self, attrs):
+        issued_from, issued_to = attrs.get("issued_from"), attrs.get("issued_to")
+        if issued_from and issued_to and issued_from > issued_to:
+            raise serializers.ValidationError("'issued_from' must not be after 'issued_to'.")
+        return attrs
+
+
+class FineTransactionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the entries of a member's fine statement.
+
+    Meta:
+        model (FineTransaction): The model associated with the serializer.
+        fields (list): The ledger columns shown on a statement.
+    """
+
+    class Meta:
+        model = FineTransaction
+        fields = ["id", "kind", "amount", "loan", "note", "created_at"]
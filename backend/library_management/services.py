@@ -0,0 +1,370 @@
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from library.models import Book
+from lms_project.caching import invalidate_on_commit
+from members.models import Members
+from members import policies
+from members.policies import max_books_allowed
+from . import counters, fines, rollups
+from .models import FineTransaction, LibraryManagement
+
+# The cached book list shows available quantities, so every inventory change invalidates it.
+CATALOG_CACHE_NAMESPACE = "books"
+
+
+class IssueError(Exception):
+    """
+    Raised when a book cannot be issued to a member. The message is safe to return to the client.
+    """
+
+
+def open_loans_subquery():
+    """
+    Returns a subquery counting the books currently issued to the member of the outer query.
+    """
+    return Coalesce(
+        Subquery(
+            LibraryManagement.objects.filter(user=OuterRef("pk"), is_returned=False)
+            .order_by()
+            .values("user")
+            .annotate(count=Count("id"))
+            .values("count")
+        ),
+        0,
+    )
+
+
+def lock_member(member_id):
+    """
+    Locks the member row for the rest of the transaction and sets its open loan count.
+
+    The loans are counted in a separate query once the lock is held. Under READ COMMITTED every
+    statement reads the latest committed rows, so the count includes the loans of a concurrent
+    issue to the same member that committed while this one waited for the lock. Counting in the
+    locking statement itself would use the snapshot taken before the wait.
+
+    Returns:
+        Members: The locked member with `open_loans` set, or None if it does not exist.
+    """
+    member = Members.objects.select_for_update().filter(pk=member_id).first()
+    if member is not None:
+        member.open_loans = LibraryManagement.objects.filter(
+            user_id=member_id, is_returned=False
+        ).count()
+    return member
+
+
+def reserve_copies(book_id, count=1):
+    """
+    Takes `count` copies of a book out of the available quantity, if that many are available.
+
+    The conditional UPDATE locks the book row, so concurrent reservations can never
+    take the quantity below zero.
+
+    Returns:
+        bool: True if the copies were reserved.
+    """
+    reserved = bool(
+        Book.objects.filter(pk=book_id, quantity__gte=count).update(
+            quantity=F("quantity") - count, updated_at=timezone.now()
+        )
+    )
+    if reserved:
+        invalidate_on_commit(CATALOG_CACHE_NAMESPACE)
+    return reserved
+
+
+def release_copies(book_id, count=1):
+    """
+    Puts `count` copies of a book back into the available quantity.
+    """
+    Book.objects.filter(pk=book_id).update(
+        quantity=F("quantity") + count, updated_at=timezone.now()
+    )
+    invalidate_on_commit(CATALOG_CACHE_NAMESPACE)
+
+
+def per_row(values, output_field=None):
+    """
+    Returns a CASE expression mapping primary keys to values, for updating many rows in one statement.
+    """
+    return Case(
+        *[When(pk=pk, then=Value(value)) for pk, value in values.items()],
+        output_field=output_field,
+    )
+
+
+def issue_book(member_id, book_id):
+    """
+    Issues a book to a member as one atomic operation.
+
+    The member row is locked first and its open loans are counted after the lock is held, so
+    concurrent issues to the same member wait for each other and plan limits cannot be exceeded.
+    Saving the issue record then reserves a copy with a conditional `F()` update on the book row
+    (see `library_management.signals`), which fails the whole issue when no copy is available.
+
+    Parameters:
+        member_id (int): The id of the member borrowing the book.
+        book_id (int): The id of the book being borrowed.
+
+    Returns:
+        LibraryManagement: The created issue record.
+
+    Raises:
+        IssueError: If the member does not exist, has unpaid fines, has reached the plan limit,
+            or the book has no copy available.
+    """
+    with transaction.atomic():
+        member = lock_member(member_id)
+        if member is None:
+            raise IssueError("User does not exist.")
+
+        if member.unpaid_fine > 0:
+            raise IssueError("User has unpaid fees pending. Cannot issue a new book.")
+
+        max_books = max_books_allowed(member.plan)
+        if member.open_loans >= max_books:
+            raise IssueError(
+                f"Maximum books limit ({max_books}) reached for the user's plan."
+            )
+
+        loan = LibraryManagement(user=member, book_id=book_id)
+        loan.save()
+    return loan
+
+
+def bulk_issue(member_id, book_ids):
+    """
+    Issues a batch of books to a member in one transaction.
+
+    The member is locked and checked for fines once, its open loans are counted after the lock
+    is held, the plan limit is applied to the batch as a whole, and the books are locked together. Accepted books are written with one `bulk_create`
+    and one quantity UPDATE; books past the plan limit or out of stock are rejected individually.
+
+    Parameters:
+        member_id (int): The id of the member borrowing the books.
+        book_ids (list): The ids of the books to issue, in order. A book may appear more than once.
+
+    Returns:
+        list: One result dict per requested book, with 'book', 'status' and either 'id' or 'message'.
+
+    Raises:
+        IssueError: If the member does not exist or has unpaid fines.
+    """
+    with transaction.atomic():
+        member = lock_member(member_id)
+        if member is None:
+            raise IssueError("User does not exist.")
+
+        if member.unpaid_fine > 0:
+            raise IssueError("User has unpaid fees pending. Cannot issue a new book.")
+
+        max_books = max_books_allowed(member.plan)
+        remaining = max_books - member.open_loans
+        # Locked in primary key order, so batches sharing books cannot deadlock each other
+        available = dict(
+            Book.objects.select_for_update()
+            .filter(pk__in=set(book_ids))
+            .order_by("pk")
+            .values_list("id", "quantity")
+        )
+
+        results = []
+        accepted = []
+        for book_id in book_ids:
+            result = {"book": book_id, "status": "rejected"}
+            if book_id not in available:
+                result["message"] = "Book does not exist."
+            elif remaining <= 0:
+                result["message"] = (
+                    f"Maximum books limit ({max_books}) reached for the user's plan."
+                )
+            elif available[book_id] <= 0:
+                result["message"] = "No copies of this book are available."
+            else:
+                available[book_id] -= 1
+                remaining -= 1
+                result["status"] = "issued"
+                accepted.append(result)
+            results.append(result)
+
+        if accepted:
+            taken = Counter(result["book"] for result in accepted)
+            Book.objects.filter(pk__in=taken).update(
+                quantity=F("quantity") - per_row(taken), updated_at=timezone.now()
+            )
+            invalidate_on_commit(CATALOG_CACHE_NAMESPACE)
+            loans = LibraryManagement.objects.bulk_create(
+                [
+                    LibraryManagement(user=member, book_id=result["book"], holds_copy=True)
+                    for result in accepted
+                ]
+            )
+            for result, loan in zip(accepted, loans):
+                result["id"] = loan.pk
+            counters.adjust(open_loans=len(loans))
+            rollups.record_borrows((loan.book_id, loan.issued_date) for loan in loans)
+
+    return results
+
+
+def bulk_return(loan_ids):
+    """
+    Returns a batch of issued books in one transaction.
+
+    Late fees are computed for the whole batch from the member plans, then the records, the
+    fine ledger entries, the members' fine balances and late return counts, and the book
+    quantities are each written with a single statement.
+
+    Parameters:
+        loan_ids (list): The ids of the issue records to mark as returned.
+
+    Returns:
+        list: One result dict per requested record, with 'id', 'status' and either 'late_fee' or 'message'.
+    """
+    now = timezone.now()
+    today = timezone.localdate(now)
+    with transaction.atomic():
+        loans = {
+            loan.pk: loan
+            for loan in LibraryManagement.objects.select_for_update(of=("self",))
+            .select_related("user")
+            .only(
+                "id",
+                "book_id",
+                "issued_date",
+                "is_returned",
+                "late_fee_paid",
+                "holds_copy",
+                "user__plan",
+            )
+            .filter(pk__in=set(loan_ids))
+            .order_by("pk")
+        }
+
+        results = []
+        returned = []
+        balances = defaultdict(Decimal)
+        entries = []
+        late_returns = Counter()
+        copies = Counter()
+        for loan_id in loan_ids:
+            loan = loans.get(loan_id)
+            result = {"id": loan_id, "status": "rejected"}
+            if loan is None:
+                result["message"] = "Issue record does not exist."
+            elif loan.is_returned:
+                result["message"] = "Book is already returned."
+            else:
+                days_borrowed = (today - loan.issued_date).days
+                loan.is_returned = True
+                loan.return_date = today
+                loan.updated_at = now
+                loan.is_overdue = False
+                loan.projected_late_fee = 0
+                # Only copies actually reserved for the loan go back into stock
+                if loan.holds_copy:
+                    copies[loan.book_id] += 1
+                loan.holds_copy = False
+                loan.late_fee = Decimal(
+                    policies.late_fee(loan.user.plan, days_borrowed)
+                ).quantize(Decimal("0.01"))
+                loan_entries = fines.loan_entries(
+                    loan, 0, loan.late_fee_paid, loan.late_fee, loan.late_fee_paid
+                )
+                for entry in loan_entries:
+                    balances[loan.user_id] += entry.signed_amount
+                entries.extend(loan_entries)
+                if policies.is_late(loan.user.plan, days_borrowed):
+                    late_returns[loan.user_id] += 1
+                returned.append(loan)
+                result.update(status="returned", late_fee=str(loan.late_fee))
+            results.append(result)
+
+        if returned:
+            LibraryManagement.objects.bulk_update(
+                returned,
+                [
+                    "is_returned",
+                    "return_date",
+                    "late_fee",
+                    "is_overdue",
+                    "projected_late_fee",
+                    "holds_copy",
+                    "updated_at",
+                ],
+            )
+
+            FineTransaction.objects.bulk_create(entries)
+
+            members = set(balances) | set(late_returns)
+            if members:
+                Members.objects.filter(pk__in=members).update(
+                    unpaid_fine=F("unpaid_fine")
+                    + per_row({pk: balances.get(pk, Decimal(0)) for pk in members}),
+                    late_return_count=F("late_return_count")
+                    + per_row({pk: late_returns.get(pk, 0) for pk in members}),
+                    updated_at=now,
+                )
+
+            if copies:
+                Book.objects.filter(pk__in=copies).update(
+                    quantity=F("quantity") + per_row(copies), updated_at=now
+                )
+                invalidate_on_commit(CATALOG_CACHE_NAMESPACE)
+            counters.adjust(open_loans=-len(returned), returned_loans=len(returned))
+
+    return results
+
+
+def backfill_copy_holds(reserved_from_id=None):
+    """
+    Reserves copies for the open loans that do not hold one yet, e.g. loans recorded before
+    copies were reserved.
+
+    For every book, its open loans without a copy are taken out of the available quantity, which
+    never goes below zero, and the loans are marked as holding a copy. Running it again changes
+    nothing. Loans from `reserved_from_id` on already had their copy taken when they were issued,
+    so they are only marked.
+
+    Parameters:
+        reserved_from_id (int): The id of the first loan whose copy was already taken, if any.
+
+    Returns:
+        tuple: The number of loans marked, of copies taken, and of copies missing from the stock.
+    """
+    with transaction.atomic():
+        pending = LibraryManagement.objects.filter(is_returned=False, holds_copy=False)
+        marked = 0
+        if reserved_from_id is not None:
+            marked = pending.filter(pk__gte=reserved_from_id).update(holds_copy=True)
+            pending = pending.filter(pk__lt=reserved_from_id)
+
+        needed = dict(
+            pending.order_by()
+            .values("book")
+            .annotate(count=Count("id"))
+            .values_list("book", "count")
+        )
+        stock = dict(
+            Book.objects.select_for_update()
+            .filter(pk__in=needed)
+            .order_by("pk")
+            .values_list("id", "quantity")
+        )
+        taken = {pk: min(count, stock[pk]) for pk, count in needed.items() if stock[pk] > 0}
+        if taken:
+            Book.objects.filter(pk__in=taken).update(
+                quantity=F("quantity") - per_row(taken), updated_at=timezone.now()
+            )
+            invalidate_on_commit(CATALOG_CACHE_NAMESPACE)
+        marked += pending.update(holds_copy=True)
+
+    copies = sum(taken.values())
+    return marked, copies, sum(needed.values()) - copies
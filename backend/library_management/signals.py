@@ -0,0 +1,125 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from library.models import Book
+from members.models import Members
+from . import counters, fines, rollups, services
+from .models import LibraryManagement
+
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.adjust(total_books=1)
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, **kwargs):
+    counters.adjust(total_books=-1)
+
+
+@receiver(post_save, sender=Members)
+def member_saved(sender, instance, created, **kwargs):
+    if "plan" in instance.get_deferred_fields():
+        return
+    if created:
+        counters.adjust(counters.plan_deltas(instance.plan, 1))
+    else:
+        previous = getattr(instance, "_loaded_plan", None)
+        if previous is not None and previous != instance.plan:
+            deltas = counters.plan_deltas(instance.plan, 1)
+            deltas.update(counters.plan_deltas(previous, -1))
+            counters.adjust(deltas)
+    instance._loaded_plan = instance.plan
+
+
+@receiver(post_delete, sender=Members)
+def member_deleted(sender, instance, **kwargs):
+    plan = getattr(instance, "_loaded_plan", None) or instance.__dict__.get("plan")
+    counters.adjust(counters.plan_deltas(plan, -1))
+
+
+def charged_fee(is_returned, late_fee):
+    return late_fee if is_returned and late_fee else 0
+
+
+@receiver(pre_save, sender=LibraryManagement)
+def loan_saving(sender, instance, update_fields=None, **kwargs):
+    """
+    Keeps one copy of the loan's book reserved exactly while the loan is open.
+
+    The copy held for the previously loaded book is released when the loan is returned or moved to
+    another book, and a copy of the current book is reserved when the loan is open without one.
+    `holds_copy` records the reservation, so returns and deletes only release copies that were taken.
+
+    Raises:
+        IssueError: If the loan needs a copy and none is available; the save is rolled back.
+    """
+    if update_fields is not None and "holds_copy" not in update_fields:
+        return
+    if {"book_id", "is_returned", "holds_copy"} & instance.get_deferred_fields():
+        return
+    if instance.holds_copy and (instance.is_returned or instance.needs_copy()):
+        services.release_copies(getattr(instance, "_loaded_book_id", None) or instance.book_id)
+        instance.holds_copy = False
+    if instance.needs_copy():
+        if not services.reserve_copies(instance.book_id):
+            raise services.IssueError("No copies of this book are available.")
+        instance.holds_copy = True
+
+
+@receiver(post_save, sender=LibraryManagement)
+def loan_saved(sender, instance, created, **kwargs):
+    if {"is_returned", "late_fee", "late_fee_paid"} & instance.get_deferred_fields():
+        return
+    record_fine_changes(instance, created)
+    if created:
+        counters.adjust(counters.loan_deltas(instance.is_returned, 1))
+        rollups.record_borrows([(instance.book_id, instance.issued_date)])
+    else:
+        previous_book_id = getattr(instance, "_loaded_book_id", None)
+        if previous_book_id is not None and previous_book_id != instance.book_id:
+            rollups.move_borrow(previous_book_id, instance.book_id, instance.issued_date)
+        previous = getattr(instance, "_loaded_is_returned", None)
+        if previous is not None and previous != instance.is_returned:
+            deltas = counters.loan_deltas(instance.is_returned, 1)
+            deltas.update(counters.loan_deltas(previous, -1))
+            counters.adjust(deltas)
+    instance._loaded_book_id = instance.book_id
+    instance._loaded_is_returned = instance.is_returned
+    instance._loaded_late_fee = instance.late_fee
+    instance._loaded_late_fee_paid = instance.late_fee_paid
+
+
+def record_fine_changes(instance, created):
+    """
+    Records the fine ledger entries for the change of a loan's late fee state since it was loaded.
+    """
+    if created:
+        charged_before, paid_before = 0, False
+    else:
+        charged_before = charged_fee(
+            getattr(instance, "_loaded_is_returned", False),
+            getattr(instance, "_loaded_late_fee", 0),
+        )
+        paid_before = bool(getattr(instance, "_loaded_late_fee_paid", False))
+    fines.record(
+        fines.loan_entries(
+            instance,
+            charged_before,
+            paid_before,
+            charged_fee(instance.is_returned, instance.late_fee),
+            instance.late_fee_paid,
+        )
+    )
+
+
+@receiver(post_delete, sender=LibraryManagement)
+def loan_deleted(sender, instance, **kwargs):
+    is_returned = getattr(instance, "_loaded_is_returned", None)
+    if is_returned is None:
+        is_returned = instance.__dict__.get("is_returned", False)
+    counters.adjust(counters.loan_deltas(is_returned, -1))
+    rollups.remove_borrow(instance.book_id, instance.issued_date)
+    if instance.__dict__.get("holds_copy"):
+        services.release_copies(instance.book_id)
@@ -0,0 +1,173 @@
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from members import policies
+from members.models import Members
+from .models import LibraryManagement, OverdueSweep
+
+# A write committed after a sweep read the loans can carry a slightly earlier timestamp, so the
+# next sweep also refreshes the members touched shortly before the previous one started.
+TOUCHED_OVERLAP = timedelta(minutes=10)
+
+
+def plan_case(plan_column, attribute):
+    """
+    Returns a SQL CASE expression mapping the plan in `plan_column` to a policy attribute, with its parameters.
+
+    The values come from the in-memory plan policy registry; unknown plans get the `UNKNOWN_PLAN` value.
+    """
+    plans = policies.all_policies()
+    whens = " ".join("WHEN %s THEN %s" for _ in plans)
+    params = [
+        value
+        for plan, policy in plans.items()
+        for value in (plan, getattr(policy, attribute))
+    ]
+    default = getattr(policies.UNKNOWN_PLAN, attribute)
+    return f"CASE {plan_column} {whens} ELSE %s END", [*params, default]
+
+
+def update_open_loans(cursor, today, now):
+    """
+    Recomputes `is_overdue` and `projected_late_fee` of every open loan in one UPDATE ... FROM.
+
+    Only loans issued before the shortest loan period, or flagged before, are considered,
+    and only rows whose values actually change are written.
+    """
+    loans = connection.ops.quote_name(LibraryManagement._meta.db_table)
+    members = connection.ops.quote_name(Members._meta.db_table)
+    shortest_period = min(
+        policy.loan_period_days
+        for policy in [*policies.all_policies().values(), policies.UNKNOWN_PLAN]
+    )
+    cutoff = today - timedelta(days=shortest_period)
+    period, period_params = plan_case("m.plan", "loan_period_days")
+    fee, fee_params = plan_case("m.plan", "daily_late_fee")
+
+    cursor.execute(
+        f"""
+        UPDATE {loans} AS l
+        SET is_overdue = computed.overdue, projected_late_fee = computed.fee, updated_at = %s
+        FROM (
+            SELECT o.id,
+                   %s - o.issued_date > ({period}) AS overdue,
+                   ({fee}) * GREATEST(%s - o.issued_date - ({period}), 0) AS fee
+            FROM {loans} AS o
+            JOIN {members} AS m ON m.id = o.user_id
+            WHERE NOT o.is_returned
+              AND (o.issued_date < %s OR o.is_overdue OR o.projected_late_fee <> 0)
+        ) AS computed
+        WHERE l.id = computed.id
+          AND (l.is_overdue <> computed.overdue OR l.projected_late_fee <> computed.fee)
+        """,
+        [
+            now,
+            today,
+            *period_params,
+            *fee_params,
+            today,
+            *period_params,
+            cutoff,
+        ],
+    )
+    return cursor.rowcount
+
+
+def update_member_aggregates(cursor, now, since=None):
+    """
+    Refreshes the members' projected fine and late return count from their loans in one UPDATE ... FROM.
+
+    With `since`, only members changed since then, or with a loan changed since then, are
+    aggregated; the loans updated by the sweep itself are stamped with `now` and always count.
+    Without it, every member is.
+    """
+    loans = connection.ops.quote_name(LibraryManagement._meta.db_table)
+    members = connection.ops.quote_name(Members._meta.db_table)
+    period, period_params = plan_case("a.plan", "loan_period_days")
+    touched, touched_params = "", []
+    if since is not None:
+        touched = (
+            f"WHERE a.updated_at >= %s "
+            f"OR a.id IN (SELECT t.user_id FROM {loans} AS t WHERE t.updated_at >= %s)"
+        )
+        touched_params = [since, since]
+
+    cursor.execute(
+        f"""
+        UPDATE {members} AS m
+        SET projected_fine = totals.projected_fine,
+            late_return_count = totals.late_returns,
+            updated_at = %s
+        FROM (
+            SELECT a.id,
+                   COALESCE(SUM(l.projected_late_fee) FILTER (WHERE NOT l.is_returned), 0)
+                       AS projected_fine,
+                   COUNT(l.id) FILTER (
+                       WHERE l.is_returned AND l.return_date - l.issued_date > ({period})
+                   ) AS late_returns
+            FROM {members} AS a
+            LEFT JOIN {loans} AS l ON l.user_id = a.id
+            {touched}
+            GROUP BY a.id
+        ) AS totals
+        WHERE m.id = totals.id
+          AND (m.projected_fine <> totals.projected_fine
+               OR m.late_return_count <> totals.late_returns)
+        """,
+        [now, *period_params, *touched_params],
+    )
+    return cursor.rowcount
+
+
+def sweep_overdue(today=None, full=False):
+    """
+    Flags overdue loans, projects their late fees and refreshes the member aggregates.
+
+    The whole sweep is a handful of set-based statements in one transaction, so its cost
+    does not depend on the number of rows touched by Python:
+
+    1. Open loans get `is_overdue` and `projected_late_fee` from CASEs on the member plan,
+       built from the plan policy registry.
+    2. Returned loans that still carry the flags are cleared.
+    3. Members touched since the previous run get their projected fine (sum over open loans)
+       and late return count. The first run, and a `full` one, refreshes every member; run one
+       after changing loan periods or deleting loans, which leave no timestamp behind.
+
+    Every run is recorded as an `OverdueSweep`.
+
+    Parameters:
+        today (date): The day to sweep for. Defaults to the current local date.
+        full (bool): Refresh the aggregates of every member.
+
+    Returns:
+        dict: The number of loans updated, loans cleared and members updated.
+    """
+    now = timezone.now()
+    today = today or timezone.localdate(now)
+    with transaction.atomic(), connection.cursor() as cursor:
+        previous = (
+            OverdueSweep.objects.order_by("-started_at")
+            .values_list("started_at", flat=True)
+            .first()
+        )
+        since = None if full or previous is None else previous - TOUCHED_OVERLAP
+
+        loans_updated = update_open_loans(cursor, today, now)
+        loans_cleared = (
+            LibraryManagement.objects.filter(is_returned=True)
+            .filter(Q(is_overdue=True) | ~Q(projected_late_fee=0))
+            .update(is_overdue=False, projected_late_fee=0, updated_at=now)
+        )
+        members_updated = update_member_aggregates(cursor, now, since)
+
+        result = {
+            "loans_updated": loans_updated,
+            "loans_cleared": loans_cleared,
+            "members_updated": members_updated,
+        }
+        OverdueSweep.objects.create(started_at=now, full=since is None, **result)
+
+    return result
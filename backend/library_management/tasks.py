@@ -0,0 +1,11 @@
+from celery import shared_task
+
+from . import sweeps
+
+
+@shared_task
+def sweep_overdue_loans():
+    """
+    Periodic task flagging overdue loans and refreshing projected late fees and member aggregates.
+    """
+    return sweeps.sweep_overdue()
@@ -1,3 +1,1112 @@
-from django.test import TestCase
+from datetime import timedelta
+from importlib.util import find_spec
+from io import StringIO
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+import json
+import logging
+import os
+import sys
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, connections
+from django.utils import timezone
+from django.test import SimpleTestCase, TransactionTestCase
+from django.utils.log import configure_logging
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from authentication.backends import verified_tokens
+from lms_project import concurrency, logs, metrics
+from lms_project.testing import QueryBudgetMixin
+from library.models import Book, Category
+from members.models import Members
+from . import counters, rollups, services, sweeps
+from .models import (
+    BookBorrowDaily,
+    BookBorrowTotal,
+    DashboardCounter,
+    FineTransaction,
+    LibraryManagement,
+    OverdueSweep,
+)
+
+
+class LibraryManagementQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """
+    Guards the number of queries issued by the LibraryManagement endpoints,
+    so that N+1 regressions in the loan serialization fail the test suite.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="librarian", password="secret")
+        category = Category.objects.create(name="Fiction", created_by=cls.user)
+        books = [
+            Book.objects.create(
+                name=f"Book {index}",
+                author=f"Author {index}",
+                quantity=10,
+                category=category,
+                created_by=cls.user,
+            )
+            for index in range(5)
+        ]
+        members = [
+            Members.objects.create(
+                name=f"Member {index}",
+                email=f"member{index}@example.com",
+                phone_number=f"90000000{index:02d}",
+                plan="Premium",
+                address="Address",
+                gender="Other",
+                created_by=cls.user,
+            )
+            for index in range(4)
+        ]
+        for index in range(20):
+            LibraryManagement.objects.create(
+                user=members[index % len(members)], book=books[index % len(books)]
+            )
+        cls.loan = LibraryManagement.objects.first()
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_list_query_count_does_not_grow_with_page_size(self):
+        # One COUNT(*) for the page number pagination and one joined SELECT; the ETag is
+        # computed from the page itself
+        self.assertQueryBudget("/api/manage/", 2, page_sizes=(1, 10, 20))
+
+    def test_cursor_list_skips_the_count_query(self):
+        with self.assertMaxQueries(1):
+            response = self.client.get(
+                "/api/manage/", {"paginate": "cursor", "page_size": 20}
+            )
+        self.assertEqual(len(response.data["results"]), 20)
+
+    def test_list_includes_member_and_book_names(self):
+        response = self.client.get("/api/manage/", {"page_size": 1})
+        record = response.data["results"][0]
+        self.assertTrue(record["user_name"].startswith("Member"))
+        self.assertTrue(record["book_name"].startswith("Book"))
+
+    def test_retrieve_uses_a_single_joined_query(self):
+        # The conditional GET validator lookup and one joined SELECT
+        with self.assertMaxQueries(2):
+            response = self.client.get(f"/api/manage/{self.loan.pk}/")
+        self.assertEqual(response.status_code, 200)
+
+    def test_destroy_loads_member_and_book_with_the_record(self):
+        # Joined SELECT, DELETE, dashboard counter, daily and all-time borrow rollup and book
+        # quantity updates
+        with self.assertMaxQueries(6):
+            response = self.client.delete(f"/api/manage/{self.loan.pk}/")
+        self.assertEqual(response.status_code, 200)
+
+
+class LibraryManagementConditionalGetTests(APITestCase):
+    """
+    Checks that unchanged list pages and records are answered with 304 before serialization.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="librarian", password="secret")
+        category = Category.objects.create(name="Fiction", created_by=cls.user)
+        cls.book = Book.objects.create(
+            name="Book", author="Author", quantity=10, category=category, created_by=cls.user
+        )
+        member = Members.objects.create(
+            name="Member",
+            email="member@example.com",
+            phone_number="9000000000",
+            plan="Premium",
+            address="Address",
+            gender="Other",
+            created_by=cls.user,
+        )
+        cls.loan = LibraryManagement.objects.create(user=member, book=cls.book)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_unchanged_list_returns_not_modified(self):
+        response = self.client.get("/api/manage/")
+        etag = response["ETag"]
+        response = self.client.get("/api/manage/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertFalse(response.content)
+
+    def test_list_etag_follows_the_page_returned(self):
+        etag = self.client.get("/api/manage/", {"page_size": 1})["ETag"]
+        self.book.name = "Renamed"
+        self.book.save()
+        response = self.client.get("/api/manage/", {"page_size": 1}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["book_name"], "Renamed")
+
+        cursor = self.client.get("/api/manage/", {"paginate": "cursor"})
+        response = self.client.get(
+            "/api/manage/", {"paginate": "cursor"}, HTTP_IF_NONE_MATCH=cursor["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_related_change_invalidates_the_etag(self):
+        etag = self.client.get(f"/api/manage/{self.loan.pk}/")["ETag"]
+        self.book.name = "Renamed"
+        self.book.save()
+        response = self.client.get(f"/api/manage/{self.loan.pk}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["book_name"], "Renamed")
+
+
+class FineLedgerTests(APITestCase):
+    """
+    Checks that late fees reach the member balance through the fine ledger exactly once.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="librarian", password="secret")
+        category = Category.objects.create(name="Fiction", created_by=cls.user)
+        book = Book.objects.create(
+            name="Book", author="Author", quantity=10, category=category, created_by=cls.user
+        )
+        cls.member = Members.objects.create(
+            name="Member",
+            email="member@example.com",
+            phone_number="9000000000",
+            plan="Normal",
+            address="Address",
+            gender="Other",
+            created_by=cls.user,
+        )
+        cls.loan = LibraryManagement.objects.create(user=cls.member, book=book)
+        LibraryManagement.objects.filter(pk=cls.loan.pk).update(
+            issued_date=timezone.localdate() - timedelta(days=35)
+        )
+
+    def return_loan(self):
+        loan = LibraryManagement.objects.get(pk=self.loan.pk)
+        loan.is_returned = True
+        loan.save()
+        return loan
+
+    def test_resaving_a_returned_loan_does_not_charge_again(self):
+        loan = self.return_loan()
+        loan.save()
+        LibraryManagement.objects.get(pk=loan.pk).save()
+
+        self.member.refresh_from_db()
+        self.assertEqual(self.member.unpaid_fine, 100)
+        self.assertEqual(self.member.fine_transactions.count(), 1)
+
+    def test_paying_the_fee_records_a_payment(self):
+        loan = self.return_loan()
+        loan.late_fee_paid = True
+        loan.save()
+
+        self.member.refresh_from_db()
+        self.assertEqual(self.member.unpaid_fine, 0)
+        self.assertEqual(
+            list(self.member.fine_transactions.order_by("id").values_list("kind", flat=True)),
+            [FineTransaction.CHARGE, FineTransaction.PAYMENT],
+        )
+
+    def test_stale_copies_of_a_loan_do_not_charge_twice(self):
+        stale = LibraryManagement.objects.get(pk=self.loan.pk)
+        self.return_loan()
+        stale.is_returned = True
+        stale.save()
+
+        self.member.refresh_from_db()
+        self.assertEqual(self.member.unpaid_fine, 100)
+        self.assertEqual(self.member.fine_transactions.count(), 1)
+
+    def test_payments_and_waivers_settle_the_balance(self):
+        self.return_loan()
+        self.client.force_authenticate(self.user)
+        url = f"/api/members/{self.member.pk}/settle_fine/"
+
+        response = self.client.post(url, {"kind": "payment", "amount": "60.00"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["balance"], "40.00")
+        response = self.client.post(
+            url, {"kind": "waiver", "amount": "40", "note": "Goodwill"}, format="json"
+        )
+        self.assertEqual(response.data["balance"], "0.00")
+
+        self.member.refresh_from_db()
+        self.assertEqual(self.member.unpaid_fine, 0)
+        self.assertEqual(
+            list(self.member.fine_transactions.order_by("id").values_list("kind", flat=True)),
+            [FineTransaction.CHARGE, FineTransaction.PAYMENT, FineTransaction.WAIVER],
+        )
+
+    def test_settlements_cannot_exceed_the_balance(self):
+        self.return_loan()
+        self.client.force_authenticate(self.user)
+        url = f"/api/members/{self.member.pk}/settle_fine/"
+
+        response = self.client.post(url, {"kind": "payment", "amount": "100.01"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, {"kind": "charge", "amount": "10"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.member.fine_transactions.count(), 1)
+
+    def test_statement_returns_balance_and_entries(self):
+        self.return_loan()
+        self.client.force_authenticate(self.user)
+
+        response = self.client.get(f"/api/members/{self.member.pk}/statement/")
+        self.assertEqual(response.data["balance"], "100.00")
+        self.assertEqual(response.data["results"][0]["amount"], "100.00")
+
+
+class DashboardCounterTests(APITestCase):
+    """
+    Checks that the dashboard counter row follows member, book and loan writes and can be reconciled.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="librarian", password="secret")
+        cls.category = Category.objects.create(name="Fiction", created_by=cls.user)
+
+    def setUp(self):
+        counters.reconcile()
+
+    def assertCounters(self, **expected):
+        counter = DashboardCounter.objects.get(pk=counters.COUNTER_ID)
+        self.assertEqual({field: getattr(counter, field) for field in expected}, expected)
+        self.assertEqual(
+            {field: getattr(counter, field) for field in counters.compute()}, counters.compute()
+        )
+
+    def create_member(self, plan="Student"):
+        return Members.objects.create(
+            name="Member",
+            email="member@example.com",
+            phone_number="9000000000",
+            plan=plan,
+            address="Address",
+            gender="Other",
+            created_by=self.user,
+        )
+
+    def create_book(self):
+        return Book.objects.create(
+            name="Book", author="Author", quantity=5, category=self.category, created_by=self.user
+        )
+
+    def test_member_writes_adjust_the_plan_counts(self):
+        member = self.create_member()
+        self.assertCounters(total_members=1, student_members=1, premium_members=0)
+
+        member = Members.objects.get(pk=member.pk)
+        member.plan = "Premium"
+        member.save()
+        self.assertCounters(total_members=1, student_members=0, premium_members=1)
+
+        member.delete()
+        self.assertCounters(total_members=0, student_members=0, premium_members=0)
+
+    def test_book_writes_adjust_the_book_count(self):
+        book = self.create_book()
+        self.assertCounters(total_books=1)
+        book.delete()
+        self.assertCounters(total_books=0)
+
+    def test_loan_writes_adjust_the_loan_counts(self):
+        loan = LibraryManagement.objects.create(user=self.create_member(), book=self.create_book())
+        self.assertCounters(open_loans=1, returned_loans=0)
+
+        loan = LibraryManagement.objects.get(pk=loan.pk)
+        loan.is_returned = True
+        loan.save()
+        self.assertCounters(open_loans=0, returned_loans=1)
+
+        # Saving again without a state change does not count twice
+        loan.save()
+        self.assertCounters(open_loans=0, returned_loans=1)
+
+        loan.delete()
+        self.assertCounters(open_loans=0, returned_loans=0)
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        self.create_member()
+        DashboardCounter.objects.update(open_loans=5, total_members=0)
+
+        output = StringIO()
+        call_command("reconcile_counters", stdout=output)
+        self.assertIn("open_loans: 5 -> 0", output.getvalue())
+        self.assertIn("total_members: 0 -> 1", output.getvalue())
+        self.assertCounters(open_loans=0, total_members=1)
+
+        output = StringIO()
+        call_command("reconcile_counters", stdout=output)
+        self.assertIn("up to date", output.getvalue())
+
+    def test_missing_row_is_rebuilt_on_read_and_adjust(self):
+        self.create_book()
+        DashboardCounter.objects.all().delete()
+        self.assertEqual(counters.read().total_books, 1)
+
+        DashboardCounter.objects.all().delete()
+        self.create_book()
+        self.assertCounters(total_books=2)
+
+
+class BorrowRollupTests(APITestCase):
+    """
+    Checks the daily borrow rollup and all-time totals behind the insight endpoint.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="librarian", password="secret")
+        category = Category.objects.create(name="Fiction", created_by=user)
+        cls.first, cls.second = (
+            Book.objects.create(
+                name=name, author="Author", quantity=10, category=category, created_by=user
+            )
+            for name in ("First", "Second")
+        )
+        cls.member = Members.objects.create(
+            name="Member",
+            email="member@example.com",
+            phone_number="9000000000",
+            plan="Premium",
+            address="Address",
+            gender="Other",
+            created_by=user,
+        )
+
+    def borrow(self, book, times=1):
+        return [LibraryManagement.objects.create(user=self.member, book=book) for _ in range(times)]
+
+    def assertRollup(self, expected):
+        today = timezone.localdate()
+        ranking = [(row["book__name"], row["num_borrowed"]) for row in expected]
+        self.assertEqual(
+            [(row["book__name"], row["num_borrowed"]) for row in rollups.top_books(5)], ranking
+        )
+        self.assertEqual(
+            [
+                (row["book__name"], row["num_borrowed"])
+                for row in rollups.top_books(5, today, today)
+            ],
+            ranking,
+        )
+
+    def test_borrows_are_upserted_per_book_and_day(self):
+        self.borrow(self.first)
+        self.borrow(self.second, times=2)
+
+        self.assertEqual(BookBorrowDaily.objects.count(), 2)
+        self.assertRollup(
+            [
+                {"book__name": "Second", "num_borrowed": 2},
+                {"book__name": "First", "num_borrowed": 1},
+            ]
+        )
+
+    def test_deleting_a_loan_removes_its_borrow(self):
+        loans = self.borrow(self.first, times=2)
+        loans[0].delete()
+        self.assertRollup([{"book__name": "First", "num_borrowed": 1}])
+
+        loans[1].delete()
+        self.assertRollup([])
+        self.assertEqual(BookBorrowTotal.objects.get(book=self.first).borrow_count, 0)
+
+    def test_changing_the_book_of_a_loan_moves_its_borrow(self):
+        (loan,) = self.borrow(self.first)
+        loan = LibraryManagement.objects.get(pk=loan.pk)
+        loan.book = self.second
+        loan.save()
+
+        self.assertRollup([{"book__name": "Second", "num_borrowed": 1}])
+
+    def test_all_time_ranking_reads_the_totals(self):
+        self.borrow(self.first)
+        with self.assertNumQueries(1):
+            rollups.top_books(3)
+
+    def test_rebuild_matches_the_incremental_rollup(self):
+        self.borrow(self.first, times=3)
+        self.borrow(self.second)
+        daily = list(BookBorrowDaily.objects.values_list("book_id", "day", "borrow_count"))
+        totals = list(BookBorrowTotal.objects.values_list("book_id", "borrow_count"))
+
+        BookBorrowTotal.objects.update(borrow_count=0)
+        self.assertEqual(rollups.rebuild(), 2)
+
+        self.assertCountEqual(
+            BookBorrowDaily.objects.values_list("book_id", "day", "borrow_count"), daily
+        )
+        self.assertCountEqual(BookBorrowTotal.objects.values_list("book_id", "borrow_count"), totals)
+
+
+class CopyReservationTests(APITestCase):
+    """
+    Checks that a copy of the book is taken out of stock exactly while a loan is open, however the loan is written.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="librarian", password="secret")
+        category = Category.objects.create(name="Fiction", created_by=cls.user)
+        cls.first, cls.second = (
+            Book.objects.create(
+                name=name, author="Author", quantity=1, category=category, created_by=cls.user
+            )
+            for name in ("First", "Second")
+        )
+        cls.member = Members.objects.create(
+            name="Member",
+            email="member@example.com",
+            phone_number="9000000000",
+            plan="Premium",
+            address="Address",
+            gender="Other",
+            created_by=cls.user,
+        )
+
+    def assertQuantities(self, first, second):
+        self.assertEqual(
+            list(Book.objects.order_by("pk").values_list("quantity", flat=True)), [first, second]
+        )
+
+    def test_created_loans_reserve_and_deleted_loans_release(self):
+        loan = LibraryManagement.objects.create(user=self.member, book=self.first)
+        returned = LibraryManagement.objects.create(user=self.member, book=self.second)
+        returned.is_returned = True
+        returned.save()
+        self.assertTrue(loan.holds_copy)
+        self.assertQuantities(0, 1)
+
+        LibraryManagement.objects.all().delete()
+        self.assertQuantities(1, 1)
+
+    def test_loan_without_an_available_copy_is_not_saved(self):
+        LibraryManagement.objects.create(user=self.member, book=self.first)
+
+        with self.assertRaises(services.IssueError):
+            services.issue_book(self.member.pk, self.first.pk)
+        self.assertEqual(LibraryManagement.objects.count(), 1)
+        self.assertQuantities(0, 1)
+
+    def test_returning_reopening_and_moving_a_loan(self):
+        loan = LibraryManagement.objects.create(user=self.member, book=self.first)
+        loan.is_returned = True
+        loan.save()
+        self.assertQuantities(1, 1)
+
+        loan.is_returned = False
+        loan.book = self.second
+        loan.save()
+        self.assertQuantities(1, 0)
+
+        loan = LibraryManagement.objects.get(pk=loan.pk)
+        loan.book = self.first
+        loan.save()
+        self.assertQuantities(0, 1)
+
+    def test_reopening_without_an_available_copy_is_rejected(self):
+        loan = LibraryManagement.objects.create(user=self.member, book=self.first)
+        loan.is_returned = True
+        loan.save()
+        LibraryManagement.objects.create(user=self.member, book=self.first)
+        self.client.force_authenticate(self.user)
+
+        response = self.client.patch(
+            f"/api/manage/{loan.pk}/", {"is_returned": False}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        loan.refresh_from_db()
+        self.assertTrue(loan.is_returned)
+        self.assertFalse(loan.holds_copy)
+        self.assertQuantities(0, 1)
+
+    def test_backfill_reserves_copies_for_existing_open_loans(self):
+        legacy = LibraryManagement.objects.create(user=self.member, book=self.first)
+        issued = LibraryManagement.objects.create(user=self.member, book=self.second)
+        LibraryManagement.objects.update(holds_copy=False)
+        Book.objects.update(quantity=1)
+        Book.objects.filter(pk=self.second.pk).update(quantity=0)
+
+        self.assertEqual(services.backfill_copy_holds(reserved_from_id=issued.pk), (2, 1, 0))
+        self.assertEqual(services.backfill_copy_holds(), (0, 0, 0))
+        self.assertQuantities(0, 0)
+        self.assertEqual(LibraryManagement.objects.filter(holds_copy=True).count(), 2)
+
+        legacy.delete()
+        self.assertQuantities(1, 0)
+
+
+class BulkLoanTests(APITestCase):
+    """
+    Checks the per-item results and the stock, counter and fine writes of bulk issues and returns.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="librarian", password="secret")
+        category = Category.objects.create(name="Fiction", created_by=cls.user)
+        cls.first, cls.second = (
+            Book.objects.create(
+                name=name,
+                author="Author",
+                quantity=quantity,
+                category=category,
+                created_by=cls.user,
+            )
+            for name, quantity in (("First", 5), ("Second", 1))
+        )
+        cls.member = Members.objects.create(
+            name="Member",
+            email="member@example.com",
+            phone_number="9000000000",
+            plan="Normal",
+            address="Address",
+            gender="Other",
+            created_by=cls.user,
+        )
+
+    def setUp(self):
+        counters.reconcile()
+        self.client.force_authenticate(self.user)
+
+    def assertOpenAndReturned(self, open_loans, returned_loans):
+        counter = DashboardCounter.objects.get(pk=counters.COUNTER_ID)
+        self.assertEqual((counter.open_loans, counter.returned_loans), (open_loans, returned_loans))
+
+    def statuses(self, results):
+        return [(result["status"], result.get("message")) for result in results]
+
+    def test_bulk_issue_rejects_missing_books_empty_stock_and_the_plan_limit(self):
+        LibraryManagement.objects.create(user=self.member, book=self.first)
+        missing = self.second.pk + 100
+
+        response = self.client.post(
+            "/api/manage/bulk_issue/",
+            {
+                "user": self.member.pk,
+                "books": [missing, self.second.pk, self.second.pk, *[self.first.pk] * 4],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["message"], "4 of 7 books issued")
+        self.assertEqual(
+            self.statuses(response.data["results"]),
+            [
+                ("rejected", "Book does not exist."),
+                ("issued", None),
+                ("rejected", "No copies of this book are available."),
+                ("issued", None),
+                ("issued", None),
+                ("issued", None),
+                ("rejected", "Maximum books limit (5) reached for the user's plan."),
+            ],
+        )
+
+        self.assertEqual(
+            list(Book.objects.order_by("pk").values_list("quantity", flat=True)), [1, 0]
+        )
+        loans = LibraryManagement.objects.filter(user=self.member)
+        self.assertEqual(loans.filter(is_returned=False, holds_copy=True).count(), 5)
+        self.assertOpenAndReturned(5, 0)
+        self.assertEqual(BookBorrowTotal.objects.get(book=self.first).borrow_count, 4)
+
+    def test_bulk_issue_rejects_members_with_unpaid_fines(self):
+        Members.objects.filter(pk=self.member.pk).update(unpaid_fine=10)
+
+        response = self.client.post(
+            "/api/manage/bulk_issue/",
+            {"user": self.member.pk, "books": [self.first.pk]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(LibraryManagement.objects.exists())
+
+    def test_bulk_return_returns_open_loans_and_charges_late_fees(self):
+        late, recent, returned = (
+            LibraryManagement.objects.create(user=self.member, book=self.first) for _ in range(3)
+        )
+        LibraryManagement.objects.filter(pk=late.pk).update(
+            issued_date=timezone.localdate() - timedelta(days=32)
+        )
+        returned.is_returned = True
+        returned.save()
+
+        response = self.client.post(
+            "/api/manage/bulk_return/",
+            {"loans": [late.pk, recent.pk, returned.pk, returned.pk + 100]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.statuses(response.data["results"]),
+            [
+                ("returned", None),
+                ("returned", None),
+                ("rejected", "Book is already returned."),
+                ("rejected", "Issue record does not exist."),
+            ],
+        )
+        self.assertEqual(response.data["results"][0]["late_fee"], "40.00")
+
+        self.first.refresh_from_db()
+        self.member.refresh_from_db()
+        self.assertEqual(self.first.quantity, 5)
+        self.assertEqual(self.member.unpaid_fine, 40)
+        self.assertEqual(self.member.late_return_count, 1)
+        self.assertFalse(LibraryManagement.objects.filter(holds_copy=True).exists())
+        self.assertOpenAndReturned(0, 3)
+
+
+class LedgerExportTests(APITestCase):
+    """
+    Covers the streamed issue ledger of the export endpoint and the `export_ledger` command.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="librarian", password="secret")
+        category = Category.objects.create(name="Fiction", created_by=cls.user)
+        book = Book.objects.create(
+            name="Dune", author="Herbert", quantity=10, category=category, created_by=cls.user
+        )
+        members = {
+            name: Members.objects.create(
+                name=name,
+                email=f"{name.lower()}@example.com",
+                phone_number=phone_number,
+                plan=plan,
+                address="Address",
+                gender="Other",
+                created_by=cls.user,
+            )
+            for name, phone_number, plan in [
+                ("Alice", "9000000001", "Premium"),
+                ("Bob", "9000000002", "Student"),
+            ]
+        }
+        cls.today = timezone.localdate()
+        cls.open_loan = LibraryManagement.objects.create(user=members["Alice"], book=book)
+        cls.returned_loan = LibraryManagement.objects.create(user=members["Bob"], book=book)
+        LibraryManagement.objects.filter(pk=cls.open_loan.pk).update(
+            issued_date=cls.today - timedelta(days=10)
+        )
+        returned = LibraryManagement.objects.get(pk=cls.returned_loan.pk)
+        returned.is_returned = True
+        returned.save()
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def export(self, **params):
+        response = self.client.get("/api/manage/export/", params)
+        self.assertEqual(response.status_code, 200)
+        return response, b"".join(response.streaming_content).decode()
+
+    def exported_ids(self, **params):
+        _, content = self.export(export_format="jsonl", **params)
+        return [json.loads(line)["id"] for line in content.splitlines()]
+
+    def test_csv_export_joins_member_and_book_names(self):
+        response, content = self.export(export_format="csv")
+
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertEqual(
+            response["Content-Disposition"], f'attachment; filename="ledger-{self.today}.csv"'
+        )
+        lines = content.splitlines()
+        self.assertEqual(
+            lines[0],
+            "id,member_id,member,plan,book_id,book,issued_date,return_date,is_returned,"
+            "late_fee,late_fee_paid",
+        )
+        self.assertEqual(len(lines), 3)
+        # Oldest issue first
+        self.assertTrue(lines[1].startswith(f"{self.open_loan.pk},"))
+        self.assertIn(",Alice,Premium,", lines[1])
+        self.assertIn(",Dune,", lines[1])
+
+    def test_jsonl_export_writes_one_object_per_record(self):
+        response, content = self.export(export_format="jsonl")
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(
+            response["Content-Disposition"], f'attachment; filename="ledger-{self.today}.jsonl"'
+        )
+        records = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            [(record["member"], record["plan"], record["book"]) for record in records],
+            [("Alice", "Premium", "Dune"), ("Bob", "Student", "Dune")],
+        )
+        self.assertEqual(records[0]["issued_date"], str(self.today - timedelta(days=10)))
+        self.assertIs(records[1]["is_returned"], True)
+
+    def test_filters_select_the_exported_records(self):
+        open_id, returned_id = self.open_loan.pk, self.returned_loan.pk
+        week_ago = self.today - timedelta(days=7)
+
+        self.assertEqual(self.exported_ids(issued_from=week_ago), [returned_id])
+        self.assertEqual(self.exported_ids(issued_to=week_ago), [open_id])
+        self.assertEqual(self.exported_ids(is_returned="false"), [open_id])
+        self.assertEqual(self.exported_ids(is_returned="true"), [returned_id])
+        self.assertEqual(self.exported_ids(plan="Student"), [returned_id])
+        self.assertEqual(self.exported_ids(plan="Premium", is_returned="true"), [])
+
+    def test_invalid_filters_are_rejected(self):
+        for params in [
+            {"export_format": "xml"},
+            {"issued_from": "yesterday"},
+            {"issued_from": str(self.today), "issued_to": str(self.today - timedelta(days=1))},
+            {"is_returned": "maybe"},
+            {"plan": "Gold"},
+        ]:
+            with self.subTest(**params):
+                response = self.client.get("/api/manage/export/", params)
+                self.assertEqual(response.status_code, 400)
+
+    def test_command_exports_open_records_to_a_file(self):
+        output = f"{self.enterContext(TemporaryDirectory())}/ledger.csv"
+        stderr = StringIO()
+        call_command("export_ledger", "--open", "--output", output, stderr=stderr)
+
+        with open(output, encoding="utf-8") as file:
+            lines = file.read().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith("id,member_id,member,"))
+        self.assertTrue(lines[1].startswith(f"{self.open_loan.pk},"))
+        self.assertIn("Exported 1 rows", stderr.getvalue())
+
+
+@skipUnless(connection.vendor == "postgresql", "Requires PostgreSQL")
+class OverdueSweepTests(APITestCase):
+    """
+    Runs the set-based overdue sweep statements, which use PostgreSQL's UPDATE ... FROM and date arithmetic.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="librarian", password="secret")
+        category = Category.objects.create(name="Fiction", created_by=user)
+        book = Book.objects.create(
+            name="Book", author="Author", quantity=10, category=category, created_by=user
+        )
+        cls.first, cls.second = (
+            Members.objects.create(
+                name=name,
+                email=f"{name.lower()}@example.com",
+                phone_number=phone_number,
+                plan="Normal",
+                address="Address",
+                gender="Other",
+                created_by=user,
+            )
+            for name, phone_number in (("First", "9000000000"), ("Second", "9000000001"))
+        )
+        for member in (cls.first, cls.second):
+            LibraryManagement.objects.create(user=member, book=book)
+        LibraryManagement.objects.update(issued_date=timezone.localdate() - timedelta(days=35))
+
+    def projected_fines(self):
+        return list(Members.objects.order_by("pk").values_list("projected_fine", flat=True))
+
+    def test_sweep_flags_overdue_loans_and_projects_fines(self):
+        result = sweeps.sweep_overdue()
+
+        self.assertEqual(result, {"loans_updated": 2, "loans_cleared": 0, "members_updated": 2})
+        self.assertEqual(LibraryManagement.objects.filter(is_overdue=True).count(), 2)
+        self.assertEqual(self.projected_fines(), [100, 100])
+        self.assertTrue(OverdueSweep.objects.get().full)
+
+    def test_later_sweeps_refresh_only_touched_members(self):
+        sweeps.sweep_overdue()
+        past = timezone.now() - timedelta(days=1)
+        Members.objects.update(updated_at=past)
+        LibraryManagement.objects.update(updated_at=past)
+        OverdueSweep.objects.update(started_at=past + timedelta(hours=1))
+
+        Members.objects.update(projected_fine=1)
+        LibraryManagement.objects.filter(user=self.second).update(updated_at=timezone.now())
+        self.assertEqual(sweeps.sweep_overdue()["members_updated"], 1)
+        self.assertEqual(self.projected_fines(), [1, 100])
+
+        self.assertEqual(sweeps.sweep_overdue(full=True)["members_updated"], 1)
+        self.assertEqual(self.projected_fines(), [100, 100])
+
+
+class StructuredLoggingTests(SimpleTestCase):
+    """
+    Covers the JSON formatter, the DEBUG sampling and the queue handoff of `lms_project.logs`.
+    """
+
+    def setUp(self):
+        self.path = os.path.join(self.enterContext(TemporaryDirectory()), "app.log")
+        self.addCleanup(configure_logging, settings.LOGGING_CONFIG, settings.LOGGING)
+
+    def configure(self, rate):
+        logs.configure(
+            {
+                "version": 1,
+                "disable_existing_loggers": False,
+                "formatters": {"json": {"()": "lms_project.logs.JsonFormatter"}},
+                "filters": {
+                    "sample": {"()": "lms_project.logs.SampleDebugFilter", "rate": rate}
+                },
+                "handlers": {
+                    "file": {
+                        "class": "logging.FileHandler",
+                        "filename": self.path,
+                        "formatter": "json",
+                        "filters": ["sample"],
+                    }
+                },
+                "root": {"level": "DEBUG", "handlers": ["file"]},
+            }
+        )
+
+    def records(self):
+        # Stopping the listener writes the records it still holds
+        logs.stop_listener()
+        with open(self.path) as log:
+            return [json.loads(line) for line in log]
+
+    def test_records_are_formatted_as_json_with_extra_fields(self):
+        formatter = logs.JsonFormatter()
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = logging.LogRecord(
+                "app", logging.ERROR, __file__, 1, "Failed %s", ("twice",), sys.exc_info()
+            )
+        record.status_code = 500
+
+        data = json.loads(formatter.format(record))
+        self.assertEqual(data["message"], "Failed twice")
+        self.assertEqual(data["level"], "ERROR")
+        self.assertEqual(data["status_code"], 500)
+        self.assertIn("ValueError: boom", data["exception"])
+
+    def test_debug_records_are_sampled(self):
+        record = logging.LogRecord("app", logging.DEBUG, __file__, 1, "debug", (), None)
+        info = logging.LogRecord("app", logging.INFO, __file__, 1, "info", (), None)
+        self.assertFalse(logs.SampleDebugFilter(0).filter(record))
+        self.assertTrue(logs.SampleDebugFilter(0).filter(info))
+        self.assertTrue(logs.SampleDebugFilter(1).filter(record))
+        with mock.patch.object(logs.random, "random", return_value=0.2):
+            self.assertTrue(logs.SampleDebugFilter(0.5).filter(record))
+            self.assertFalse(logs.SampleDebugFilter(0.1).filter(record))
+
+    def test_records_are_handed_to_the_listener_through_the_queue(self):
+        self.configure(rate=0)
+        root = logging.getLogger()
+        self.assertEqual([type(handler) for handler in root.handlers], [logs.StructuredQueueHandler])
+
+        logging.getLogger("app").debug("dropped before queueing")
+        logging.getLogger("app").warning("Queued %s", "record", extra={"book": 7})
+
+        self.assertEqual(
+            [(record["message"], record.get("book")) for record in self.records()],
+            [("Queued record", 7)],
+        )
+
+    @skipUnless(hasattr(os, "fork"), "Requires os.fork")
+    def test_forked_children_get_a_listener_of_their_own(self):
+        self.configure(rate=1)
+        pid = os.fork()
+        if pid == 0:
+            try:
+                logging.getLogger("app").warning("From the child")
+                logs.stop_listener()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+
+        self.assertIn("From the child", [record["message"] for record in self.records()])
+
+
+class RequestMetricsTests(APITestCase):
+    """
+    Checks the per-route histograms recorded by the metrics middleware and served at /metrics.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="librarian", password="secret")
+
+    def setUp(self):
+        metrics.registry.reset()
+        self.client.force_authenticate(self.user)
+        self.enterContext(self.settings(METRICS_TOKEN="scrape-token"))
+
+    def scrape(self, token="scrape-token"):
+        return self.client.get("/metrics", HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_scrapes_need_the_configured_token(self):
+        self.assertEqual(self.scrape().status_code, 200)
+        self.assertEqual(self.scrape("wrong").status_code, 403)
+        with self.settings(METRICS_TOKEN=None):
+            self.assertEqual(self.client.get("/metrics").status_code, 403)
+            with self.settings(DEBUG=True):
+                self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    def test_requests_are_recorded_per_route(self):
+        self.client.get("/api/manage/insight/")
+        self.client.get("/api/manage/insight/")
+
+        text = self.scrape().content.decode()
+
+        self.assertIn(
+            'lms_http_request_duration_seconds_count{route="api/manage/insight/",'
+            'method="GET",status="200"} 2',
+            text,
+        )
+        self.assertIn('lms_db_queries_per_request_bucket{route="api/manage/insight/"', text)
+        self.assertIn('lms_serializer_duration_seconds_count{route="api/manage/insight/"', text)
+
+    def test_snapshots_of_all_workers_are_summed(self):
+        with TemporaryDirectory() as directory, self.settings(METRICS_MULTIPROC_DIR=directory):
+            self.client.get("/api/manage/insight/")
+            other_worker = metrics.registry.snapshot()
+            with open(os.path.join(directory, "1.json"), "w") as stream:
+                json.dump(other_worker, stream)
+
+            text = self.scrape().content.decode()
+
+        self.assertIn(
+            'lms_http_request_duration_seconds_count{route="api/manage/insight/",'
+            'method="GET",status="200"} 2',
+            text,
+        )
+
+    def test_connection_pool_usage_is_exposed(self):
+        pool = SimpleNamespace(
+            closed=False,
+            get_stats=lambda: {
+                "pool_max": 10,
+                "pool_size": 4,
+                "pool_available": 1,
+                "requests_waiting": 2,
+                "requests_num": 50,
+                "requests_wait_ms": 1500,
+            },
+        )
+        connection = connections["default"]
+        pooled = mock.patch.dict(connection.settings_dict["OPTIONS"], {"pool": True})
+        with pooled, mock.patch.object(type(connection), "pool", new=pool, create=True):
+            text = self.scrape().content.decode()
+
+        labels = f'{{alias="default",pid="{os.getpid()}"}}'
+        self.assertIn(f"lms_db_pool_in_use_connections{labels} 3", text)
+        self.assertIn(f"lms_db_pool_waiting_requests{labels} 2", text)
+        self.assertIn(f"lms_db_pool_wait_seconds_total{labels} 1.5", text)
+        self.assertIn(f"lms_db_pool_errors_total{labels} 0", text)
+
+    @skipUnless(
+        connection.vendor == "postgresql" and find_spec("psycopg_pool"),
+        "Connection pools need PostgreSQL and psycopg 3 with the pool extra.",
+    )
+    def test_real_connection_pool_usage_is_exposed(self):
+        pooled = {
+            **connection.settings_dict,
+            "CONN_MAX_AGE": 0,
+            "OPTIONS": {
+                **connection.settings_dict["OPTIONS"],
+                "pool": {"min_size": 1, "max_size": 2},
+            },
+        }
+        self.enterContext(mock.patch.dict(connections.settings, {"pooled": pooled}))
+
+        def close_pool():
+            connections["pooled"].close()
+            connections["pooled"].close_pool()
+            del connections["pooled"]
+
+        self.addCleanup(close_pool)
+        connections["pooled"].ensure_connection()
+
+        labels = f'{{alias="pooled",pid="{os.getpid()}"}}'
+        text = self.scrape().content.decode()
+        self.assertIn(f"lms_db_pool_max_connections{labels} 2", text)
+        self.assertIn(f"lms_db_pool_in_use_connections{labels} 1", text)
+
+        connections["pooled"].close()
+        text = self.scrape().content.decode()
+        self.assertIn(f"lms_db_pool_in_use_connections{labels} 0", text)
+
+
+class AsyncDashboardTests(TransactionTestCase):
+    """
+    Checks that the async dashboard views answer like the viewset actions they mirror.
+
+    Their queries run on other threads with their own connections, which only see committed
+    rows, hence a TransactionTestCase.
+    """
+
+    def setUp(self):
+        user = User.objects.create_user(username="librarian", password="secret")
+        category = Category.objects.create(name="Fiction", created_by=user)
+        member = Members.objects.create(
+            name="Member",
+            email="member@example.com",
+            phone_number="9000000000",
+            plan="Premium",
+            address="Address",
+            gender="Other",
+            created_by=user,
+        )
+        for index in range(3):
+            book = Book.objects.create(
+                name=f"Book {index}", author="Author", quantity=10, category=category,
+                created_by=user,
+            )
+            for _ in range(index + 1):
+                LibraryManagement.objects.create(user=member, book=book)
+        self.authorization = f"Bearer {AccessToken.for_user(user)}"
+
+    def tearDown(self):
+        # The pool threads keep their connections open, which would block flushing the database
+        concurrency.shutdown_executor()
+
+    def test_tokens_not_verified_before_are_verified_on_the_event_loop(self):
+        verified_tokens.clear()
+        response = self.client.get(
+            "/api/dashboard/initial_counts/", HTTP_AUTHORIZATION=self.authorization
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["issued_books_count"], 6)
+        self.assertEqual(len(verified_tokens.entries), 1)
+
+    def test_payloads_match_the_viewset_actions(self):
+        for endpoint in ("initial_counts", "book_counts", "member_counts", "insight"):
+            with self.subTest(endpoint=endpoint):
+                expected = self.client.get(
+                    f"/api/manage/{endpoint}/", HTTP_AUTHORIZATION=self.authorization
+                )
+                response = self.client.get(
+                    f"/api/dashboard/{endpoint}/", HTTP_AUTHORIZATION=self.authorization
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), expected.json())
+
+        self.assertEqual(response.json()["topBooksAllTime"][0]["num_borrowed"], 3)
+
+    def test_requests_without_a_valid_token_are_rejected(self):
+        self.assertEqual(self.client.get("/api/dashboard/insight/").status_code, 401)
+        response = self.client.get(
+            "/api/dashboard/insight/", HTTP_AUTHORIZATION="Bearer not-a-token"
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("WWW-Authenticate", response)
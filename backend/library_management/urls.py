@@ -1,5 +1,5 @@
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 from django.urls import path, include
 
 
@@ -8,4 +8,9 @@ router.register(r"manage", views.LibraryManagementViewSet)
 
 urlpatterns = [
     path("",include(router.urls)),
+    # Async variants of the dashboard actions, for polling clients under ASGI
+    path("dashboard/initial_counts/", async_views.initial_counts, name="dashboard-initial-counts"),
+    path("dashboard/book_counts/", async_views.book_counts, name="dashboard-book-counts"),
+    path("dashboard/member_counts/", async_views.member_counts, name="dashboard-member-counts"),
+    path("dashboard/insight/", async_views.insight, name="dashboard-insight"),
 ]
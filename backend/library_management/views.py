@@ -4,63 +4,95 @@ from rest_framework import viewsets
 from rest_framework import status
 from rest_framework.decorators import action
 
-from datetime import timedelta
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Count
 
 # Model and Serializer
 from .models import LibraryManagement
-from .serializers import LibraryManagementSerializer
-from members.models import Members
-from library.models import Book, Category
+from .serializers import (
+    BulkIssueSerializer,
+    BulkReturnSerializer,
+    LedgerExportSerializer,
+    LibraryManagementSerializer,
+)
+from . import counters, dashboard, exports, services
+
+# Conditional Requests
+from lms_project.conditional import ConditionalGetMixin
 
 # Filter and Pagination
 from rest_framework import filters
-from rest_framework.pagination import PageNumberPagination
+from lms_project.pagination import Paginate
 
 # Authentication
-from rest_framework_simplejwt.authentication import JWTTokenUserAuthentication
+from authentication.backends import CachedJWTTokenUserAuthentication
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 
 
-class Paginate(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = "page_size"
-
-
-class LibraryManagementViewSet(viewsets.ModelViewSet):
+class LibraryManagementViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     Class representing a ViewSet for managing library book issues and statistics.
 
     Attributes:
-        queryset: Queryset containing all LibraryManagement objects.
+        queryset: Queryset containing all LibraryManagement objects, joined with their member and book.
         serializer_class: Serializer class for LibraryManagement objects.
         filter_backends: List of filter backends used for searching.
         search_fields: List of fields to search on.
         pagination_class: Class for pagination settings.
+        cursor_ordering: Unique, indexed ordering used for cursor pagination.
+        conditional_related: Related models whose changes alter the representation (member and book names).
         authentication_classes: List of authentication classes used.
 
     Methods:
+        get_queryset: Restrict read actions to the columns the serializer needs.
+        list: List book issue records, or answer 304 when the page is unchanged.
+        retrieve: Retrieve a book issue record, or answer 304 when it is unchanged.
         create: Create a new book issue record after validating user and plan limits.
         update: Update an existing book issue record.
         destroy: Delete a book issue record.
+        bulk_issue: Issue a batch of books to one member.
+        bulk_return: Mark a batch of book issue records as returned.
+        export: Stream the filtered issue ledger as CSV or JSON lines.
         initial_counts: Get counts of issued, returned books, total books, and members.
         book_counts: Get counts of issued, returned, total, and not returned books.
         member_counts: Get counts of total, normal, premium, and student members.
         insight: Get insights on most borrowed books in the current week, month, and overall.
     """
 
-    queryset = LibraryManagement.objects.all()
+    queryset = LibraryManagement.objects.select_related("user", "book")
     serializer_class = LibraryManagementSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ["user__name", "book__name", "borrow_date", "return_date"]
     pagination_class = Paginate
-    authentication_classes = [JWTTokenUserAuthentication]
+    cursor_ordering = ("-issued_date", "-id")
+    conditional_related = ("user", "book")
+    authentication_classes = [CachedJWTTokenUserAuthentication]
+
+    def get_queryset(self):
+        """
+        Returns the queryset for the current action.
+
+        List and retrieve only need the issue record columns plus the member and book names,
+        so the joined rows are restricted to those columns. Write actions keep the full rows
+        because saving a record updates the member.
+
+        Returns:
+            QuerySet: The LibraryManagement queryset.
+        """
+        queryset = super().get_queryset()
+        if self.action in ("list", "retrieve"):
+            fields = [field.name for field in LibraryManagement._meta.concrete_fields]
+            queryset = queryset.only(*fields, "user__name", "book__name")
+        return queryset
 
     def create(self, request, *args, **kwargs):
         """
         Create a new book issue record after validating user and plan limits.
 
+        The checks and the write are done atomically by `services.issue_book`, which also
+        takes one copy out of the book's available quantity.
+
         Parameters:
             request (Request): The HTTP request object.
             *args: Variable length argument list.
@@ -70,69 +102,36 @@ class LibraryManagementViewSet(viewsets.ModelViewSet):
             Response: The HTTP response indicating the success or failure of the operation.
 
         Raises:
-            HTTP_400_BAD_REQUEST: If the user does not exist, has unpaid fees, or has reached the maximum books limit.
+            HTTP_400_BAD_REQUEST: If the data is invalid, the user has unpaid fees, has reached the maximum books limit,
+                or no copy of the book is available.
             HTTP_201_CREATED: If the book issue record is created successfully.
         """
-        # Extract user_id from the request data
-        user_id = request.data.get("user_name")
+        # Remove issued_date from the request data if present
+        request_data = request.data.copy()
+        request_data.pop("issued_date", None)
 
-        # Check if the user exists
-        try:
-            user = Members.objects.get(id=user_id)
-        except Members.DoesNotExist:
-            return Response(
-                {"message": "User does not exist."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+        serializer = self.get_serializer(data=request_data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        # Check if the user has any unpaid fees pending
-        if user.unpaid_fine > 0:
-            return Response(
-                {"message": "User has unpaid fees pending. Cannot issue a new book."},
-                status=status.HTTP_400_BAD_REQUEST,
+        # Lock the member, check the plan limit and reserve a copy in one transaction
+        try:
+            serializer.instance = services.issue_book(
+                member_id=serializer.validated_data["user"].pk,
+                book_id=serializer.validated_data["book"].pk,
             )
-
-        # Check the number of books issued to the user based on their plan
-        issued_books_count = LibraryManagement.objects.filter(
-            user=user, is_returned=False
-        ).count()
-
-        # Define the maximum number of books allowed based on the user's plan
-        if user.plan == "Student":
-            max_books_allowed = 8
-        elif user.plan == "Normal":
-            max_books_allowed = 5
-        elif user.plan == "Premium":
-            max_books_allowed = 10
-        else:
-            max_books_allowed = 0  # Default to 0 if plan is not recognized
-
-        # Validate the number of books issued
-        if issued_books_count >= max_books_allowed:
+        except services.IssueError as error:
             return Response(
-                {
-                    "message": f"Maximum books limit ({max_books_allowed}) reached for the user's plan."
-                },
-                status=status.HTTP_400_BAD_REQUEST,
+                {"message": str(error)}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Proceed with creating the book issue record
-        request_data = request.data.copy()
-        request_data.pop(
-            "issued_date", None
-        )  # Remove issued_date from the request data if present
-
-        serializer = self.get_serializer(data=request_data)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(
-                {
-                    "message": "Book issue record created successfully",
-                    "data": serializer.data,
-                },
-                status=status.HTTP_201_CREATED,
-            )
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {
+                "message": "Book issue record created successfully",
+                "data": serializer.data,
+            },
+            status=status.HTTP_201_CREATED,
+        )
 
     def update(self, request, *args, **kwargs):
         """
@@ -147,13 +146,20 @@ class LibraryManagementViewSet(viewsets.ModelViewSet):
             Response: The HTTP response indicating the success or failure of the operation.
 
         Raises:
-            HTTP_400_BAD_REQUEST: If the data provided in the request is invalid.
+            HTTP_400_BAD_REQUEST: If the data provided in the request is invalid, or the record is
+                reopened or moved to a book without an available copy.
         """
         partial = kwargs.pop("partial", False)
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         if serializer.is_valid():
-            serializer.save()
+            try:
+                with transaction.atomic():
+                    serializer.save()
+            except services.IssueError as error:
+                return Response(
+                    {"message": str(error)}, status=status.HTTP_400_BAD_REQUEST
+                )
             return Response(
                 {
                     "message": "Book Issue record updated successfully",
@@ -184,11 +190,121 @@ class LibraryManagementViewSet(viewsets.ModelViewSet):
             }
         )
 
+    @action(detail=False, methods=["post"])
+    def bulk_issue(self, request):
+        """
+        Issue a batch of books to one member.
+
+        The member's fines and plan limit are checked once for the whole batch and the accepted
+        records are written together. Books past the plan limit or without an available copy are
+        rejected individually.
+
+        Parameters:
+            self: The object instance.
+            request (Request): The HTTP request object with 'user' (member id) and 'books' (list of book ids).
+
+        Returns:
+            Response: The HTTP response with a per-book result list.
+
+        Raises:
+            HTTP_400_BAD_REQUEST: If the data is invalid, or the user does not exist or has unpaid fees.
+        """
+        serializer = BulkIssueSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            results = services.bulk_issue(
+                serializer.validated_data["user"], serializer.validated_data["books"]
+            )
+        except services.IssueError as error:
+            return Response(
+                {"message": str(error)}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        issued = sum(result["status"] == "issued" for result in results)
+        return Response(
+            {
+                "message": f"{issued} of {len(results)} books issued",
+                "results": results,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=False, methods=["post"])
+    def bulk_return(self, request):
+        """
+        Mark a batch of book issue records as returned.
+
+        Late fees are computed for the whole batch and added to the members' unpaid fines.
+
+        Parameters:
+            self: The object instance.
+            request (Request): The HTTP request object with 'loans' (list of issue record ids).
+
+        Returns:
+            Response: The HTTP response with a per-record result list.
+
+        Raises:
+            HTTP_400_BAD_REQUEST: If the data is invalid.
+        """
+        serializer = BulkReturnSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        results = services.bulk_return(serializer.validated_data["loans"])
+
+        returned = sum(result["status"] == "returned" for result in results)
+        return Response(
+            {
+                "message": f"{returned} of {len(results)} books returned",
+                "results": results,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        """
+        Stream the issue ledger as CSV or JSON lines.
+
+        Rows are read through a server-side cursor and written to the response as they arrive,
+        so memory use does not depend on the size of the ledger.
+
+        Parameters:
+            self: The object instance.
+            request (Request): The HTTP request object with optional 'export_format' ('csv' or 'jsonl'),
+                'issued_from', 'issued_to', 'is_returned' and 'plan' query parameters.
+
+        Returns:
+            StreamingHttpResponse: The ledger as a file attachment.
+
+        Raises:
+            HTTP_400_BAD_REQUEST: If the filters are invalid.
+        """
+        serializer = LedgerExportSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        params = dict(serializer.validated_data)
+        export_format = params.pop("export_format")
+        rows = exports.ledger_rows(**params)
+        response = StreamingHttpResponse(
+            exports.iter_export(export_format, rows),
+            content_type=exports.CONTENT_TYPES[export_format],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="ledger-{timezone.localdate()}.{export_format}"'
+        )
+        return response
+
     @action(detail=False, methods=["get"])
     def initial_counts(self, request):
         """
         Get counts of issued, returned books, total books, and members.
 
+        The counts are read from the incrementally maintained dashboard counter row.
+
         Parameters:
             self: The object instance.
             request (Request): The HTTP request object.
@@ -199,28 +315,17 @@ class LibraryManagementViewSet(viewsets.ModelViewSet):
         Raises:
             N/A
         """
-        issued_books_count = LibraryManagement.objects.filter(is_returned=False).count()
-        returned_books_count = LibraryManagement.objects.filter(
-            is_returned=True
-        ).count()
-        total_books_count = Book.objects.count()
-        total_members_count = Members.objects.count()
+        counter = counters.read()
 
-        return Response(
-            {
-                "issued_books_count": issued_books_count,
-                "returned_books_count": returned_books_count,
-                "total_books_count": total_books_count,
-                "total_members_count": total_members_count,
-            },
-            status=status.HTTP_200_OK,
-        )
+        return Response(dashboard.initial_counts(counter), status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["get"])
     def book_counts(self, request):
         """
         Get counts of issued, returned, total, and not returned books.
 
+        The counts are read from the incrementally maintained dashboard counter row.
+
         Parameters:
             self: The object instance.
             request (Request): The HTTP request object.
@@ -231,30 +336,17 @@ class LibraryManagementViewSet(viewsets.ModelViewSet):
         Raises:
             N/A
         """
-        issued_books_count = LibraryManagement.objects.all().count()
-        returned_books_count = LibraryManagement.objects.filter(
-            is_returned=True
-        ).count()
-        total_books_count = Book.objects.count()
-        not_returned_books_count = LibraryManagement.objects.filter(
-            is_returned=False
-        ).count()
+        counter = counters.read()
 
-        return Response(
-            {
-                "issued_books_count": issued_books_count,
-                "returned_books_count": returned_books_count,
-                "total_books_count": total_books_count,
-                "not_returned_books_count": not_returned_books_count,
-            },
-            status=status.HTTP_200_OK,
-        )
+        return Response(dashboard.book_counts(counter), status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["get"])
     def member_counts(self, request):
         """
         Get counts of total, normal, premium, and student members.
 
+        The counts are read from the incrementally maintained dashboard counter row.
+
         Parameters:
             self: The object instance.
             request (Request): The HTTP request object.
@@ -265,25 +357,16 @@ class LibraryManagementViewSet(viewsets.ModelViewSet):
         Raises:
             N/A
         """
-        total_member_count = Members.objects.count()
-        normal_member_count = Members.objects.filter(plan="Normal").count()
-        premium_member_count = Members.objects.filter(plan="Premium").count()
-        student_member_count = Members.objects.filter(plan="Student").count()
-        return Response(
-            {
-                "total_member_count": total_member_count,
-                "normal_member_count": normal_member_count,
-                "premium_member_count": premium_member_count,
-                "student_member_count": student_member_count,
-            },
-            status=status.HTTP_200_OK,
-        )
+        counter = counters.read()
+        return Response(dashboard.member_counts(counter), status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["get"])
     def insight(self, request):
         """
         Get insights on most borrowed books in the current week, month, and overall.
 
+        The figures are summed from the daily borrow rollup instead of the issue records.
+
         Parameters:
             self: The object instance.
             request (Request): The HTTP request object.
@@ -294,44 +377,5 @@ class LibraryManagementViewSet(viewsets.ModelViewSet):
         Raises:
             N/A
         """
-        start_of_week = timezone.now() - timedelta(days=timezone.now().weekday())
-        end_of_week = start_of_week + timedelta(days=6)
-
-        # Get the start and end date of the current month
-        start_of_month = timezone.now().replace(day=1)
-        end_of_month = start_of_month + timedelta(days=31)
-
-        # Query for the most borrowed book in the current week
-        most_borrowed_books_week = (
-            LibraryManagement.objects.filter(
-                issued_date__range=[start_of_week, end_of_week]
-            )
-            .values("book__name")
-            .annotate(num_borrowed=Count("book"))
-            .order_by("-num_borrowed")[:5]
-        )
-
-        # Query for the most borrowed book in the current month
-        most_borrowed_books_month = (
-            LibraryManagement.objects.filter(
-                issued_date__range=[start_of_month, end_of_month]
-            )
-            .values("book__name")
-            .annotate(num_borrowed=Count("book"))
-            .order_by("-num_borrowed")[:5]
-        )
-
-        # Query for the most borrowed book overall
-        most_borrowed_books_overall = (
-            LibraryManagement.objects.values("book__name")
-            .annotate(num_borrowed=Count("book"))
-            .order_by("-num_borrowed")[:3]
-        )
-
-        # Construct the response data
-        response_data = {
-            "topBooksWeek": list(most_borrowed_books_week),
-            "topBooksMonth": list(most_borrowed_books_month),
-            "topBooksAllTime": list(most_borrowed_books_overall),
-        }
+        response_data = {key: query() for key, query in dashboard.insight_queries().items()}
         return Response(response_data, status=status.HTTP_200_OK)
@@ -0,0 +1,90 @@
+from hashlib import sha256
+from urllib.parse import urlencode
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+
+def get_cache():
+    return caches[getattr(settings, "RESPONSE_CACHE_ALIAS", "default")]
+
+
+def generation_key(namespace):
+    return f"response-generation:{namespace}"
+
+
+def get_generation(namespace):
+    """
+    Returns the current generation of a cache namespace, initialising it if needed.
+
+    A fresh generation starts at the current time in nanoseconds, so a generation key that
+    was evicted can never be re-initialised to a value whose entries are still cached.
+    """
+    cache = get_cache()
+    key = generation_key(namespace)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(*namespaces):
+    """
+    Moves the given namespaces to a new generation, so every cached response in them becomes unreachable.
+    """
+    cache = get_cache()
+    for namespace in namespaces:
+        try:
+            cache.incr(generation_key(namespace))
+        except ValueError:
+            cache.add(generation_key(namespace), time.time_ns(), timeout=None)
+
+
+def invalidate_on_commit(*namespaces):
+    """
+    Bumps the given namespaces once the current transaction commits (immediately outside a transaction).
+    """
+    transaction.on_commit(lambda: bump_generation(*namespaces))
+
+
+class CachedListMixin:
+    """
+    ViewSet mixin caching the serialized data of the `list` action in Django's cache framework.
+
+    Entries are keyed by the namespace generation, the host and every query parameter (search,
+    page, page size, cursor, ...). Every write to the listed models must bump the generation with
+    `invalidate_on_commit`, which model signals do for all writes going through the ORM (see
+    `library.signals`), so stale pages are never served; old entries simply expire.
+
+    Attributes:
+        cache_namespace (str): The namespace of the cached responses.
+        cache_timeout (int): Lifetime of a cached response in seconds.
+
+    Methods:
+        list: Returns the cached response data, or builds and caches it.
+    """
+
+    cache_namespace = None
+    cache_timeout = 300
+
+    def get_list_cache_key(self, request):
+        params = urlencode(sorted(request.query_params.lists()), doseq=True)
+        digest = sha256(f"{request.get_host()}?{params}".encode()).hexdigest()
+        generation = get_generation(self.cache_namespace)
+        return f"response:{self.cache_namespace}:{generation}:{digest}"
+
+    def list(self, request, *args, **kwargs):
+        key = self.get_list_cache_key(request)
+        cache = get_cache()
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, self.cache_timeout)
+        return response
@@ -0,0 +1,18 @@
+"""
+Celery application for lms_project.
+
+Configuration is read from the Django settings prefixed with `CELERY_`, and tasks are
+discovered in the `tasks.py` module of every installed app. Start a worker with:
+
+    celery -A lms_project worker -l info
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "lms_project.settings")
+
+app = Celery("lms_project")
+app.config_from_object("django.conf:settings", namespace="CELERY")
+app.autodiscover_tasks()
@@ -0,0 +1,99 @@
+"""
+Running ORM code from async views on a bounded pool of database threads.
+
+Django's async ORM methods run every query of a request on one shared sync thread, so independent
+queries still run one after another. `run_queries` instead runs each given callable on its own
+thread from a pool of `ASYNC_DB_THREADS` threads, each with its own database connection, and
+awaits them together. The pool size bounds the connections the async views open per process;
+keep it below the database pool size (`DB_POOL_MAX_SIZE`) when pooling.
+
+Connections are released after every call the same way the request cycle does it: kept for
+reuse up to `CONN_MAX_AGE`, or handed back to the pool. `shutdown_executor` closes them and
+stops the threads, e.g. before a test database is flushed or dropped.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+import contextvars
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from . import metrics
+
+executor = None
+executor_lock = threading.Lock()
+
+
+def get_executor():
+    global executor
+    with executor_lock:
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "ASYNC_DB_THREADS", 8),
+                thread_name_prefix="async-db",
+            )
+        return executor
+
+
+def shutdown_executor():
+    """
+    Closes the database connections of every pool thread and stops the pool.
+
+    A later `run_queries` call starts a new pool.
+    """
+    global executor
+    with executor_lock:
+        pool, executor = executor, None
+    if pool is None:
+        return
+    # One call per thread: each waits until every thread holds one, so none runs two
+    barrier = threading.Barrier(pool._max_workers)
+
+    def close_connections():
+        barrier.wait()
+        connections.close_all()
+
+    for _ in range(pool._max_workers):
+        pool.submit(close_connections)
+    pool.shutdown(wait=True)
+
+
+def run_with_connection(function):
+    """
+    Runs `function` on the calling pool thread, counting its queries toward the current request.
+    """
+    stats = metrics.current_stats.get()
+    try:
+        with ExitStack() as stack:
+            if stats is not None:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+            return function()
+    finally:
+        close_old_connections()
+
+
+async def run_queries(*functions):
+    """
+    Runs synchronous ORM callables concurrently on the database threads.
+
+    Parameters:
+        functions (callable): Callables without arguments, e.g. `functools.partial` objects.
+
+    Returns:
+        list: Their results, in the order given.
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_executor()
+    return await asyncio.gather(
+        *(
+            # A copy of the context per call carries the request's metrics into the thread
+            loop.run_in_executor(
+                pool, contextvars.copy_context().run, run_with_connection, function
+            )
+            for function in functions
+        )
+    )
@@ -0,0 +1,159 @@
+"""
+Non-blocking, structured logging.
+
+`configure` is the project's `LOGGING_CONFIG`: it applies `settings.LOGGING` with `dictConfig`
+and then moves the root logger's handlers behind a `QueueHandler`. Request threads only put
+records on an in-memory queue; a `QueueListener` thread formats them and does the disk and
+console I/O. Records are written as one JSON object per line by `JsonFormatter`, and
+`SampleDebugFilter` keeps only a configurable share of DEBUG records.
+
+A forked child (e.g. a prefork server or Celery worker process) does not inherit the listener
+thread, so `restart_listener` gives it a listener of its own on a fresh queue.
+"""
+
+import atexit
+import json
+import logging
+import logging.config
+from logging.handlers import QueueHandler, QueueListener
+import os
+import queue
+import random
+
+# Attributes every LogRecord has; anything else on a record came from `extra=`
+RECORD_ATTRIBUTES = frozenset(
+    vars(logging.LogRecord("", 0, "", 0, "", (), None)).keys()
+) | {"message", "asctime", "taskName"}
+
+QUEUE_SIZE = 10000
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as a single-line JSON object, including any `extra=` fields.
+    """
+
+    def format(self, record):
+        data = {
+            "time": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        if record.stack_info:
+            data["stack"] = self.formatStack(record.stack_info)
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith("_"):
+                data[key] = value
+        return json.dumps(data, default=str)
+
+
+class SampleDebugFilter(logging.Filter):
+    """
+    Passes every record at INFO and above, and only a `rate` share of DEBUG records.
+    """
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = float(rate)
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        return self.rate > 0 and random.random() < self.rate
+
+
+class StructuredQueueHandler(QueueHandler):
+    """
+    Queue handler that keeps records structured for the formatter on the listener side.
+
+    The message is merged with its arguments and the traceback rendered in the logging thread,
+    since neither is safe to defer, but the record is not flattened into a formatted string.
+    Records are dropped, not blocked on, when the queue is full.
+    """
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def configure(config):
+    """
+    Applies a logging dict config and serves the root logger's handlers from a listener thread.
+
+    Django calls this for its default config and then for `settings.LOGGING`; reconfiguring
+    stops the previous listener first, which flushes the records it still holds.
+    """
+    global _listener
+    stop_listener()
+    logging.config.dictConfig(config)
+
+    root = logging.getLogger()
+    handlers = [h for h in root.handlers if not isinstance(h, QueueHandler)]
+    if not handlers:
+        return
+
+    queue_handler = StructuredQueueHandler(queue.Queue(QUEUE_SIZE))
+    # Records no target handler would write are dropped before they are queued, and filters
+    # shared by every target handler (e.g. debug sampling) run before queueing too
+    queue_handler.setLevel(min(handler.level for handler in handlers))
+    for shared in [f for f in handlers[0].filters if all(f in h.filters for h in handlers)]:
+        queue_handler.addFilter(shared)
+        for handler in handlers:
+            handler.removeFilter(shared)
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    _listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def restart_listener():
+    """
+    Starts a new listener thread in a forked child, with the handlers of the parent's listener.
+
+    The child gets a fresh queue: records still queued in the parent at fork time are written
+    by the parent, and the copied queue's lock may have been held by one of its threads.
+    """
+    global _listener
+    if _listener is None:
+        return
+    records = queue.Queue(QUEUE_SIZE)
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, StructuredQueueHandler):
+            handler.queue = records
+    _listener = QueueListener(records, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+atexit.register(stop_listener)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=restart_listener)
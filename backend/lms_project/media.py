@@ -0,0 +1,106 @@
+"""
+Content-addressed media storage and cache-friendly media serving.
+
+Uploads stored through `ContentAddressedStorage` are named after the SHA-256 of their content
+(`<prefix>/<2 hex>/<64 hex>.<ext>`): two different files never share a name, and uploading a
+file that is already stored reuses it instead of writing a copy. Since a name always refers to
+the same bytes, `serve_media` marks files named after their content hash as immutable for a
+year; other files under a hashed directory are revalidated like any other media.
+
+`serve_media` streams files itself (`MEDIA_SERVE_MODE = "django"`), or only sets the headers and
+hands the transfer to the web server with `X-Sendfile` (`"sendfile"`, Apache/lighttpd) or
+`X-Accel-Redirect` (`"accel"`, nginx, with the internal location at `MEDIA_ACCEL_PREFIX`).
+"""
+
+from hashlib import sha256
+import mimetypes
+import os
+import re
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import FileSystemStorage
+from django.http import Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views import static
+
+# A file named after a 64 hex digit content hash never changes
+CONTENT_ADDRESSED = re.compile(r"(?:^|/)[0-9a-f]{64}(?:\.[^/]*)?$")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "public, max-age=3600"
+
+
+def content_addressed_name(prefix, file, filename):
+    """
+    Returns the storage name of a file derived from its content, keeping the extension.
+
+    Parameters:
+        prefix (str): The directory of the stored files, e.g. `book_images`.
+        file (File): The file being stored; it is read in chunks and rewound.
+        filename (str): The uploaded file name, used only for its extension.
+    """
+    digest = sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    content_hash = digest.hexdigest()
+    extension = os.path.splitext(filename)[1].lower()
+    return f"{prefix}/{content_hash[:2]}/{content_hash}{extension}"
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage for content-addressed names: an existing name is reused, not renamed.
+
+    New files are written under a temporary name and moved into place, so concurrent uploads
+    of the same content never see a partial file.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+        temporary = super()._save(f"{name}.{uuid4().hex}.part", content)
+        os.replace(self.path(temporary), self.path(name))
+        return name
+
+
+def cache_control(path):
+    return IMMUTABLE_CACHE_CONTROL if CONTENT_ADDRESSED.search(path) else DEFAULT_CACHE_CONTROL
+
+
+def serve_media(request, path):
+    """
+    Serves a file from `MEDIA_ROOT` with caching headers, directly or through the web server.
+    """
+    mode = getattr(settings, "MEDIA_SERVE_MODE", "django")
+    if mode not in ("django", "sendfile", "accel"):
+        raise ImproperlyConfigured(f"Unknown MEDIA_SERVE_MODE {mode!r}.")
+    if mode == "django":
+        response = static.serve(request, path, document_root=settings.MEDIA_ROOT)
+        response["Cache-Control"] = cache_control(path)
+        return response
+
+    # Raises SuspiciousFileOperation (answered with 400) for paths escaping MEDIA_ROOT
+    full_path = safe_join(settings.MEDIA_ROOT, path)
+    if not os.path.isfile(full_path):
+        raise Http404("File does not exist")
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    response = HttpResponse(content_type=content_type or "application/octet-stream")
+    if encoding:
+        response["Content-Encoding"] = encoding
+    response["Last-Modified"] = http_date(os.stat(full_path).st_mtime)
+    response["Cache-Control"] = cache_control(path)
+    if mode == "sendfile":
+        response["X-Sendfile"] = full_path
+    else:
+        prefix = getattr(settings, "MEDIA_ACCEL_PREFIX", "/protected-media/")
+        relative = os.path.relpath(full_path, settings.MEDIA_ROOT).replace(os.sep, "/")
+        response["X-Accel-Redirect"] = f"{prefix.rstrip('/')}/{relative}"
+    return response
@@ -0,0 +1,439 @@
+"""
+Per-route request metrics, kept in process and exposed in the Prometheus text format.
+
+`MetricsMiddleware` records, for every request and labelled by the resolved route, the wall
+time, the number and total time of DB queries (through `connection.execute_wrapper`) and the
+time spent in DRF serializers (validation and representation). Each value goes into a
+fixed-bucket histogram, so memory does not grow with traffic.
+
+`metrics_view` serves the histograms at `/metrics`. With `METRICS_MULTIPROC_DIR` set, every
+worker process periodically writes a snapshot of its histograms to `<dir>/<pid>.json` and the
+view sums the snapshots of all workers, so any worker can answer a scrape for the whole server.
+
+When the database uses a psycopg connection pool (`DB_POOL`), `pool_metrics` adds gauges and
+counters for the pool: open, in-use and maximum connections, waiting requests and wait time.
+"""
+
+from contextlib import ExitStack
+from contextvars import ContextVar
+import glob
+import hmac
+import json
+import os
+import re
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from rest_framework import serializers
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+# How often a worker writes its snapshot in multiprocess mode
+FLUSH_SECONDS = 5
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """
+    A labelled histogram with fixed buckets.
+
+    Attributes:
+        name (str): The metric name.
+        documentation (str): The HELP text.
+        labelnames (tuple): The label names, in the order values are given to `observe`.
+        buckets (tuple): The upper bounds of the buckets; +Inf is implicit.
+        series (dict): Label values -> [bucket counts..., sum, count]. Bucket counts are not cumulative.
+    """
+
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+                break
+        else:
+            series[len(self.buckets)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+
+class Registry:
+    """
+    The histograms of this process.
+
+    Methods:
+        observe(route, method, status, stats): Records one request.
+        snapshot(): Returns the histogram series as JSON-serialisable data.
+        collect(): Returns the merged snapshots of all worker processes.
+        render(): Returns the Prometheus text exposition.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.flushed_at = 0.0
+        self.histograms = {
+            histogram.name: histogram
+            for histogram in (
+                Histogram(
+                    "lms_http_request_duration_seconds",
+                    "Wall time of HTTP requests.",
+                    ("route", "method", "status"),
+                    DURATION_BUCKETS,
+                ),
+                Histogram(
+                    "lms_db_queries_per_request",
+                    "Number of database queries per HTTP request.",
+                    ("route", "method"),
+                    QUERY_COUNT_BUCKETS,
+                ),
+                Histogram(
+                    "lms_db_duration_seconds",
+                    "Total database time per HTTP request.",
+                    ("route", "method"),
+                    DURATION_BUCKETS,
+                ),
+                Histogram(
+                    "lms_serializer_duration_seconds",
+                    "Total DRF serializer time (validation and representation) per HTTP request.",
+                    ("route", "method"),
+                    DURATION_BUCKETS,
+                ),
+            )
+        }
+        # Callables returning extra exposition lines, e.g. connection pool gauges
+        self.collectors = []
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.flushed_at = 0.0
+        for histogram in self.histograms.values():
+            histogram.series = {}
+
+    def observe(self, route, method, status, stats):
+        with self.lock:
+            if os.getpid() != self.pid:
+                # Forked worker: start from empty series instead of the parent's
+                self.reset()
+            histograms = self.histograms
+            histograms["lms_http_request_duration_seconds"].observe(
+                (route, method, str(status)), stats.wall_time
+            )
+            histograms["lms_db_queries_per_request"].observe((route, method), stats.queries)
+            histograms["lms_db_duration_seconds"].observe((route, method), stats.db_time)
+            histograms["lms_serializer_duration_seconds"].observe(
+                (route, method), stats.serializer_time
+            )
+        self.maybe_flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: [[list(labels), list(series)] for labels, series in histogram.series.items()]
+                for name, histogram in self.histograms.items()
+            }
+
+    def maybe_flush(self, force=False):
+        directory = getattr(settings, "METRICS_MULTIPROC_DIR", None)
+        now = time.monotonic()
+        if not directory or (not force and now - self.flushed_at < FLUSH_SECONDS):
+            return
+        self.flushed_at = now
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, "w") as stream:
+            json.dump(self.snapshot(), stream)
+        os.replace(temporary, path)
+
+    def collect(self):
+        directory = getattr(settings, "METRICS_MULTIPROC_DIR", None)
+        if not directory:
+            return self.snapshot()
+
+        self.maybe_flush(force=True)
+        merged = {}
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            try:
+                with open(path) as stream:
+                    snapshot = json.load(stream)
+            except (OSError, ValueError):
+                # Being replaced by its worker, or left half-written by a killed one
+                continue
+            for name, entries in snapshot.items():
+                target = merged.setdefault(name, {})
+                for labels, series in entries:
+                    current = target.get(tuple(labels))
+                    target[tuple(labels)] = (
+                        series if current is None else [a + b for a, b in zip(current, series)]
+                    )
+        return {
+            name: [[list(labels), series] for labels, series in entries.items()]
+            for name, entries in merged.items()
+        }
+
+    def render(self):
+        lines = []
+        for name, entries in sorted(self.collect().items()):
+            histogram = self.histograms[name]
+            lines.append(f"# HELP {name} {histogram.documentation}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, series in sorted(entries):
+                pairs = [
+                    f'{key}="{escape(value)}"' for key, value in zip(histogram.labelnames, labels)
+                ]
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ("+Inf",), series):
+                    cumulative += count
+                    bucket_labels = ",".join(pairs + [f'le="{bound}"'])
+                    lines.append(f"{name}_bucket{{{bucket_labels}}} {cumulative}")
+                series_labels = ",".join(pairs)
+                lines.append(f"{name}_sum{{{series_labels}}} {series[-2]}")
+                lines.append(f"{name}_count{{{series_labels}}} {series[-1]}")
+        for collector in self.collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# (metric, type, help, psycopg_pool statistic, scale); in-use is computed from size - available
+POOL_METRICS = (
+    ("lms_db_pool_max_connections", "gauge", "Maximum size of the connection pool.", "pool_max", 1),
+    (
+        "lms_db_pool_open_connections",
+        "gauge",
+        "Connections currently open in the pool.",
+        "pool_size",
+        1,
+    ),
+    ("lms_db_pool_in_use_connections", "gauge", "Pool connections currently lent out.", None, 1),
+    (
+        "lms_db_pool_waiting_requests",
+        "gauge",
+        "Requests waiting for a pool connection.",
+        "requests_waiting",
+        1,
+    ),
+    (
+        "lms_db_pool_requests_total",
+        "counter",
+        "Connections requested from the pool.",
+        "requests_num",
+        1,
+    ),
+    (
+        "lms_db_pool_wait_seconds_total",
+        "counter",
+        "Time spent waiting for pool connections.",
+        "requests_wait_ms",
+        0.001,
+    ),
+    (
+        "lms_db_pool_errors_total",
+        "counter",
+        "Pool requests that failed, e.g. timed out.",
+        "requests_errors",
+        1,
+    ),
+    (
+        "lms_db_pool_lost_connections_total",
+        "counter",
+        "Pool connections found broken.",
+        "connections_lost",
+        1,
+    ),
+)
+
+
+def pool_metrics():
+    """
+    Returns the exposition lines of the psycopg connection pools of this process.
+
+    Pools live in each process, so with several workers a scrape shows the pools of the worker
+    that answered it, labelled with its pid.
+    """
+    pools = []
+    for alias in connections:
+        if connections.settings[alias].get("OPTIONS", {}).get("pool"):
+            pool = connections[alias].pool
+            if pool is not None and not pool.closed:
+                pools.append((alias, pool.get_stats()))
+    if not pools:
+        return []
+
+    lines = []
+    for name, kind, documentation, statistic, scale in POOL_METRICS:
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} {kind}")
+        for alias, stats in pools:
+            if statistic is None:
+                value = stats.get("pool_size", 0) - stats.get("pool_available", 0)
+            else:
+                value = stats.get(statistic, 0) * scale
+            lines.append(f'{name}{{alias="{escape(alias)}",pid="{os.getpid()}"}} {value}')
+    return lines
+
+
+registry.collectors.append(pool_metrics)
+
+
+class RequestStats:
+    """
+    The measurements of the request being served.
+    """
+
+    __slots__ = ("wall_time", "queries", "db_time", "serializer_time", "serializer_depth")
+
+    def __init__(self):
+        self.wall_time = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+current_stats = ContextVar("current_request_stats", default=None)
+
+
+def timed_serializer(function):
+    """
+    Wraps a serializer method so its time counts toward the current request's serializer time.
+
+    Nested serializers and nested calls are only counted once, at the outermost call.
+    """
+
+    def wrapper(*args, **kwargs):
+        stats = current_stats.get()
+        if stats is None or stats.serializer_depth:
+            return function(*args, **kwargs)
+        stats.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stats.serializer_time += time.perf_counter() - started
+            stats.serializer_depth -= 1
+
+    wrapper.__wrapped__ = function
+    return wrapper
+
+
+def instrument_serializers():
+    """
+    Times `is_valid` and `data` of every DRF serializer; safe to call more than once.
+    """
+    base = serializers.BaseSerializer
+    if hasattr(base.is_valid, "__wrapped__"):
+        return
+    base.is_valid = timed_serializer(base.is_valid)
+    base.data = property(timed_serializer(base.data.fget))
+
+
+ROUTE_GROUP = re.compile(r"\(\?P<(\w+)>[^)]*\)")
+ROUTE_NOISE = re.compile(r"[\^$?]|\\\.|\.?<format>/?")
+
+
+def route_label(request):
+    """
+    Returns the route pattern that served the request, e.g. `api/books/<pk>/`.
+
+    Router regexes are reduced to the same form as path patterns, and the format suffix is
+    dropped, so the label set stays small. Unresolved requests share one label.
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None or not match.route:
+        return "unmatched"
+    return ROUTE_NOISE.sub("", ROUTE_GROUP.sub(r"<\1>", match.route))
+
+
+class MetricsMiddleware:
+    """
+    Records wall time, DB queries and DB time, and serializer time for every request.
+
+    Should be the first middleware, so that the wall time covers the whole middleware stack.
+    Under ASGI it runs on the event loop, so async views are not moved onto a thread; their
+    queries are counted where they run (see `lms_project.concurrency`).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        instrument_serializers()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            stats.wall_time = time.perf_counter() - started
+            current_stats.reset(token)
+        registry.observe(route_label(request), request.method, response.status_code, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stats.wall_time = time.perf_counter() - started
+            current_stats.reset(token)
+        registry.observe(route_label(request), request.method, response.status_code, stats)
+        return response
+
+
+def metrics_view(request):
+    """
+    Serves the metrics of every worker in the Prometheus text format.
+
+    Scrapes must send `METRICS_TOKEN` as `Authorization: Bearer <token>`. Without a configured
+    token the metrics are only served with `DEBUG` on, and every scrape is denied otherwise.
+    """
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponseForbidden()
+    elif not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
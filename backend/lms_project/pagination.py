@@ -0,0 +1,219 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+import json
+import operator
+
+from django.core.exceptions import ValidationError
+from django.db.models import Field, Func, Q, Value
+from rest_framework.exceptions import NotFound, ValidationError as RequestValidationError
+from rest_framework.filters import SearchFilter
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class Row(Func):
+    """
+    A row value, e.g. `(created_at, id)`, which the database compares lexicographically.
+    """
+
+    template = "(%(expressions)s)"
+
+    def __init__(self, *expressions):
+        super().__init__(*expressions, output_field=Field())
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination over a unique, indexed ordering such as ('-created_at', '-id').
+
+    Each page is fetched with a `WHERE (created_at, id) < (last seen values)` condition instead of
+    an OFFSET, and no COUNT(*) is issued, so every page costs the same regardless of its depth.
+    Cursors are opaque, url-safe base64 encoded positions.
+
+    Attributes:
+        cursor_query_param (str): The query parameter holding the cursor.
+        invalid_cursor_message (str): The error message for a cursor that cannot be decoded.
+    """
+
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self, ordering, page_size):
+        self.ordering = tuple(ordering)
+        self.page_size = page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.model = queryset.model
+
+        position, reverse = self.decode_cursor(request)
+        ordering = self.reverse_ordering() if reverse else self.ordering
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = self.after_position(queryset, ordering, position)
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.position_of(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.position_of(self.page[0]), reverse=True)
+
+    def reverse_ordering(self):
+        return tuple(
+            field[1:] if field.startswith("-") else f"-{field}" for field in self.ordering
+        )
+
+    def get_field(self, name):
+        return self.model._meta.get_field(name.lstrip("-"))
+
+    def position_of(self, instance):
+        return [
+            self.get_field(name).value_to_string(instance) for name in self.ordering
+        ]
+
+    def after_position(self, queryset, ordering, position):
+        """
+        Restricts the queryset to the rows after the given position in the given ordering.
+
+        When every field is sorted the same way this is a row comparison, `(a, b) < (x, y)`,
+        which the database answers with a range scan of the (a, b) index. Mixed directions fall
+        back to the lexicographic (a > x) OR (a = x AND b > y) ... condition.
+        """
+        if len({name.startswith("-") for name in ordering}) == 1:
+            lookup = "lt" if ordering[0].startswith("-") else "gt"
+            values = [
+                Value(value, output_field=self.get_field(name))
+                for name, value in zip(ordering, position)
+            ]
+            return queryset.alias(
+                keyset_position=Row(*[name.lstrip("-") for name in ordering])
+            ).filter(**{f"keyset_position__{lookup}": Row(*values)})
+
+        conditions = []
+        for index, name in enumerate(ordering):
+            field = name.lstrip("-")
+            lookup = "lt" if name.startswith("-") else "gt"
+            equal = {
+                previous.lstrip("-"): position[i]
+                for i, previous in enumerate(ordering[:index])
+            }
+            conditions.append(Q(**equal, **{f"{field}__{lookup}": position[index]}))
+        return queryset.filter(reduce(operator.or_, conditions))
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({"p": position, "r": int(reverse)}, separators=(",", ":"))
+        cursor = urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(urlsafe_b64decode(cursor.encode()).decode())
+            values = payload["p"]
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = [
+                self.get_field(name).to_python(value)
+                for name, value in zip(self.ordering, values)
+            ]
+            return position, bool(payload.get("r"))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class Paginate(PageNumberPagination):
+    """
+    Pagination class shared by all list endpoints.
+
+    Page number pagination is used by default so existing clients keep working; it keeps the
+    queryset's own ordering (e.g. search relevance), and orders unordered querysets by
+    `default_ordering`, the insertion order they were returned in before.
+
+    Passing `?paginate=cursor` switches to keyset pagination over the view's `cursor_ordering`.
+    A keyset can only follow a fixed, unique ordering, so cursor mode cannot be combined with
+    search, whose results are ordered by relevance; such requests are rejected with 400.
+
+    Attributes:
+        page_size (int): The default number of items per page.
+        page_size_query_param (str): The query parameter to specify the number of items per page in the API request.
+        mode_query_param (str): The query parameter selecting the pagination mode.
+        default_ordering (tuple): The page number ordering of querysets that are not ordered.
+        cursor_ordering (tuple): The ordering used when the view does not define `cursor_ordering`.
+    """
+
+    page_size = 10
+    page_size_query_param = "page_size"
+    mode_query_param = "paginate"
+    default_ordering = ("id",)
+    cursor_ordering = ("-created_at", "-id")
+    keyset = None
+
+    def get_cursor_ordering(self, view):
+        return getattr(view, "cursor_ordering", self.cursor_ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+
+        if request.query_params.get(self.mode_query_param) == "cursor":
+            if request.query_params.get(SearchFilter.search_param):
+                raise RequestValidationError(
+                    {
+                        self.mode_query_param: "Cursor pagination cannot be combined with "
+                        "search; use page numbers for search results."
+                    }
+                )
+            self.keyset = KeysetPagination(
+                self.get_cursor_ordering(view), self.get_page_size(request)
+            )
+            return self.keyset.paginate_queryset(queryset, request, view)
+
+        if not queryset.ordered:
+            queryset = queryset.order_by(*self.default_ordering)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
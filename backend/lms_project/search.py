@@ -0,0 +1,75 @@
+from functools import reduce
+import operator
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramWordSimilarity,
+)
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from rest_framework import filters
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    Drop-in replacement for DRF's SearchFilter backed by PostgreSQL full-text and trigram search.
+
+    A row matches when its stored search vector matches the query or when any of the trigram
+    fields is a fuzzy (typo tolerant) match for it. Results are ordered by relevance.
+
+    Views without a stored vector are matched with trigrams alone: a vector built on the fly
+    cannot use an index, and ORing it with the trigram predicate would turn every search into a
+    sequential scan instead of a bitmap scan of the trigram GIN indexes.
+
+    View attributes:
+        search_fields (list): Fields used for the fallback `icontains` search and, by default,
+            for the trigram match.
+        search_vector_field (str): Optional name of a maintained `SearchVectorField` (GIN indexed).
+        trigram_search_fields (list): Optional fields matched with `pg_trgm` (defaults to `search_fields`).
+        search_config (str): Optional text search configuration (defaults to 'english').
+
+    On databases other than PostgreSQL the plain SearchFilter behaviour is used.
+    """
+
+    search_config = "english"
+
+    def get_search_config(self, view):
+        return getattr(view, "search_config", self.search_config)
+
+    def get_trigram_fields(self, view, search_fields):
+        fields = getattr(view, "trigram_search_fields", None) or search_fields
+        return [field.lstrip("^=@$") for field in fields]
+
+    def filter_queryset(self, request, queryset, view):
+        if connection.vendor != "postgresql":
+            return super().filter_queryset(request, queryset, view)
+
+        search_fields = self.get_search_fields(view, request)
+        search_terms = self.get_search_terms(request)
+        if not search_fields or not search_terms:
+            return queryset
+
+        text = " ".join(search_terms)
+        trigram_fields = self.get_trigram_fields(view, search_fields)
+        match = reduce(
+            operator.or_,
+            (Q(**{f"{field}__trigram_word_similar": text}) for field in trigram_fields),
+        )
+        similarities = [TrigramWordSimilarity(text, field) for field in trigram_fields]
+        similarity = (
+            Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+        )
+        queryset = queryset.annotate(search_similarity=similarity)
+
+        vector_field = getattr(view, "search_vector_field", None)
+        if not vector_field:
+            return queryset.filter(match).order_by("-search_similarity", "-pk")
+
+        query = SearchQuery(text, config=self.get_search_config(view), search_type="websearch")
+        return (
+            queryset.annotate(search_rank=SearchRank(F(vector_field), query))
+            .filter(Q(**{vector_field: query}) | match)
+            .order_by("-search_rank", "-search_similarity", "-pk")
+        )
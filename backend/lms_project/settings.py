@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 from pathlib import Path
 from datetime import timedelta
+from celery.schedules import crontab
 import os, environ
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     # CorsHeader
     "corsheaders",
     # RestFramework
@@ -83,13 +85,16 @@ CORS_ALLOW_CREDENTIALS = True
 
 REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
+    # JWT only: Basic auth hashed the password on every request and session auth read the
+    # session table; verified access tokens are cached per process (see authentication.backends)
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework.authentication.SessionAuthentication",
-        "rest_framework.authentication.BasicAuthentication",
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "authentication.backends.CachedJWTAuthentication",
     ),
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
 }
+# Number of verified access tokens each process keeps to skip re-verifying them
+JWT_VERIFIED_TOKEN_CACHE_SIZE = env.int("JWT_VERIFIED_TOKEN_CACHE_SIZE", default=4096)
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=5),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=90),
@@ -116,7 +121,7 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_LIFETIME": timedelta(minutes=5),
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
     "TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainPairSerializer",
-    "TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "authentication.serializers.CustomTokenRefreshSerializer",
     "TOKEN_VERIFY_SERIALIZER": "rest_framework_simplejwt.serializers.TokenVerifySerializer",
     "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
     "SLIDING_TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer",
@@ -124,6 +129,7 @@ SIMPLE_JWT = {
 }
 
 MIDDLEWARE = [
+    "lms_project.metrics.MetricsMiddleware",  # First, so its timing covers every middleware
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",  # Ensure this is above CommonMiddleware
@@ -161,6 +167,12 @@ WSGI_APPLICATION = "lms_project.wsgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
+# Connections are kept open for DB_CONN_MAX_AGE seconds and checked before reuse. With DB_POOL
+# set, each process instead borrows connections from a psycopg 3 pool (the `pool` extra:
+# `poetry install --extras pool`) of DB_POOL_MIN_SIZE to DB_POOL_MAX_SIZE connections;
+# a request waits up to DB_POOL_TIMEOUT seconds for one. Pool usage is exposed at /metrics.
+
+DB_POOL = env.bool("DB_POOL", default=False)
 
 DATABASES = {
     "default": {
@@ -170,8 +182,38 @@ DATABASES = {
         "PASSWORD": env("DB_PASSWORD", default="password"),
         "HOST": env("DB_HOST", default="localhost"),
         "PORT": env.int("DB_PORT", default=5432),
+        # Pooled connections are returned to the pool, so they must not be persistent as well
+        "CONN_MAX_AGE": 0 if DB_POOL else env.int("DB_CONN_MAX_AGE", default=60),
+        "CONN_HEALTH_CHECKS": env.bool("DB_CONN_HEALTH_CHECKS", default=True),
+        "OPTIONS": {},
+    }
+}
+
+if DB_POOL:
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": env.int("DB_POOL_MIN_SIZE", default=2),
+        "max_size": env.int("DB_POOL_MAX_SIZE", default=10),
+        "timeout": env.float("DB_POOL_TIMEOUT", default=10.0),
     }
+
+# Threads (each with its own connection) running the queries of the async dashboard views,
+# per process; see lms_project.concurrency
+ASYNC_DB_THREADS = env.int("ASYNC_DB_THREADS", default=8)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Set CACHE_URL (e.g. redis://localhost:6379/1) to share cached responses between processes.
+
+# The cache must be shared by all processes (password reset OTPs, token blacklist versions). The
+# file cache default only shares it between the processes of one host; use redis:// or memcache://
+# when serving from several hosts.
+CACHES = {
+    "default": env.cache(
+        "CACHE_URL", default=f"filecache://{os.path.join(BASE_DIR, 'cache')}"
+    )
 }
+RESPONSE_CACHE_ALIAS = "default"
 
 
 # Password validation
@@ -212,6 +254,12 @@ STATIC_URL = "static/"
 STATICFILES_DIRS = [os.path.join(BASE_DIR, "static")]
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+
+# How /media/ files are sent (see lms_project.media): "django" streams them from Python,
+# "sendfile" sets X-Sendfile (Apache, lighttpd), "accel" sets X-Accel-Redirect (nginx), with
+# MEDIA_ACCEL_PREFIX an internal location aliased to MEDIA_ROOT.
+MEDIA_SERVE_MODE = env("MEDIA_SERVE_MODE", default="django")
+MEDIA_ACCEL_PREFIX = env("MEDIA_ACCEL_PREFIX", default="/protected-media/")
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -253,39 +301,111 @@ JAZZMIN_UI_TWEAKS = {
 
 # Email Configuration
 
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+EMAIL_BACKEND = env(
+    "EMAIL_BACKEND", default="django.core.mail.backends.smtp.EmailBackend"
+)
 
 EMAIL_HOST = env("EMAIL_HOST")
 EMAIL_HOST_USER = env("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = env("EMAIL_HOST_PASSWORD")
 EMAIL_PORT = env("EMAIL_PORT")
+EMAIL_TIMEOUT = env.int("EMAIL_TIMEOUT", default=10)
+DEFAULT_FROM_EMAIL = env("DEFAULT_FROM_EMAIL", default="noreply@example.com")
+
+
+# Celery
+# https://docs.celeryq.dev/en/stable/django/first-steps-with-django.html
+# Without a broker (the in-memory default) no worker consumes the queue, so tasks run eagerly
+# in the calling process, and the mail tasks give up on the first delivery error instead of
+# retrying inline. Set CELERY_BROKER_URL (e.g. redis://localhost:6379/0, or filesystem:// with
+# CELERY_BROKER_FOLDER) to deliver them through a worker.
+
+CELERY_BROKER_URL = env("CELERY_BROKER_URL", default="memory://")
+CELERY_TASK_ALWAYS_EAGER = env.bool(
+    "CELERY_TASK_ALWAYS_EAGER", default=CELERY_BROKER_URL == "memory://"
+)
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_IGNORE_RESULT = True
+
+if CELERY_BROKER_URL.startswith("filesystem://"):
+    CELERY_BROKER_FOLDER = env("CELERY_BROKER_FOLDER", default=os.path.join(BASE_DIR, "broker"))
+    CELERY_BROKER_TRANSPORT_OPTIONS = {
+        "data_folder_in": CELERY_BROKER_FOLDER,
+        "data_folder_out": CELERY_BROKER_FOLDER,
+    }
+
+# Metrics
+# Per-route histograms served at /metrics (see lms_project.metrics). With several worker
+# processes, point METRICS_MULTIPROC_DIR at a directory shared by them (emptied on deploy).
+# Scrapes must send METRICS_TOKEN as a bearer token; without one /metrics is only served in DEBUG.
+
+METRICS_MULTIPROC_DIR = env("METRICS_MULTIPROC_DIR", default=None)
+METRICS_TOKEN = env("METRICS_TOKEN", default=None)
+
+# Logging
+# Root handlers write from a background thread (see lms_project.logs); records are JSON lines.
+
+LOGGING_CONFIG = "lms_project.logs.configure"
+
+LOG_LEVEL = env("LOG_LEVEL", default="DEBUG" if DEBUG else "INFO")
 
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
     "formatters": {
-        "verbose": {
-            "format": "{levelname} {asctime} {module} {message}",
-            "style": "{",
+        "json": {
+            "()": "lms_project.logs.JsonFormatter",
         },
-        "simple": {
-            "format": "{levelname} {message}",
-            "style": "{",
+    },
+    "filters": {
+        # Share of DEBUG records kept, between 0 and 1
+        "sample_debug": {
+            "()": "lms_project.logs.SampleDebugFilter",
+            "rate": env.float("LOG_DEBUG_SAMPLE_RATE", default=1.0 if DEBUG else 0.01),
         },
     },
     "handlers": {
         "console": {
             "class": "logging.StreamHandler",
+            "formatter": "json",
+            "filters": ["sample_debug"],
         },
         "file": {
-            "level": "DEBUG",
-            "class": "logging.FileHandler",
-            "filename": os.path.join(BASE_DIR, "debug.log"),
-            "formatter": "verbose",
+            "class": "logging.handlers.WatchedFileHandler",
+            "filename": env("LOG_FILE", default=os.path.join(BASE_DIR, "debug.log")),
+            "formatter": "json",
+            "filters": ["sample_debug"],
         },
     },
     "root": {
         "handlers": ["console", "file"],
-        "level": "DEBUG",
+        "level": LOG_LEVEL,
+    },
+    "loggers": {
+        # SQL logging only for investigations: one record per query
+        "django.db.backends": {"level": "WARNING"},
+        "django.request": {"level": "WARNING"},
+        "django.security": {"level": "WARNING"},
+        "django.template": {"level": "WARNING"},
+        "django.utils.autoreload": {"level": "WARNING"},
+        "celery": {"level": "INFO"},
+        "kombu": {"level": "WARNING"},
+        "PIL": {"level": "WARNING"},
+    },
+}
+
+
+# Celery Beat
+# Periodic tasks, run by `celery -A lms_project beat`.
+
+CELERY_BEAT_SCHEDULE = {
+    "sweep-overdue-loans": {
+        "task": "library_management.tasks.sweep_overdue_loans",
+        "schedule": crontab(hour=0, minute=15),
+    },
+    "purge-expired-tokens": {
+        "task": "authentication.tasks.purge_expired_tokens",
+        "schedule": crontab(hour=3, minute=0),
     },
 }
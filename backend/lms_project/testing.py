@@ -0,0 +1,42 @@
+from contextlib import contextmanager
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin asserting an upper bound on the number of database queries.
+
+    Methods:
+        assertMaxQueries: Context manager failing when the wrapped block runs more than `max_queries` queries.
+        assertQueryBudget: GETs an endpoint with several page sizes and checks each request stays within budget.
+    """
+
+    @contextmanager
+    def assertMaxQueries(self, max_queries, using="default"):
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        executed = len(context.captured_queries)
+        if executed > max_queries:
+            queries = "\n".join(
+                f"{index}. {query['sql']}"
+                for index, query in enumerate(context.captured_queries, start=1)
+            )
+            self.fail(
+                f"{executed} queries executed, {max_queries} allowed:\n{queries}"
+            )
+
+    def assertQueryBudget(self, url, max_queries, page_sizes=(None,), client=None):
+        """
+        Requests `url` once per page size and asserts that none of the requests exceeds `max_queries`.
+
+        A page size of None requests the endpoint without the `page_size` parameter.
+        """
+        client = client or self.client
+        for page_size in page_sizes:
+            params = {} if page_size is None else {"page_size": page_size}
+            with self.subTest(url=url, page_size=page_size):
+                with self.assertMaxQueries(max_queries):
+                    response = client.get(url, params)
+                self.assertEqual(response.status_code, 200)
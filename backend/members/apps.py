@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MembersConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "members"
+
+    def ready(self):
+        # Connects the plan policy cache invalidation receivers
+        from . import policies  # noqa: F401
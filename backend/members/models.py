@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,13 +20,15 @@ class Members(models.Model):
         is_active (BooleanField): Indicates if the member is active.
         late_return_count (IntegerField): The count of late returns by the member.
         unpaid_fine (DecimalField): The amount of unpaid fines by the member.
+        projected_fine (DecimalField): The late fees accruing on the member's open loans, as of the last overdue sweep.
         created_at (DateTimeField): The timestamp when the member was created.
         updated_at (DateTimeField): The timestamp when the member was last updated.
         created_by (ForeignKey): The user who created the member.
 
     Methods:
         __str__: Returns the name of the member.
-        save: Custom save method to log the change in 'is_active' field before and after saving.
+        from_db: Remembers the plan loaded from the database so plan changes can be detected.
+        save: Saves the member atomically together with the dependent dashboard counters.
     """
 
     PLAN_CHOICES = [
@@ -57,11 +60,83 @@ class Members(models.Model):
     unpaid_fine = models.DecimalField(
         default=0.00, max_digits=10, decimal_places=2, verbose_name="Previous Fine"
     )
+    projected_fine = models.DecimalField(
+        default=0.00,
+        max_digits=10,
+        decimal_places=2,
+        editable=False,
+        verbose_name="Projected Fine",
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At")
     created_by = models.ForeignKey(
         User, on_delete=models.CASCADE, verbose_name="Created By", default=1
     )
 
+    class Meta:
+        indexes = [
+            GinIndex(
+                fields=["name"], name="member_name_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+            GinIndex(
+                fields=["email"], name="member_email_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+            GinIndex(
+                fields=["phone_number"],
+                name="member_phone_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+            models.Index(fields=["created_at", "id"], name="member_created_idx"),
+        ]
+
     def __str__(self):
         return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_plan = instance.__dict__.get("plan")
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the member inside a transaction so that the post-save bookkeeping
+        (dashboard counters) is committed or rolled back together with the row.
+        """
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
+
+class PlanPolicy(models.Model):
+    """
+    The lending rules of a membership plan.
+
+    Rows are read through the process-local registry in `members.policies`, which falls back
+    to built-in defaults for plans without a row. Saving or deleting a policy invalidates the
+    registry in every process through a version stamp in the cache.
+
+    Attributes:
+        plan (CharField): The membership plan the rules apply to.
+        max_books (PositiveIntegerField): The maximum number of books a member can have issued at once.
+        daily_late_fee (DecimalField): The fee charged per day past the loan period.
+        loan_period_days (PositiveIntegerField): The number of days a book can be kept without a late fee.
+        updated_at (DateTimeField): The timestamp when the policy was last updated.
+    """
+
+    plan = models.CharField(
+        max_length=10, choices=Members.PLAN_CHOICES, unique=True, verbose_name="Plan"
+    )
+    max_books = models.PositiveIntegerField(verbose_name="Maximum Books")
+    daily_late_fee = models.DecimalField(
+        max_digits=8, decimal_places=2, verbose_name="Daily Late Fee"
+    )
+    loan_period_days = models.PositiveIntegerField(
+        default=30, verbose_name="Loan Period (Days)"
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At")
+
+    def __str__(self):
+        return self.plan
+
+    class Meta:
+        verbose_name_plural = "Plan Policies"
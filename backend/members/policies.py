@@ -0,0 +1,150 @@
+from collections import namedtuple
+from decimal import Decimal
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import PlanPolicy
+
+Policy = namedtuple("Policy", ["max_books", "daily_late_fee", "loan_period_days"])
+
+# Number of days a book can be kept before late fees apply, unless the plan says otherwise
+LOAN_PERIOD_DAYS = 30
+
+# Rules used for plans that have no PlanPolicy row
+DEFAULT_POLICIES = {
+    "Student": Policy(max_books=8, daily_late_fee=Decimal(10), loan_period_days=LOAN_PERIOD_DAYS),
+    "Normal": Policy(max_books=5, daily_late_fee=Decimal(20), loan_period_days=LOAN_PERIOD_DAYS),
+    "Premium": Policy(max_books=10, daily_late_fee=Decimal(10), loan_period_days=LOAN_PERIOD_DAYS),
+}
+
+# Unknown plans are not allowed to borrow and are not charged
+UNKNOWN_PLAN = Policy(max_books=0, daily_late_fee=Decimal(0), loan_period_days=LOAN_PERIOD_DAYS)
+
+VERSION_KEY = "plan-policies-version"
+
+# How often the cached version stamp is compared, and how long a loaded registry may be used at
+# most (bounds staleness when the cache is not shared between processes, e.g. locmem).
+VERSION_CHECK_SECONDS = 5
+MAX_AGE_SECONDS = 300
+
+
+class Registry:
+    """
+    A process-local snapshot of all plan policies.
+
+    The snapshot is loaded with one query and then served from memory. The version stamp in the
+    cache is compared at most every `VERSION_CHECK_SECONDS`; a different stamp, or a snapshot
+    older than `MAX_AGE_SECONDS`, triggers a reload.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.version = None
+        self.loaded_at = 0.0
+        self.checked_at = 0.0
+
+    def get(self):
+        now = time.monotonic()
+        snapshot = self.snapshot
+        if snapshot is not None and now - self.checked_at < VERSION_CHECK_SECONDS:
+            return snapshot
+
+        with self.lock:
+            version = cache.get(VERSION_KEY)
+            if version is None:
+                cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+                version = cache.get(VERSION_KEY)
+            if (
+                self.snapshot is None
+                or version != self.version
+                or now - self.loaded_at >= MAX_AGE_SECONDS
+            ):
+                self.snapshot = self.load()
+                self.version = version
+                self.loaded_at = now
+            self.checked_at = now
+            return self.snapshot
+
+    def load(self):
+        policies = dict(DEFAULT_POLICIES)
+        for plan, max_books, daily_late_fee, loan_period_days in PlanPolicy.objects.values_list(
+            "plan", "max_books", "daily_late_fee", "loan_period_days"
+        ):
+            policies[plan] = Policy(max_books, daily_late_fee, loan_period_days)
+        return policies
+
+    def invalidate(self):
+        """
+        Drops the local snapshot and moves the shared version stamp, so every process reloads.
+        """
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+        with self.lock:
+            self.snapshot = None
+
+
+registry = Registry()
+
+
+@receiver(post_save, sender=PlanPolicy)
+@receiver(post_delete, sender=PlanPolicy)
+def plan_policy_changed(sender, **kwargs):
+    transaction.on_commit(registry.invalidate)
+
+
+def all_policies():
+    """
+    Returns the policy of every known plan, keyed by plan.
+    """
+    return registry.get()
+
+
+def get_policy(plan):
+    """
+    Returns the policy of the given plan, read from memory.
+    """
+    return registry.get().get(plan, UNKNOWN_PLAN)
+
+
+def max_books_allowed(plan):
+    """
+    Returns the maximum number of books a member on the given plan can have issued at once.
+
+    Unknown plans are not allowed to borrow any book.
+    """
+    return get_policy(plan).max_books
+
+
+def loan_period_days(plan):
+    """
+    Returns the number of days a member on the given plan can keep a book without a late fee.
+    """
+    return get_policy(plan).loan_period_days
+
+
+def late_fee(plan, days_borrowed):
+    """
+    Returns the late fee for a book kept `days_borrowed` days by a member on the given plan.
+
+    Every day past the loan period is charged at the plan's daily fee. Unknown plans are not charged.
+    """
+    policy = get_policy(plan)
+    extra_days = days_borrowed - policy.loan_period_days
+    if extra_days <= 0:
+        return 0
+    return extra_days * policy.daily_late_fee
+
+
+def is_late(plan, days_borrowed):
+    """
+    Returns True if a book kept `days_borrowed` days by a member on the given plan was returned after the loan period.
+    """
+    return days_borrowed > get_policy(plan).loan_period_days
@@ -6,3 +6,5 @@ class MembersSerializer(serializers.ModelSerializer):
     class Meta:
         model = Members
         fields = "__all__"
+        # The fine balance is maintained from the fine ledger, see the settle_fine action
+        read_only_fields = ["unpaid_fine"]
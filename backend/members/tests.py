@@ -0,0 +1,36 @@
+from django.test import TestCase
+
+from . import policies
+from .models import PlanPolicy
+
+
+class PlanPolicyRegistryTests(TestCase):
+    """
+    Checks that plan policies are served from memory and reloaded when a policy changes.
+    """
+
+    def setUp(self):
+        policies.registry.invalidate()
+
+    def test_defaults_apply_to_plans_without_a_policy(self):
+        self.assertEqual(policies.max_books_allowed("Student"), 8)
+        self.assertEqual(policies.late_fee("Normal", 32), 40)
+        self.assertEqual(policies.max_books_allowed("Unknown"), 0)
+
+    def test_warm_registry_issues_no_queries(self):
+        policies.max_books_allowed("Normal")
+        with self.assertNumQueries(0):
+            policies.max_books_allowed("Normal")
+            policies.late_fee("Premium", 40)
+            policies.is_late("Student", 31)
+
+    def test_saving_a_policy_invalidates_the_registry(self):
+        self.assertEqual(policies.max_books_allowed("Normal"), 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            PlanPolicy.objects.create(
+                plan="Normal", max_books=7, daily_late_fee=5, loan_period_days=14
+            )
+
+        self.assertEqual(policies.max_books_allowed("Normal"), 7)
+        self.assertEqual(policies.late_fee("Normal", 20), 30)
+        self.assertTrue(policies.is_late("Normal", 15))
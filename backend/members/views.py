@@ -7,29 +7,26 @@ from rest_framework.decorators import action
 # Model and Serializer
 from .models import Members
 from .serializers import MembersSerializer
+from library_management import fines
+from library_management.models import FineTransaction
+from library_management.serializers import (
+    FineSettlementSerializer,
+    FineTransactionSerializer,
+)
+
+# Conditional Requests
+from lms_project.conditional import ConditionalGetMixin
 
 # Filter and Pagination
-from rest_framework import filters
-from rest_framework.pagination import PageNumberPagination
+from lms_project.search import FullTextSearchFilter
+from lms_project.pagination import Paginate
 
 # Authentication
-from rest_framework_simplejwt.authentication import JWTTokenUserAuthentication
+from authentication.backends import CachedJWTTokenUserAuthentication
 from rest_framework.permissions import IsAuthenticated
 
 
-class Paginate(PageNumberPagination):
-    """
-Custom pagination class for controlling the number of items per page in the API response.
-
-Attributes:
-    page_size (int): The default number of items per page.
-    page_size_query_param (str): The query parameter to specify the number of items per page.
-"""
-    page_size = 10
-    page_size_query_param = "page_size"
-
-
-class MemberViewSet(viewsets.ModelViewSet):
+class MemberViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
 A viewset for handling CRUD operations and custom actions related to the 'Members' model.
 
@@ -42,18 +39,22 @@ Attributes:
     authentication_classes (list): A list of authentication classes applied to the viewset.
 
 Methods:
+    list: Lists members, or answers 304 when the page is unchanged.
+    retrieve: Retrieves a member, or answers 304 when it is unchanged.
     create: Custom method for creating a new member instance.
     update: Custom method for updating an existing member instance.
     destroy: Custom method for deleting a member instance.
     gender_choices: Custom action to retrieve the gender choices available for members.
     plan_choices: Custom action to retrieve the plan choices available for members.
+    statement: Custom action to retrieve a member's fine balance and paginated fine ledger.
+    settle_fine: Custom action to record a payment or waiver of a member's fines.
 """
     queryset = Members.objects.all()
     serializer_class = MembersSerializer
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [FullTextSearchFilter]
     search_fields = ["name", "email", "phone_number"]
     pagination_class = Paginate
-    authentication_classes = [JWTTokenUserAuthentication]
+    authentication_classes = [CachedJWTTokenUserAuthentication]
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -91,3 +92,55 @@ Methods:
     @action(detail=False, methods=["get"])
     def plan_choices(self, request):
         return Response(Members.PLAN_CHOICES)
+
+    @action(detail=True, methods=["get"])
+    def statement(self, request, pk=None):
+        """
+        Returns the member's fine balance and fine ledger entries, newest first.
+
+        The balance is read from the member row and the entries are paginated over the
+        (member, created_at, id) index, so the cost does not grow with the member's history.
+        Supports the same `page`, `page_size` and `paginate=cursor` parameters as the list endpoints.
+        """
+        balance = Members.objects.filter(pk=pk).values_list("unpaid_fine", flat=True).first()
+        if balance is None:
+            return Response(
+                {"message": "User does not exist."}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        transactions = FineTransaction.objects.filter(member_id=pk).order_by(
+            "-created_at", "-id"
+        )
+        page = self.paginate_queryset(transactions)
+        serializer = FineTransactionSerializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+        response.data["balance"] = str(balance)
+        return response
+
+    @action(detail=True, methods=["post"])
+    def settle_fine(self, request, pk=None):
+        """
+        Records a payment or waiver of the member's fines as a fine ledger entry.
+
+        The request carries 'kind' ('payment' or 'waiver'), 'amount' and an optional 'note'.
+        The amount cannot exceed the member's unpaid fine. Answers with the new balance and the entry.
+        """
+        serializer = FineSettlementSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            entry, balance = fines.settle(pk, **serializer.validated_data)
+        except fines.SettlementError as error:
+            return Response(
+                {"message": str(error)}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(
+            {
+                "message": f"Fine {entry.kind} recorded successfully",
+                "balance": str(balance),
+                "data": FineTransactionSerializer(entry).data,
+            },
+            status=status.HTTP_201_CREATED,
+        )